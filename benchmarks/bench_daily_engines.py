@@ -0,0 +1,66 @@
+"""
+單日報表：pandas 引擎 vs. 純 Python 累加器引擎的延遲比較。
+
+    python benchmarks/bench_daily_engines.py --sizes 100 300 1000 10000
+
+每個訂單量各跑 --repeat 次取中位數（item memo 已暖機，量的是穩態延遲），
+另外以子行程量測冷啟動時 import 的成本。
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import metrics_common  # noqa: E402
+from daily_metrics import calculate_daily_metrics  # noqa: E402
+from synthetic_orders import populate  # noqa: E402
+
+BENCH_DAY = date(2026, 3, 10)
+
+
+def _median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def _import_ms(module: str) -> float:
+    code = f"import time; t = time.perf_counter(); import {module}; print((time.perf_counter() - t) * 1000)"
+    root = Path(__file__).resolve().parent.parent
+    out = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark daily metrics engines")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 300, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"cold import daily_accumulator: {_import_ms('daily_accumulator'):8.1f} ms")
+    print(f"cold import pandas:            {_import_ms('pandas'):8.1f} ms")
+    print()
+    print(f"{'orders':>8} {'lite ms':>10} {'pandas ms':>10} {'speedup':>8}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            db_path = Path(tmp) / f"bench_{size}.db"
+            populate(db_path, BENCH_DAY, 1, size)
+            metrics_common.DB_PATH = str(db_path)
+            target = BENCH_DAY.isoformat()
+
+            lite = calculate_daily_metrics(target, engine="lite")
+            assert lite == calculate_daily_metrics(target, engine="pandas"), "engines disagree"
+
+            lite_ms = _median_ms(lambda: calculate_daily_metrics(target, engine="lite"), args.repeat)
+            pandas_ms = _median_ms(lambda: calculate_daily_metrics(target, engine="pandas"), args.repeat)
+            print(f"{size:>8} {lite_ms:>10.1f} {pandas_ms:>10.1f} {pandas_ms / lite_ms:>7.1f}x")
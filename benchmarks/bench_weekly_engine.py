@@ -0,0 +1,89 @@
+"""
+週報引擎效能：合成一整年的訂單，量測 calculate_weekly_metrics。
+
+    python benchmarks/bench_weekly_engine.py --orders-per-day 300
+
+分別量測「整年一次」、「逐週 52 次」與最後一週的同期比較（共用載入 vs 三次獨立呼叫），
+各跑 --repeat 次取中位數；
+載入與品項分類（load_orders + build_order_features）另外計時，
+方便把報表指標本身的成本拆出來看。
+"""
+import argparse
+import contextlib
+import io
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import metrics_common  # noqa: E402
+import weekly_generator  # noqa: E402
+from metrics_common import build_order_features, load_orders, preprocess_orders  # noqa: E402
+from synthetic_orders import populate  # noqa: E402
+
+YEAR_START = date(2026, 1, 5)  # 週一
+WEEKS = 52
+
+
+def _median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        # validate_bowl_counts 的警告不列入輸出
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def _load_and_classify(start: str, end: str) -> None:
+    df = preprocess_orders(load_orders(start, end, columns=["checkout_time", "items_text", "invoice_amount"]))
+    build_order_features(df)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark calculate_weekly_metrics on a synthetic year")
+    parser.add_argument("--orders-per-day", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    year_end = YEAR_START + timedelta(days=WEEKS * 7 - 1)
+    weeks = [
+        ((YEAR_START + timedelta(weeks=n)).isoformat(), (YEAR_START + timedelta(weeks=n, days=6)).isoformat())
+        for n in range(WEEKS)
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench_year.db"
+        populate(db_path, YEAR_START, WEEKS * 7, args.orders_per_day)
+        # 最後一週的去年同週也要有資料，同期比較才是三段都有訂單
+        last_year_start = weekly_generator.comparison_ranges(*weeks[-1])["last_year"][0]
+        populate(db_path, date.fromisoformat(last_year_start), 7, args.orders_per_day, seed=1)
+        metrics_common.DB_PATH = str(db_path)
+
+        start, end = YEAR_START.isoformat(), year_end.isoformat()
+        _median_ms(lambda: weekly_generator.calculate_weekly_metrics(start, end), 1)  # 暖機 item memo
+
+        year_ms = _median_ms(lambda: weekly_generator.calculate_weekly_metrics(start, end), args.repeat)
+        load_ms = _median_ms(lambda: _load_and_classify(start, end), args.repeat)
+        weekly_ms = _median_ms(
+            lambda: [weekly_generator.calculate_weekly_metrics(s, e) for s, e in weeks], max(1, args.repeat // 2)
+        )
+
+        last_start, last_end = weeks[-1]
+        ranges = weekly_generator.comparison_ranges(last_start, last_end).values()
+        separate_ms = _median_ms(
+            lambda: [weekly_generator.calculate_weekly_metrics(s, e) for s, e in ranges], args.repeat
+        )
+        compare_ms = _median_ms(lambda: weekly_generator.calculate_weekly_comparison(last_start, last_end), args.repeat)
+
+    total = WEEKS * 7 * args.orders_per_day
+    print(f"synthetic year: {total} orders")
+    print(f"whole year, one call:      {year_ms:8.1f} ms (load + classify {load_ms:.1f} ms, metrics {year_ms - load_ms:.1f} ms)")
+    print(f"52 weekly calls:           {weekly_ms:8.1f} ms")
+    print(f"week + comparisons, 3 calls: {separate_ms:6.1f} ms")
+    print(f"week + comparisons, shared:  {compare_ms:6.1f} ms")
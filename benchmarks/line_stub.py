@@ -0,0 +1,118 @@
+"""
+本機的 LINE Messaging API 替身（量測 line_bot_app 吞吐量用，不會打到真正的 LINE）。
+
+模擬 bot 會呼叫的三個端點，收到的訊息記在記憶體：
+- POST /v2/bot/message/reply
+- POST /v2/bot/message/push
+- GET  /v2/bot/message/<id>/content（回傳事先登記的檔案內容）
+
+另有替身專用的端點：
+- POST /stub/content/<id>：登記上傳檔案的內容（request body 原樣存起來）
+- GET  /stub/messages：目前收到的所有 reply / push（JSON）
+
+bot 以 LINE_API_ENDPOINT / LINE_DATA_ENDPOINT 指向替身：
+
+    python benchmarks/line_stub.py --port 9000
+    LINE_API_ENDPOINT=http://127.0.0.1:9000 LINE_DATA_ENDPOINT=http://127.0.0.1:9000 python line_bot_app.py
+
+load_webhooks.py 會在同一個行程內啟動替身，直接等待回覆抵達。
+"""
+import argparse
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+from flask import Flask, Response, jsonify, request
+
+
+class LineStub:
+    """收到的 reply / push 與登記的檔案內容；wait_for() 讓呼叫端等到符合條件的訊息抵達。"""
+
+    def __init__(self):
+        self.messages: list[dict] = []
+        self.contents: dict[str, bytes] = {}
+        self._cond = threading.Condition()
+
+    def add_content(self, message_id: str, data: bytes) -> None:
+        with self._cond:
+            self.contents[message_id] = data
+
+    def record(self, kind: str, payload: dict) -> None:
+        entry = {
+            "kind": kind,
+            "received_at": time.perf_counter(),
+            "reply_token": payload.get("replyToken"),
+            "to": payload.get("to"),
+            "texts": [message.get("text", "") for message in payload.get("messages", [])],
+        }
+        with self._cond:
+            self.messages.append(entry)
+            self._cond.notify_all()
+
+    def wait_for(self, predicate: Callable[[dict], bool], start: int = 0,
+                 timeout: float = 60.0) -> tuple[Optional[dict], int]:
+        """從 messages[start:] 找第一筆符合 predicate 的訊息；回傳 (訊息或 None, 下次的 start)。"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                for index in range(start, len(self.messages)):
+                    if predicate(self.messages[index]):
+                        return self.messages[index], index + 1
+                start = len(self.messages)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None, start
+                self._cond.wait(remaining)
+
+
+def create_app(stub: LineStub) -> Flask:
+    app = Flask(__name__)
+
+    @app.post("/v2/bot/message/reply")
+    def reply():
+        stub.record("reply", request.get_json(force=True))
+        return jsonify({})
+
+    @app.post("/v2/bot/message/push")
+    def push():
+        stub.record("push", request.get_json(force=True))
+        return jsonify({"sentMessages": []})
+
+    @app.get("/v2/bot/message/<message_id>/content")
+    def content(message_id):
+        data = stub.contents.get(message_id)
+        if data is None:
+            return jsonify({"message": "Not found"}), 404
+        return Response(data, mimetype="application/octet-stream")
+
+    @app.post("/stub/content/<message_id>")
+    def add_content(message_id):
+        stub.add_content(message_id, request.get_data())
+        return jsonify({})
+
+    @app.get("/stub/messages")
+    def messages():
+        return jsonify(stub.messages)
+
+    return app
+
+
+def serve_in_thread(stub: LineStub, host: str = "127.0.0.1", port: int = 9000):
+    """在背景執行緒啟動替身（多執行緒 werkzeug server），回傳 server（shutdown() 關閉）。"""
+    from werkzeug.serving import make_server
+
+    # 壓測時每個請求一行 access log 只會拖慢替身
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server(host, port, create_app(stub), threaded=True)
+    threading.Thread(target=server.serve_forever, name="line-stub", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the LINE Messaging API endpoints the bot calls")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    args = parser.parse_args()
+
+    create_app(LineStub()).run(host=args.host, port=args.port, threaded=True)
@@ -0,0 +1,206 @@
+"""
+webhook 壓測：對執行中的 line_bot_app 送出簽章過的 LINE webhook（文字指令與檔案訊息），
+以 line_stub 替身接收 bot 的回覆，量測每個指令從送出到回覆抵達的延遲。
+
+    # 1. 啟動 bot，LINE API 指向替身、允許壓測用的虛擬使用者
+    LINE_API_ENDPOINT=http://127.0.0.1:9000 LINE_DATA_ENDPOINT=http://127.0.0.1:9000 \\
+    LINE_ALLOWED_USER_IDS=$(python benchmarks/load_webhooks.py --print-users --concurrency 8) \\
+    LINE_CHANNEL_ACCESS_TOKEN=dummy LINE_CHANNEL_SECRET=secret gunicorn -c gunicorn.conf.py
+
+    # 2. 送 200 個請求、8 個並行（替身在本行程的 9000 port 啟動）
+    python benchmarks/load_webhooks.py --requests 200 --concurrency 8 --secret secret
+
+每個並行 worker 是一個虛擬使用者，送出後等回覆抵達才送下一個（closed loop）；
+收到「排隊中」時繼續等推播的結果。回覆以 ❌ 開頭、HTTP 非 200 或逾時都算錯誤。
+最後列出各指令的筆數、錯誤率、p50 / p95 與整體吞吐量。
+"""
+import argparse
+import base64
+import csv
+import hashlib
+import hmac
+import io
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from import_csv import COLUMN_MAP  # noqa: E402
+from line_stub import LineStub, serve_in_thread  # noqa: E402
+from synthetic_orders import generate_orders  # noqa: E402
+
+FILE_COMMAND = "@payment"
+DEFAULT_COMMANDS = [
+    f"分析 {date.today() - timedelta(days=1)}",
+    "週報 上週",
+    "趨勢",
+    "效能",
+    FILE_COMMAND,
+]
+QUEUE_NOTICE = "⏳ 排隊中"
+
+
+def user_ids(count: int) -> list[str]:
+    return [f"Uloadtest{index:024d}" for index in range(count)]
+
+
+def payment_csv(day: date, orders: int) -> bytes:
+    """synthetic_orders 的訂單轉成 iCHEF Payment_Void Record CSV。"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMN_MAP)
+    for (_, _, invoice, checkout_time, source, order_type, discount, amount,
+         payment, status, items) in generate_orders(day, orders):
+        writer.writerow([invoice, invoice, checkout_time, source, order_type, discount, amount, payment, status, items])
+    return buffer.getvalue().encode("utf-8-sig")
+
+
+def _event(user_id: str, command: str, stub: LineStub, csv_bytes: bytes, day: date) -> tuple[dict, str]:
+    message_id = uuid.uuid4().hex[:18]
+    reply_token = uuid.uuid4().hex
+    if command == FILE_COMMAND:
+        stub.add_content(message_id, csv_bytes)
+        message = {"type": "file", "id": message_id,
+                   "fileName": f"Payment_Void Record_{day.isoformat()}.csv", "fileSize": len(csv_bytes)}
+    else:
+        message = {"type": "text", "id": message_id, "text": command}
+    return {
+        "type": "message",
+        "mode": "active",
+        "timestamp": int(time.time() * 1000),
+        "source": {"type": "user", "userId": user_id},
+        "webhookEventId": uuid.uuid4().hex.upper()[:26],
+        "deliveryContext": {"isRedelivery": False},
+        "replyToken": reply_token,
+        "message": message,
+    }, reply_token
+
+
+def _label(command: str) -> str:
+    return "上傳" if command == FILE_COMMAND else command[:2]
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(int(-(-pct * len(ordered) // 100)), 1) - 1]
+
+
+def run(url: str, secret: str, stub: LineStub, commands: list[str], requests_total: int,
+        concurrency: int, timeout: float, csv_bytes: bytes, day: date, seed: int = 0) -> dict:
+    """回傳 {"results": {label: {"sent", "latencies", "errors", "queued"}}, "elapsed": 秒}。"""
+    rng = random.Random(seed)
+    schedule = iter([rng.choice(commands) for _ in range(requests_total)])
+    schedule_lock = threading.Lock()
+    results: dict[str, dict] = {}
+    results_lock = threading.Lock()
+
+    def worker(user_id: str):
+        session = requests.Session()
+        while True:
+            with schedule_lock:
+                command = next(schedule, None)
+            if command is None:
+                return
+            event, reply_token = _event(user_id, command, stub, csv_bytes, day)
+            body = json.dumps({"destination": "Uloadtest", "events": [event]}, ensure_ascii=False)
+            signature = base64.b64encode(
+                hmac.new(secret.encode(), body.encode(), hashlib.sha256).digest()
+            ).decode()
+
+            mark = len(stub.messages)
+            started = time.perf_counter()
+            error, queued, latency = False, False, None
+            try:
+                response = session.post(url, data=body.encode(), timeout=timeout, headers={
+                    "Content-Type": "application/json", "X-Line-Signature": signature,
+                })
+                error = response.status_code != 200
+            except requests.RequestException:
+                error = True
+            if not error:
+                message, mark = stub.wait_for(
+                    lambda m: m["reply_token"] == reply_token or m["to"] == user_id, mark, timeout
+                )
+                if message and message["texts"] and message["texts"][0].startswith(QUEUE_NOTICE):
+                    queued = True
+                    message, _ = stub.wait_for(lambda m: m["to"] == user_id, mark, timeout)
+                if message is None:
+                    error = True
+                else:
+                    latency = message["received_at"] - started
+                    error = any(text.startswith("❌") for text in message["texts"])
+
+            with results_lock:
+                entry = results.setdefault(_label(command), {"sent": 0, "latencies": [], "errors": 0, "queued": 0})
+                entry["sent"] += 1
+                entry["errors"] += error
+                entry["queued"] += queued
+                if latency is not None and not error:
+                    entry["latencies"].append(latency)
+
+    threads = [threading.Thread(target=worker, args=(user_id,)) for user_id in user_ids(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {"results": results, "elapsed": time.perf_counter() - started}
+
+
+def render(report: dict, requests_total: int) -> str:
+    lines = [f"{'command':<8} {'sent':>6} {'errors':>7} {'err %':>6} {'queued':>7} {'p50 ms':>9} {'p95 ms':>9}"]
+    errors = 0
+    for label, entry in sorted(report["results"].items()):
+        latencies = entry["latencies"]
+        sent = entry["sent"]
+        errors += entry["errors"]
+        p50 = f"{_percentile(latencies, 50) * 1000:9.0f}" if latencies else f"{'-':>9}"
+        p95 = f"{_percentile(latencies, 95) * 1000:9.0f}" if latencies else f"{'-':>9}"
+        lines.append(f"{label:<8} {sent:>6} {entry['errors']:>7} {entry['errors'] / sent * 100:>5.1f}% "
+                     f"{entry['queued']:>7} {p50} {p95}")
+    elapsed = report["elapsed"]
+    lines.append("")
+    lines.append(f"{requests_total} requests in {elapsed:.1f} s: {requests_total / elapsed:.1f} req/s, "
+                 f"{errors} errors ({errors / requests_total * 100:.1f}%)")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send signed LINE webhooks to the bot and report latency per command")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/callback", help="Bot webhook URL")
+    parser.add_argument("--secret", default="secret", help="LINE_CHANNEL_SECRET the bot was started with")
+    parser.add_argument("--stub-host", default="127.0.0.1")
+    parser.add_argument("--stub-port", type=int, default=9000)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4, help="Parallel virtual users")
+    parser.add_argument("--command", action="append", dest="commands",
+                        help=f"Command to send (repeatable; {FILE_COMMAND} uploads a Payment CSV)")
+    parser.add_argument("--csv-orders", type=int, default=300, help="Orders in the uploaded Payment CSV")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for each reply")
+    parser.add_argument("--print-users", action="store_true",
+                        help="Print the virtual user ids (for LINE_ALLOWED_USER_IDS) and exit")
+    args = parser.parse_args()
+
+    if args.print_users:
+        print(",".join(user_ids(args.concurrency)))
+        sys.exit(0)
+
+    stub = LineStub()
+    server = serve_in_thread(stub, args.stub_host, args.stub_port)
+    upload_day = date.today() - timedelta(days=1)
+    try:
+        report = run(
+            args.url, args.secret, stub, args.commands or DEFAULT_COMMANDS, args.requests,
+            args.concurrency, args.timeout, payment_csv(upload_day, args.csv_orders), upload_day,
+        )
+    finally:
+        server.shutdown()
+    print(render(report, args.requests))
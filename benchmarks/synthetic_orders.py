@@ -0,0 +1,104 @@
+"""
+產生合成訂單資料（效能量測用）。
+
+品項、時段、付款方式的組合接近實際 POS 匯出，讓分類 memo、時段判斷、
+蛋白質統計都走到與正式資料相同的路徑。以固定 seed 產生，結果可重現。
+"""
+import random
+import sqlite3
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# 單價同 rules.json 的 bowl_base_prices
+BOWLS = [
+    ("雞胸肉自選碗", 160),
+    ("嚴選生鮭魚自選碗", 190),
+    ("鮮蝦自選碗", 170),
+    ("壽喜燒豬自選碗", 160),
+    ("高蛋白健身碗", 220),
+    ("海味雙魚碗", 260),
+]
+EXTRAS = [
+    ("味噌湯", 30),
+    ("提袋", 2),
+    ("加購一份壽喜燒豬", 50),
+    ("嚴選生鮭魚 45g", 0),
+    ("豆腐 80g", 0),
+]
+ORDER_TYPES = ["Dine In", "Takeout", "外帶", "Delivery"]
+PAYMENTS = ["現金(Cash payment module)", "LinePay (未整合)(Custom payment module)", "信用卡"]
+# 依營業時段加權的結帳小時
+HOURS = [11] * 4 + [12] * 6 + [13] * 3 + [14] + [17] * 2 + [18] * 4 + [19] * 3 + [20]
+
+
+def _items_text(rng: random.Random) -> tuple[str, float]:
+    parts, total = [], 0.0
+    for _ in range(rng.choice([1, 1, 1, 2, 2, 3])):
+        name, price = rng.choice(BOWLS)
+        qty = rng.choice([1, 1, 1, 2])
+        parts.append(f"{name} ${price * qty:.1f}")
+        total += price * qty
+    if rng.random() < 0.4:
+        name, price = rng.choice(EXTRAS)
+        parts.append(f"{name} ${price:.1f}")
+        total += price
+    return ", ".join(parts), total
+
+
+def generate_orders(day: date, count: int, *, seed: int = 0):
+    """產生 count 筆 raw_orders tuple（欄位順序同 insert_orders）。"""
+    rng = random.Random(f"{seed}:{day.isoformat()}")
+    rows = []
+    for n in range(count):
+        items_text, total = _items_text(rng)
+        moment = datetime.combine(day, datetime.min.time()) + timedelta(
+            hours=rng.choice(HOURS), minutes=rng.randrange(60), seconds=rng.randrange(60)
+        )
+        discount = round(total * 0.1) if rng.random() < 0.15 else 0
+        invoice = 0 if rng.random() < 0.02 else total - discount
+        rows.append((
+            "synthetic.csv",
+            "2026-01-01T00:00:00",
+            f"SYN-{day:%Y%m%d}-{n:05d}",
+            moment.strftime("%Y-%m-%d %H:%M:%S"),
+            "Online Store" if rng.random() < 0.1 else "On site",
+            rng.choice(ORDER_TYPES),
+            discount,
+            invoice,
+            rng.choice(PAYMENTS),
+            "Voided" if rng.random() < 0.01 else "Issued",
+            items_text,
+        ))
+    return rows
+
+
+def create_database(db_path) -> None:
+    conn = sqlite3.connect(str(db_path))
+    try:
+        conn.executescript((_PROJECT_ROOT / "create_tables.sql").read_text(encoding="utf-8"))
+    finally:
+        conn.close()
+
+
+def insert_orders(db_path, rows) -> None:
+    conn = sqlite3.connect(str(db_path))
+    try:
+        conn.executemany("""
+            INSERT OR IGNORE INTO raw_orders
+              (source_file, imported_at, invoice_number, checkout_time,
+               order_source, order_type, discount_amount, invoice_amount,
+               payment_method, order_status, items_text)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def populate(db_path, start: date, days: int, orders_per_day: int, *, seed: int = 0) -> None:
+    """建立資料庫並寫入 start 起連續 days 天、每天 orders_per_day 筆訂單。"""
+    create_database(db_path)
+    for offset in range(days):
+        insert_orders(db_path, generate_orders(start + timedelta(days=offset), orders_per_day, seed=seed))
@@ -0,0 +1,213 @@
+"""
+Prometheus 文字格式的執行指標（/metrics）。
+
+各行程先在記憶體累加（inc / observe 只是鎖內的 dict 加法），每 FLUSH_SECONDS 秒或
+被抓取時把增量 UPSERT 進 SQLite 的 bot_metrics 表；多個 gunicorn worker 的數字在表內
+合併，任一個 worker 回應 /metrics 都是全體的總和。佇列深度之類的即時數值由
+register_collector() 登記的函式在抓取時現場查詢，不存表。
+
+    curl -s localhost:8000/metrics
+    python bot_metrics.py            # 直接印出目前的指標
+"""
+import argparse
+import sqlite3
+import threading
+import time
+from typing import Callable, Iterable
+
+METRICS_DDL = """
+    CREATE TABLE IF NOT EXISTS bot_metrics (
+        name TEXT NOT NULL,
+        labels TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        value REAL NOT NULL,
+        PRIMARY KEY (name, labels)
+    )
+"""
+
+# 名稱 → (型別, 說明)；histogram 存成 _bucket / _sum / _count 三組 counter
+METRICS = {
+    "pokebee_webhook_seconds": ("histogram", "Webhook handling time by command"),
+    "pokebee_import_rows_total": ("counter", "CSV rows processed by import, by file type and result"),
+    "pokebee_import_seconds_total": ("counter", "Time spent importing CSV files, by file type"),
+    "pokebee_import_rows_per_second": ("gauge", "Rows per second of the latest import, by file type"),
+    "pokebee_report_cache_total": ("counter", "Report snapshot lookups by cache and result"),
+    "pokebee_import_lock_wait_seconds": ("histogram", "Time spent waiting for the cross-process import lock"),
+    "pokebee_sqlite_lock_wait_seconds": ("histogram", "Time spent waiting for the SQLite write lock, by writer"),
+    "pokebee_clock_analyses_total": ("counter", "Clock-in/out analyses run, by result"),
+    "pokebee_webhook_duplicates_total": ("counter", "Webhook redeliveries suppressed, by event kind"),
+    "pokebee_queue_depth": ("gauge", "Jobs waiting to run, by queue"),
+    "pokebee_queue_wait_seconds": ("histogram", "Time jobs spent waiting in the work queue, by priority"),
+    "pokebee_api_requests_total": ("counter", "JSON report API responses, by endpoint and status"),
+    "pokebee_ready": ("gauge", "1 once the startup warm-up has finished"),
+}
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+FLUSH_SECONDS = 5.0
+
+_lock = threading.Lock()
+_counters: dict[tuple[str, str], float] = {}
+_gauges: dict[tuple[str, str], float] = {}
+_last_flush = time.monotonic()
+_collectors: list[Callable[[], Iterable[tuple]]] = []
+
+
+def _labels(labels: dict) -> str:
+    """{"command": "週報", "le": "0.5"} → command="週報",le="0.5"（le 固定放最後）"""
+    keys = sorted(key for key in labels if key != "le") + (["le"] if "le" in labels else [])
+    escaped = (
+        str(labels[key]).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        for key in keys
+    )
+    return ",".join(f'{key}="{value}"' for key, value in zip(keys, escaped))
+
+
+def inc(name: str, value: float = 1.0, **labels) -> None:
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + value
+
+
+def set_gauge(name: str, value: float, **labels) -> None:
+    with _lock:
+        _gauges[(name, _labels(labels))] = value
+
+
+def observe(name: str, seconds: float, buckets: tuple = LATENCY_BUCKETS, **labels) -> None:
+    with _lock:
+        # 每個 bucket 都要出現（沒落入的加 0），histogram_quantile 才算得出來
+        for bound in (*buckets, "+Inf"):
+            key = (f"{name}_bucket", _labels({**labels, "le": bound}))
+            _counters[key] = _counters.get(key, 0.0) + (bound == "+Inf" or seconds <= bound)
+        for suffix, value in (("_sum", seconds), ("_count", 1)):
+            key = (f"{name}{suffix}", _labels(labels))
+            _counters[key] = _counters.get(key, 0.0) + value
+
+
+def record_import(file_type: str, inserted: int, skipped: int, seconds: float) -> None:
+    inc("pokebee_import_rows_total", inserted, file=file_type, result="inserted")
+    inc("pokebee_import_rows_total", skipped, file=file_type, result="skipped")
+    inc("pokebee_import_seconds_total", seconds, file=file_type)
+    if seconds > 0:
+        set_gauge("pokebee_import_rows_per_second", (inserted + skipped) / seconds, file=file_type)
+
+
+def register_collector(func: Callable[[], Iterable[tuple]]) -> None:
+    """抓取時呼叫 func()，產生 (name, value, labels dict) 的即時 gauge；name 需在 METRICS 內登記。"""
+    _collectors.append(func)
+
+
+def _connect() -> sqlite3.Connection:
+    import metrics_common
+
+    conn = sqlite3.connect(metrics_common.DB_PATH, timeout=30)
+    conn.execute(METRICS_DDL)
+    return conn
+
+
+def flush(force: bool = False) -> None:
+    """把本行程累積的增量寫進 bot_metrics；寫入失敗時增量留到下一次。"""
+    global _last_flush
+    with _lock:
+        if not force and time.monotonic() - _last_flush < FLUSH_SECONDS:
+            return
+        counters, gauges = dict(_counters), dict(_gauges)
+        _counters.clear()
+        _gauges.clear()
+        _last_flush = time.monotonic()
+    if not counters and not gauges:
+        return
+    import metrics_common
+
+    try:
+        conn = _connect()
+        try:
+            metrics_common.begin_write(conn, "metrics")
+            conn.executemany(
+                "INSERT INTO bot_metrics (name, labels, kind, value) VALUES (?, ?, 'counter', ?) "
+                "ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value",
+                [(name, labels, value) for (name, labels), value in counters.items()],
+            )
+            conn.executemany(
+                "INSERT INTO bot_metrics (name, labels, kind, value) VALUES (?, ?, 'gauge', ?) "
+                "ON CONFLICT (name, labels) DO UPDATE SET value = excluded.value",
+                [(name, labels, value) for (name, labels), value in gauges.items()],
+            )
+            conn.commit()
+        finally:
+            conn.close()
+    except sqlite3.Error as exc:
+        print(f"⚠️  Metrics flush failed: {exc}")
+        with _lock:
+            for key, value in counters.items():
+                _counters[key] = _counters.get(key, 0.0) + value
+            for key, value in gauges.items():
+                _gauges.setdefault(key, value)
+
+
+def start_flusher(interval: float = FLUSH_SECONDS) -> threading.Thread:
+    """閒置的 worker 也定期把增量寫出，/metrics 不會漏掉沒收到請求的 worker。"""
+    def _loop():
+        while True:
+            time.sleep(interval)
+            flush(force=True)
+
+    thread = threading.Thread(target=_loop, name="metrics-flush", daemon=True)
+    thread.start()
+    return thread
+
+
+def _base_name(name: str) -> str:
+    for suffix in ("_bucket", "_sum", "_count"):
+        if name.endswith(suffix) and name[: -len(suffix)] in METRICS:
+            return name[: -len(suffix)]
+    return name
+
+
+def _split_le(labels: str) -> tuple[str, float]:
+    """histogram 依其他 label 分組、組內 bucket 由小到大（le 一定是最後一個 label）。"""
+    rest, separator, bound = f",{labels}".rpartition(',le="')
+    if not separator:
+        return labels, float("inf")
+    bound = bound.rstrip('"')
+    return rest.lstrip(","), float("inf") if bound == "+Inf" else float(bound)
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_metrics() -> str:
+    """Prometheus text exposition format (0.0.4)。"""
+    flush(force=True)
+    conn = _connect()
+    try:
+        rows = [(name, labels, value) for name, labels, value in conn.execute(
+            "SELECT name, labels, value FROM bot_metrics"
+        )]
+    finally:
+        conn.close()
+    for collector in _collectors:
+        try:
+            rows.extend((name, _labels(labels), value) for name, value, labels in collector())
+        except sqlite3.Error as exc:
+            print(f"⚠️  Metrics collector failed: {exc}")
+
+    grouped: dict[str, list] = {}
+    for name, labels, value in rows:
+        grouped.setdefault(_base_name(name), []).append((name, labels, value))
+
+    lines = []
+    for base in sorted(grouped):
+        kind, help_text = METRICS.get(base, ("untyped", ""))
+        lines.append(f"# HELP {base} {help_text}")
+        lines.append(f"# TYPE {base} {kind}")
+        samples = sorted(grouped[base], key=lambda row: (*_split_le(row[1]), row[0]))
+        for name, labels, value in samples:
+            lines.append(f"{name}{{{labels}}} {_format_value(value)}" if labels else f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    argparse.ArgumentParser(description="Print the bot's metrics in Prometheus text format").parse_args()
+    print(render_metrics(), end="")
@@ -8,6 +8,8 @@ from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional
 
+from tracing import traced
+
 FULL_TIME_NAMES = {"小王叭"}
 TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
 
@@ -85,6 +87,7 @@ def fmt_hours(hours: float) -> str:
     return f"{hours:.1f}".rstrip("0").rstrip(".")
 
 
+@traced()
 def parse_csv(path: Path) -> dict[str, list[Event]]:
     employees: dict[str, list[Event]] = {}
     current_name: Optional[str] = None
@@ -335,6 +338,7 @@ def extract_month_key(path: Path) -> str:
     return m.group(1) if m else datetime.now().strftime("%Y-%m")
 
 
+@traced()
 def format_summary(summaries: list[EmployeeSummary]) -> str:
     lines: list[str] = []
     for s in summaries:
@@ -360,6 +364,7 @@ def print_summary(summaries: list[EmployeeSummary]) -> None:
     print(format_summary(summaries))
 
 
+@traced()
 def write_xlsx_report(records: list[PairRecord], summaries: list[EmployeeSummary], month_key: str) -> Path:
     from openpyxl import Workbook
     from openpyxl.styles import Font
@@ -444,6 +449,7 @@ def write_report(records: list[PairRecord], month_key: str) -> Path:
     return out_path
 
 
+@traced()
 def analyze_csv(csv_path: Path) -> tuple[list[PairRecord], list[EmployeeSummary], str]:
     employees = parse_csv(csv_path)
     records: list[PairRecord] = []
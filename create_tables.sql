@@ -33,6 +33,9 @@ CREATE TABLE IF NOT EXISTS raw_orders (
     UNIQUE(invoice_number, checkout_time)
 );
 
+-- 單日 / 區間查詢都以 checkout_time 範圍篩選
+CREATE INDEX IF NOT EXISTS idx_raw_orders_checkout_time ON raw_orders(checkout_time);
+
 CREATE TABLE IF NOT EXISTS modifier_summary (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
 
@@ -50,3 +53,117 @@ CREATE TABLE IF NOT EXISTS modifier_summary (
     imported_at TEXT NOT NULL
 );
 
+
+-- modifier 品名 -> 蛋白質 key（依規則 hash 分區；protein_key = '' 表示不含蛋白質）
+CREATE TABLE IF NOT EXISTS modifier_protein (
+    rules_hash TEXT NOT NULL,
+    name TEXT NOT NULL,
+    protein_key TEXT NOT NULL,
+    PRIMARY KEY (rules_hash, name, protein_key)
+);
+
+-- 品項分類 memo（快取，可隨時清空；memo_version 不同的舊資料會自動刪除）
+CREATE TABLE IF NOT EXISTS item_memo (
+    memo_version TEXT NOT NULL,
+    item TEXT NOT NULL,
+    price_segment INTEGER NOT NULL,
+    is_bowl INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    protein_bowls TEXT NOT NULL,
+    protein_non_bowls TEXT NOT NULL,
+    set_meal_proteins TEXT NOT NULL,
+    PRIMARY KEY (memo_version, item, price_segment)
+);
+
+-- 依日期生效的原價與促銷折扣（疊加在 metrics_common 的預設值之上）
+CREATE TABLE IF NOT EXISTS price_timeline (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+
+    -- 'base_price'：item_name 自 start_date 起的原價
+    -- 'discount'：[start_date, end_date] 全單折扣係數
+    kind TEXT NOT NULL CHECK (kind IN ('base_price', 'discount')),
+    item_name TEXT,
+    start_date TEXT NOT NULL,
+    end_date TEXT,
+    value REAL NOT NULL,
+
+    note TEXT
+);
+
+-- 單日累加器快照（分析 今天 只折入新匯入的訂單；可隨時清空，會自動重建）
+CREATE TABLE IF NOT EXISTS daily_snapshot (
+    day TEXT PRIMARY KEY,
+    state_version TEXT NOT NULL,
+    last_order_id INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+
+-- 預先算好的週報（週報 直接回傳；可隨時清空，排程器或下一次查詢會重建）
+CREATE TABLE IF NOT EXISTS weekly_snapshot (
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    state_version TEXT NOT NULL,
+    data_version TEXT NOT NULL,
+    result TEXT NOT NULL,
+    report TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (start_date, end_date)
+);
+
+-- 打烊後推播的日報（見 daily_push.py）；pushed_at 保證同一天只推播一次
+CREATE TABLE IF NOT EXISTS daily_report (
+    day TEXT PRIMARY KEY,
+    state_version TEXT NOT NULL,
+    data_version TEXT NOT NULL,
+    report TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    pushed_at TEXT
+);
+
+-- 行程內排程器的工作狀態（見 scheduler.py）
+CREATE TABLE IF NOT EXISTS scheduled_jobs (
+    name TEXT PRIMARY KEY,
+    interval_seconds INTEGER NOT NULL,
+    next_run_at TEXT NOT NULL,
+    last_run_at TEXT,
+    last_status TEXT,
+    last_error TEXT,
+    last_duration_ms REAL
+);
+
+-- LINE webhook 重送去重（見 event_dedupe.py）；key 為 event:<webhookEventId> / message:<message id>
+CREATE TABLE IF NOT EXISTS webhook_events (
+    event_key TEXT PRIMARY KEY,
+    received_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS webhook_dedupe_stats (
+    kind TEXT PRIMARY KEY,
+    suppressed INTEGER NOT NULL DEFAULT 0
+);
+
+-- 各請求的 tracing span（見 tracing.py）；span_id = 0 為整個請求
+CREATE TABLE IF NOT EXISTS trace_spans (
+    trace_id TEXT NOT NULL,
+    span_id INTEGER NOT NULL,
+    parent_id INTEGER,
+    trace_name TEXT NOT NULL,
+    name TEXT NOT NULL,
+    start_ms REAL NOT NULL,
+    duration_ms REAL NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (trace_id, span_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_trace_spans_created_at ON trace_spans (created_at);
+
+-- /metrics 的 counter / gauge，各 worker 定期把增量合併進來（見 bot_metrics.py）
+CREATE TABLE IF NOT EXISTS bot_metrics (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (name, labels)
+);
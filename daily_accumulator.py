@@ -0,0 +1,238 @@
+"""
+單日營運指標的累加器（不依賴 pandas）。
+
+DailyAccumulator 逐筆吃進訂單，只保留計數、加總、每小時出碗數與各蛋白質碗數，
+最後由 to_daily_metrics() 輸出與 daily_metrics.calculate_daily_metrics 相同結構的 dict。
+幾百筆的單日報表用這條路徑，可以省掉 DataFrame 建構、apply、groupby 與 import pandas 的固定成本。
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional
+
+from metrics_common import (
+    classify_order_items,
+    current_rules,
+    flush_item_memo,
+    get_price_timeline,
+    item_memo_version,
+    iter_orders,
+    load_item_memo,
+    normalize_payment,
+)
+from price_timeline import PriceTimeline
+from rule_set import RuleSet
+from tracing import traced
+
+ORDER_COLUMNS = [
+    "checkout_time",
+    "order_source",
+    "order_type",
+    "discount_amount",
+    "invoice_amount",
+    "payment_method",
+    "items_text",
+]
+
+DINE_IN_TYPES = {"Dine In", "內用"}
+TAKEOUT_TYPES = {"Takeout", "外帶", "Delivery", "外送"}
+CLOUD_KITCHEN_SOURCE = "Online Store"
+
+
+def _format_hour(hour: Optional[int]) -> str:
+    return f"{hour}:00-{hour+1}:00" if hour is not None else "--"
+
+
+class DailyAccumulator:
+    """單日訂單的累加狀態；add() 的欄位順序同 ORDER_COLUMNS。"""
+
+    def __init__(self, rules: Optional[RuleSet] = None, timeline: Optional[PriceTimeline] = None):
+        self.rules = rules or current_rules()
+        self.timeline = timeline or get_price_timeline(refresh=True)
+
+        self.total_orders = 0
+        self.revenue = 0.0
+        self.total_bowls = 0
+        self.lunch_orders = 0
+        self.dinner_orders = 0
+        self.lunch_bowls = 0
+        self.dinner_bowls = 0
+        self.dine_in_bowls = 0
+        self.takeout_bowls = 0
+        self.cash_orders = 0
+        self.linepay_orders = 0
+        self.discount_orders = 0
+        self.discount_amount = 0.0
+        self.cloud_kitchen_orders = 0
+        self.hour_bowls: dict[int, int] = {}
+        self.protein_bowls = {protein: 0 for protein in self.rules.protein_rules}
+
+    def add(self, checkout_time, order_source, order_type, discount_amount, invoice_amount, payment_method, items_text) -> None:
+        # 與 preprocess_orders 相同：排除金額 <= 0（員工餐 / 公關單）
+        if invoice_amount is None or not invoice_amount > 0:
+            return
+
+        if isinstance(checkout_time, str):
+            checkout_time = datetime.fromisoformat(checkout_time)
+
+        bowls = 0
+        for cls in classify_order_items(items_text, checkout_time, rules=self.rules, timeline=self.timeline):
+            bowls += cls.quantity
+            for protein in cls.protein_bowls:
+                self.protein_bowls[protein] += 1
+
+        self.total_orders += 1
+        self.revenue += invoice_amount
+        self.total_bowls += bowls
+
+        hour = checkout_time.hour
+        self.hour_bowls[hour] = self.hour_bowls.get(hour, 0) + bowls
+
+        moment = checkout_time.time()
+        lunch_start, lunch_end = self.rules.period_bounds["lunch"]
+        dinner_start, dinner_end = self.rules.period_bounds["dinner"]
+        if lunch_start <= moment <= lunch_end:
+            self.lunch_orders += 1
+            self.lunch_bowls += bowls
+        if dinner_start <= moment <= dinner_end:
+            self.dinner_orders += 1
+            self.dinner_bowls += bowls
+
+        if order_type in DINE_IN_TYPES:
+            self.dine_in_bowls += bowls
+        if order_type in TAKEOUT_TYPES:
+            self.takeout_bowls += bowls
+
+        payment_type = normalize_payment(payment_method)
+        if payment_type == "Cash":
+            self.cash_orders += 1
+        elif payment_type == "LinePay":
+            self.linepay_orders += 1
+
+        if discount_amount is not None and discount_amount > 0:
+            self.discount_orders += 1
+            self.discount_amount += discount_amount
+
+        if order_source == CLOUD_KITCHEN_SOURCE:
+            self.cloud_kitchen_orders += 1
+
+    # 可持久化的欄位（見 daily_snapshot）
+    STATE_FIELDS = (
+        "total_orders", "revenue", "total_bowls",
+        "lunch_orders", "dinner_orders", "lunch_bowls", "dinner_bowls",
+        "dine_in_bowls", "takeout_bowls", "cash_orders", "linepay_orders",
+        "discount_orders", "discount_amount", "cloud_kitchen_orders",
+    )
+
+    def to_state(self) -> dict:
+        state = {field: getattr(self, field) for field in self.STATE_FIELDS}
+        state["hour_bowls"] = {str(hour): bowls for hour, bowls in self.hour_bowls.items()}
+        state["protein_bowls"] = dict(self.protein_bowls)
+        return state
+
+    @classmethod
+    def from_state(cls, state: dict, rules: Optional[RuleSet] = None,
+                   timeline: Optional[PriceTimeline] = None) -> "DailyAccumulator":
+        accumulator = cls(rules, timeline)
+        for field in cls.STATE_FIELDS:
+            setattr(accumulator, field, state[field])
+        accumulator.hour_bowls = {int(hour): bowls for hour, bowls in state["hour_bowls"].items()}
+        accumulator.protein_bowls = {
+            protein: state["protein_bowls"].get(protein, 0) for protein in accumulator.rules.protein_rules
+        }
+        return accumulator
+
+    def merge(self, other: "DailyAccumulator") -> "DailyAccumulator":
+        """把另一段期間的累加狀態加進來（計數與加總相加、每小時與蛋白質直方圖合併）。"""
+        for field in self.STATE_FIELDS:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+        for hour, bowls in other.hour_bowls.items():
+            self.hour_bowls[hour] = self.hour_bowls.get(hour, 0) + bowls
+        for protein, bowls in other.protein_bowls.items():
+            self.protein_bowls[protein] = self.protein_bowls.get(protein, 0) + bowls
+        return self
+
+    def to_daily_metrics(self, target_date: str) -> Optional[dict]:
+        """輸出 calculate_daily_metrics 格式的 dict；沒有有效訂單時回傳 None。"""
+        if self.total_orders == 0:
+            return None
+
+        total_orders = self.total_orders
+        total_bowls = self.total_bowls
+        total_revenue = self.revenue
+
+        # 與 groupby(hour).sum().nlargest(2) 相同：同分時小時數較早者優先
+        top_hours = sorted(sorted(self.hour_bowls.items()), key=lambda kv: -kv[1])[:2]
+        first_peak_hour, first_peak_hour_bowls = top_hours[0] if len(top_hours) >= 1 else (None, 0)
+        second_peak_hour, second_peak_hour_bowls = top_hours[1] if len(top_hours) >= 2 else (None, 0)
+        first_peak_ratio = first_peak_hour_bowls / total_bowls if total_bowls else 0
+        second_peak_ratio = second_peak_hour_bowls / total_bowls if total_bowls else 0
+
+        # 穩定排序：同分時維持 protein_rules 的順序（與 _results_from_totals 的排名一致）
+        ranked_proteins = sorted(self.protein_bowls.items(), key=lambda kv: -kv[1])
+        first_protein, first_protein_bowls = ranked_proteins[0] if len(ranked_proteins) >= 1 else (None, 0)
+        second_protein, second_protein_bowls = ranked_proteins[1] if len(ranked_proteins) >= 2 else (None, 0)
+        first_protein_ratio = first_protein_bowls / total_bowls if total_bowls else 0
+        second_protein_ratio = second_protein_bowls / total_bowls if total_bowls else 0
+
+        cash_ratio = self.cash_orders / total_orders if total_orders else 0
+        linepay_ratio = self.linepay_orders / total_orders if total_orders else 0
+        cloud_kitchen_ratio = self.cloud_kitchen_orders / total_orders if total_orders else 0
+
+        return {
+            "date": target_date,
+            "metrics": {
+                "revenue": round(total_revenue, 2),
+                "unit": "bowl",
+                "total_orders": total_orders,
+                "total_bowls": int(total_bowls),
+                "avg_bowl_price": round(total_revenue / total_bowls, 2) if total_bowls else 0,
+                "dine_in_bowls": self.dine_in_bowls,
+                "takeout_bowls": self.takeout_bowls,
+                "cloud_kitchen_orders": self.cloud_kitchen_orders,
+                "cloud_kitchen_ratio": '{:.2f}%'.format(cloud_kitchen_ratio * 100),
+            },
+            "periods": {
+                "lunch_bowls": self.lunch_bowls,
+                "dinner_bowls": self.dinner_bowls,
+            },
+            "operational": {
+                "first_peak_hour": _format_hour(first_peak_hour),
+                "first_peak_hour_bowls": int(first_peak_hour_bowls) if first_peak_hour is not None else 0,
+                "first_peak_hour_ratio": round(first_peak_ratio, 2),
+                "second_peak_hour": _format_hour(second_peak_hour),
+                "second_peak_hour_bowls": int(second_peak_hour_bowls) if second_peak_hour is not None else 0,
+                "second_peak_hour_ratio": round(second_peak_ratio, 2),
+                "protein_bowls": dict(ranked_proteins),
+                "first_protein": first_protein,
+                "first_protein_bowls": first_protein_bowls,
+                "first_protein_ratio": round(first_protein_ratio, 2),
+                "second_protein": second_protein,
+                "second_protein_bowls": second_protein_bowls,
+                "second_protein_ratio": round(second_protein_ratio, 2),
+            },
+            "payments": {
+                "pay_in_cash_order_ratio": round(cash_ratio, 2),
+                "pay_in_LinePay_order_ratio": round(linepay_ratio, 2),
+            },
+            "assumptions": {
+                "employee_meal_rule": "invoice_amount == 0",
+                "bowl_rule": "item name contains '碗' and not in exclude list",
+                "voided_rule": "order_status contains 'Voided'",
+                "business_hours_applied": self.rules.to_mapping()["business_hours"],
+            },
+        }
+
+
+@traced()
+def calculate_daily_metrics_lite(target_date: str, rules: Optional[RuleSet] = None) -> Optional[dict]:
+    """直接從 SQLite cursor 串流訂單進累加器，不建立任何 DataFrame。"""
+    accumulator = DailyAccumulator(rules)
+    memo_key = item_memo_version(accumulator.timeline, accumulator.rules)
+    load_item_memo(memo_key)
+
+    for row in iter_orders(target_date, target_date, columns=ORDER_COLUMNS):
+        accumulator.add(*row)
+
+    flush_item_memo(memo_key)
+    return accumulator.to_daily_metrics(target_date)
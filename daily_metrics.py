@@ -1,22 +1,35 @@
 import argparse
-import pandas as pd
+from datetime import date, timedelta
+from functools import cached_property
+from daily_accumulator import (
+    CLOUD_KITCHEN_SOURCE,
+    DINE_IN_TYPES,
+    TAKEOUT_TYPES,
+    DailyAccumulator,
+    calculate_daily_metrics_lite,
+)
 from metrics_common import (
-    BUSINESS_HOURS,
-    PROTEIN_RULES,
-    count_bowls_smart,
-    count_protein_bowls,
-    is_in_period,
+    build_order_features,
+    count_orders,
+    current_rules,
+    get_price_timeline,
+    in_period_mask,
     load_orders,
     normalize_payment,
     preprocess_orders,
 )
+from tracing import traced
+
+# 單日訂單數不超過此值時改用純 Python 累加器（daily_accumulator），省下 pandas 的固定成本
+LITE_ENGINE_MAX_ORDERS = 1500
+ENGINES = ("auto", "lite", "pandas", "snapshot")
 
 
-def _load_daily_order_frame(target_date: str):
-    """Load and preprocess orders for a single day."""
+def _load_daily_order_frame(target_date: str, rules=None, end_date: str = None):
+    """Load and preprocess orders for a single day (or [target_date, end_date])."""
     df = load_orders(
         target_date,
-        target_date,
+        end_date or target_date,
         columns=[
             "checkout_time",
             "order_source",
@@ -36,164 +49,227 @@ def _load_daily_order_frame(target_date: str):
     if df.empty:
         return df
 
-    df = df.copy()
-    df["bowls"] = df["items_text"].apply(lambda text: count_bowls_smart(text, order_date=target_date))
-    return df
+    return df.join(build_order_features(df, rules=rules))
 
 
 def calculate_avg_bowl_price_diagnostics(target_date: str):
     """Return details that help explain avg_bowl_price for a single day."""
-    df = _load_daily_order_frame(target_date)
-    if df.empty:
-        return None
+    return DailyBundle(target_date).diagnostics
+
+
+class DailyBundle:
+    """
+    單日資料只載入一次，各區塊（metrics / diagnostics / 高單價訂單 / 零碗訂單）
+    在第一次存取時才計算並快取。當天沒有有效訂單時各區塊為 None 或空清單。
+    """
+
+    ORDER_RECORD_COLUMNS = ["checkout_time", "invoice_amount", "bowls", "order_bowl_price", "items_text"]
+
+    def __init__(self, target_date: str, rules=None):
+        self.target_date = target_date
+        self.rules = rules or current_rules()
+
+    @cached_property
+    def frame(self):
+        df = _load_daily_order_frame(self.target_date, self.rules)
+        if not df.empty:
+            bowls = df["bowls"]
+            df["order_bowl_price"] = df["invoice_amount"] / bowls.where(bowls > 0)
+        return df
+
+    @property
+    def has_data(self) -> bool:
+        return not self.frame.empty
+
+    @cached_property
+    def metrics(self):
+        """同 calculate_daily_metrics(target_date)。"""
+        if not self.has_data:
+            return None
+        return _results_from_totals([self.target_date], *_daily_totals(self.frame, self.rules), self.rules)[0]
+
+    @cached_property
+    def avg_bowl_price(self) -> float:
+        total_bowls = int(self.frame["bowls"].sum()) if self.has_data else 0
+        return round(float(self.frame["invoice_amount"].sum()) / total_bowls, 2) if total_bowls else 0
+
+    @cached_property
+    def high_price_threshold(self) -> float:
+        return self.avg_bowl_price * 1.2 if self.avg_bowl_price else 0
+
+    @cached_property
+    def high_price_orders(self) -> list:
+        """單碗收入 >= 平均 1.2 倍的訂單，依單碗收入由高到低。"""
+        if not self.has_data:
+            return []
+        df = self.frame
+        high = df[(df["bowls"] > 0) & (df["order_bowl_price"] >= self.high_price_threshold)]
+        high = high.sort_values("order_bowl_price", ascending=False)
+        return high[self.ORDER_RECORD_COLUMNS].to_dict(orient="records")
+
+    @cached_property
+    def zero_bowl_orders(self) -> list:
+        """有營收但算不出碗數的訂單（單點、飲料，或品名規則沒對到）。"""
+        if not self.has_data:
+            return []
+        df = self.frame
+        return df[df["bowls"] == 0][["checkout_time", "invoice_amount", "items_text"]].to_dict(orient="records")
+
+    @cached_property
+    def diagnostics(self):
+        """同 calculate_avg_bowl_price_diagnostics(target_date)。"""
+        if not self.has_data:
+            return None
+        return {
+            "date": self.target_date,
+            "avg_bowl_price": self.avg_bowl_price,
+            "total_revenue": round(float(self.frame["invoice_amount"].sum()), 2),
+            "total_bowls": int(self.frame["bowls"].sum()),
+            "zero_bowl_orders": len(self.zero_bowl_orders),
+            "high_price_threshold": round(self.high_price_threshold, 2),
+            "top_5_high_price_orders": self.high_price_orders[:5],
+        }
+
+
+def calculate_daily_metrics(target_date: str, *, engine: str = "auto"):
+    """
+    單日營運指標。
 
-    df["order_bowl_price"] = df.apply(
-        lambda row: row["invoice_amount"] / row["bowls"] if row["bowls"] else None,
-        axis=1,
+    engine="auto" 先數當日訂單數，少於 LITE_ENGINE_MAX_ORDERS 走純 Python 累加器，
+    否則走 pandas；兩者輸出相同（見 tests/test_daily_accumulator.py）。
+    engine="snapshot" 沿用 daily_snapshot 表的當日累加狀態，只折入新匯入的訂單。
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine}")
+    if engine == "auto":
+        engine = "lite" if count_orders(target_date, target_date) <= LITE_ENGINE_MAX_ORDERS else "pandas"
+    if engine == "lite":
+        return calculate_daily_metrics_lite(target_date)
+    if engine == "snapshot":
+        from daily_snapshot import calculate_daily_metrics_snapshot
+        return calculate_daily_metrics_snapshot(target_date)
+    return _calculate_daily_metrics_pandas(target_date)
+
+
+def _calculate_daily_metrics_pandas(target_date: str):
+    return calculate_daily_metrics_range(target_date, target_date)[0]
+
+
+def _date_range(start_date: str, end_date: str) -> list[str]:
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    return [(start + timedelta(days=offset)).isoformat() for offset in range((end - start).days + 1)]
+
+
+@traced()
+def _daily_totals(df, rules):
+    """
+    向量化計算各日計數與加總。
+
+    時段、通路、付款方式都以布林遮罩表示，遮罩與碗數相乘後做一次 groupby(日)；
+    不建立 lunch_df / pay_in_cash 之類的中間子表，也不逐列 apply。
+    回傳 (各日加總, 各日訂單數, (日, 小時) 出碗數)，日期 index 為 YYYY-MM-DD 字串。
+    """
+    import pandas as pd
+
+    moment = df["checkout_time"]
+    day = moment.dt.normalize()
+
+    # normalize_payment 只對 distinct 付款方式呼叫一次
+    payment_type = df["payment_method"].map(
+        {method: normalize_payment(method) for method in df["payment_method"].unique()}
     )
+    lunch = in_period_mask(moment, "lunch", rules)
+    dinner = in_period_mask(moment, "dinner", rules)
+    discounted = df["discount_amount"] > 0
+    bowls = df["bowls"]
+
+    proteins = list(rules.protein_rules)
+    columns = pd.DataFrame({
+        "revenue": df["invoice_amount"],
+        "bowls": bowls,
+        "lunch_orders": lunch,
+        "dinner_orders": dinner,
+        "lunch_bowls": bowls * lunch,
+        "dinner_bowls": bowls * dinner,
+        "dine_in_bowls": bowls * df["order_type"].isin(DINE_IN_TYPES),
+        "takeout_bowls": bowls * df["order_type"].isin(TAKEOUT_TYPES),
+        "cash_orders": payment_type == "Cash",
+        "linepay_orders": payment_type == "LinePay",
+        "discount_orders": discounted,
+        "discount_amount": df["discount_amount"].where(discounted, 0),
+        "cloud_kitchen_orders": df["order_source"] == CLOUD_KITCHEN_SOURCE,
+        **{protein: df[f"protein_bowls_{protein}"] for protein in proteins},
+    }, index=df.index)
+
+    per_day = columns.groupby(day)
+    totals = per_day.sum()
+    order_counts = per_day.size()
+    hour_bowls = bowls.groupby([day, moment.dt.hour]).sum()
+
+    labels = totals.index.strftime("%Y-%m-%d")
+    totals.index = labels
+    order_counts.index = labels
+    hour_bowls.index = hour_bowls.index.set_levels(
+        hour_bowls.index.levels[0].strftime("%Y-%m-%d"), level=0
+    )
+    return totals, order_counts, hour_bowls
+
 
-    total_revenue = float(df["invoice_amount"].sum())
-    total_bowls = int(df["bowls"].sum())
-    avg_bowl_price = round(total_revenue / total_bowls, 2) if total_bowls else 0
-
-    zero_bowl_orders = int((df["bowls"] == 0).sum())
-    high_price_threshold = avg_bowl_price * 1.2 if avg_bowl_price else 0
-    high_price_orders = df[
-        (df["bowls"] > 0) &
-        (df["order_bowl_price"] >= high_price_threshold)
-    ].sort_values("order_bowl_price", ascending=False)
-
-    return {
-        "date": target_date,
-        "avg_bowl_price": avg_bowl_price,
-        "total_revenue": round(total_revenue, 2),
-        "total_bowls": total_bowls,
-        "zero_bowl_orders": zero_bowl_orders,
-        "high_price_threshold": round(high_price_threshold, 2),
-        "top_5_high_price_orders": high_price_orders[
-            ["checkout_time", "invoice_amount", "bowls", "order_bowl_price", "items_text"]
-        ].head(5).to_dict(orient="records"),
-    }
-
-def calculate_daily_metrics(target_date: str):
-    # 優化 1: 增加 Current Status 過濾，避免計入作廢訂單
-    # 優化 2: 預先過濾欄位，減少記憶體佔用
-    df = _load_daily_order_frame(target_date)
+@traced()
+def calculate_daily_metrics_range(start_date: str, end_date: str) -> list:
+    """
+    區間內每一天的單日指標，等同 [calculate_daily_metrics(d) for d in 每一天]。
 
+    整段區間只查一次 DB、分類一次品項，再由 _daily_totals() 一次 groupby 算出各日的計數與加總，
+    填進 DailyAccumulator 後沿用同一份 to_daily_metrics() 組出 dict。
+    回傳清單與日期一一對應，沒有營業資料的日期為 None。
+    """
+    days = _date_range(start_date, end_date)
+    rules = current_rules()
+    df = _load_daily_order_frame(start_date, rules, end_date=end_date)
     if df.empty:
-        return None
-
-    # 2. 時間處理
-    df["hour"] = df["checkout_time"].dt.hour
-
-    # 3. 計算碗數 (主餐數)
-    total_bowls = df["bowls"].sum()
-
-    # 4. 區分時段
-    lunch_df = df[df["checkout_time"].apply(lambda x: is_in_period(x, "lunch"))]
-    dinner_df = df[df["checkout_time"].apply(lambda x: is_in_period(x, "dinner"))]
-    lunch_orders = lunch_df.shape[0]
-    dinner_orders = dinner_df.shape[0]
-
-    df["payment_type"] = df["payment_method"].apply(normalize_payment)
-
-    # 5. 計算指標
-    total_orders = len(df)
-    total_revenue = df["invoice_amount"].sum()
-
-    aov = total_revenue / total_orders if total_orders else 0
-
-    peak_hour_series = df.groupby(df["checkout_time"].dt.hour)["bowls"].sum()
-    top_hours = peak_hour_series.nlargest(2)  # 取前兩名
-    first_peak_hour = top_hours.index[0] if len(top_hours) >= 1 else None
-    first_peak_hour_bowls = top_hours.iloc[0] if len(top_hours) >= 1 else 0
-    first_peak_ratio = first_peak_hour_bowls / total_bowls if total_bowls else 0
-    second_peak_hour = top_hours.index[1] if len(top_hours) >= 2 else None
-    second_peak_hour_bowls = top_hours.iloc[1] if len(top_hours) >= 2 else 0
-    second_peak_ratio = second_peak_hour_bowls / total_bowls if total_bowls else 0
-
-    # 蛋白質碗數統計（關鍵字 + 碗）
-    protein_bowls = {
-        protein: int(df["items_text"].apply(lambda text: count_protein_bowls(text, protein)).sum())
-        for protein in PROTEIN_RULES
-    }
-
-    protein_series = pd.Series(protein_bowls)
-    top_proteins = protein_series.sort_values(ascending=False).head(2)
-
-    first_protein = top_proteins.index[0] if len(top_proteins) >= 1 else None
-    first_protein_bowls = int(top_proteins.iloc[0]) if len(top_proteins) >= 1 else 0
-    first_protein_ratio = first_protein_bowls / total_bowls if total_bowls else 0
-
-    second_protein = top_proteins.index[1] if len(top_proteins) >= 2 else None
-    second_protein_bowls = int(top_proteins.iloc[1]) if len(top_proteins) >= 2 else 0
-    second_protein_ratio = second_protein_bowls / total_bowls if total_bowls else 0
-
-    # 這裡建議改用精確匹配或定義映射表
-    dine_in_mask = df["order_type"].isin(["Dine In", "內用"])
-    takeout_mask = df["order_type"].isin(["Takeout", "外帶", "Delivery", "外送"])
-    dine_in_bowls = df[dine_in_mask]["bowls"].sum()
-    takeout_bowls = df[takeout_mask]["bowls"].sum()
-
-    pay_in_cash = df[df["payment_type"].isin(["Cash"])]
-    pay_in_LinePay = df[df["payment_type"].isin(["LinePay"])]
-    pay_in_cash_order_ratio = pay_in_cash.shape[0] / total_orders if total_orders else 0
-    pay_in_LinePay_order_ratio = pay_in_LinePay.shape[0] / total_orders if total_orders else 0
-
-    discount_orders = df[df["discount_amount"] > 0].shape[0]
-    discount_amount = df["discount_amount"].sum()
-
-    cloud_kitchen_orders = df[df["order_source"].isin(["Online Store"])].shape[0]
-    cloud_kitchen_ratio = cloud_kitchen_orders / total_orders if total_orders else 0
-
-    return {
-        "date": target_date,
-        "metrics": {
-            "revenue": round(total_revenue, 2),
-            "unit": "bowl",
-            "total_orders": total_orders,
-            "total_bowls": int(total_bowls),
-            "avg_bowl_price": round(total_revenue / total_bowls, 2) if total_bowls else 0,
-            "dine_in_bowls": dine_in_bowls,
-            "takeout_bowls": takeout_bowls,
-            "cloud_kitchen_orders": cloud_kitchen_orders,
-            "cloud_kitchen_ratio": '{:.2f}%'.format(cloud_kitchen_ratio * 100),
-        },
-        "periods": {
-            "lunch_bowls": int(lunch_df["bowls"].sum()),
-            "dinner_bowls": int(dinner_df["bowls"].sum()),
-        },
-        "operational": {
-            "first_peak_hour": f"{first_peak_hour}:00-{first_peak_hour+1}:00" if first_peak_hour is not None else "--",
-            "first_peak_hour_bowls": int(first_peak_hour_bowls) if first_peak_hour is not None else 0,
-            "first_peak_hour_ratio": round(first_peak_ratio, 2),
-            "second_peak_hour": f"{second_peak_hour}:00-{second_peak_hour+1}:00" if second_peak_hour is not None else "--",
-            "second_peak_hour_bowls": int(second_peak_hour_bowls) if second_peak_hour is not None else 0,
-            "second_peak_hour_ratio": round(second_peak_ratio, 2),
-            "protein_bowls": protein_series.sort_values(ascending=False).to_dict(),
-            "first_protein": first_protein,
-            "first_protein_bowls": first_protein_bowls,
-            "first_protein_ratio": round(first_protein_ratio, 2),
-            "second_protein": second_protein,
-            "second_protein_bowls": second_protein_bowls,
-            "second_protein_ratio": round(second_protein_ratio, 2),
-        },
-        "payments": {
-            "pay_in_cash_order_ratio": round(pay_in_cash_order_ratio, 2),
-            "pay_in_LinePay_order_ratio": round(pay_in_LinePay_order_ratio, 2),
-        },
-        "assumptions": {
-            "employee_meal_rule": "invoice_amount == 0",
-            "bowl_rule": "item name contains '碗' and not in exclude list",
-            "voided_rule": "order_status contains 'Voided'",
-            "business_hours_applied": BUSINESS_HOURS
-        }
-    }
+        return [None] * len(days)
+
+    return _results_from_totals(days, *_daily_totals(df, rules), rules)
+
+
+@traced()
+def _results_from_totals(days, totals, order_counts, hour_bowls, rules) -> list:
+    """把 _daily_totals() 的各日加總填進 DailyAccumulator，輸出單日指標 dict。"""
+    timeline = get_price_timeline()
+    proteins = list(rules.protein_rules)
+
+    results = []
+    for day in days:
+        if day not in totals.index:
+            results.append(None)
+            continue
+
+        row = totals.loc[day]
+        accumulator = DailyAccumulator(rules, timeline)
+        accumulator.total_orders = int(order_counts[day])
+        accumulator.revenue = float(row["revenue"])
+        accumulator.total_bowls = int(row["bowls"])
+        for field in (
+            "lunch_orders", "dinner_orders", "lunch_bowls", "dinner_bowls",
+            "dine_in_bowls", "takeout_bowls", "cash_orders", "linepay_orders",
+            "discount_orders", "cloud_kitchen_orders",
+        ):
+            setattr(accumulator, field, int(row[field]))
+        accumulator.discount_amount = float(row["discount_amount"])
+        accumulator.hour_bowls = {int(hour): int(value) for hour, value in hour_bowls.loc[day].items()}
+        accumulator.protein_bowls = {protein: int(row[protein]) for protein in proteins}
+        results.append(accumulator.to_daily_metrics(day))
+    return results
+
 
 if __name__ == "__main__":
-    from report_renderer import render_daily_report
+    from report_renderer import render_daily_range_report, render_daily_report
     parser = argparse.ArgumentParser()
-    parser.add_argument("--date", required=True, help="YYYY-MM-DD")
+    parser.add_argument("--date", help="YYYY-MM-DD")
+    parser.add_argument("--start", help="YYYY-MM-DD (with --end: every day of a range in one pass)")
+    parser.add_argument("--end", help="YYYY-MM-DD")
+    parser.add_argument("--engine", choices=ENGINES, default="auto", help="Calculation engine")
     parser.add_argument(
         "--debug-avg-bowl-price",
         action="store_true",
@@ -201,7 +277,18 @@ if __name__ == "__main__":
     )
     args = parser.parse_args()
 
-    result = calculate_daily_metrics(args.date)
+    if args.start or args.end:
+        if not (args.start and args.end) or args.date:
+            parser.error("use either --date or both --start and --end")
+        results = calculate_daily_metrics_range(args.start, args.end)
+        print(render_daily_range_report(_date_range(args.start, args.end), results))
+        raise SystemExit(0)
+    if not args.date:
+        parser.error("--date or --start/--end is required")
+
+    # 需要 diagnostics 時改用 DailyBundle，整天只載入一次
+    bundle = DailyBundle(args.date) if args.debug_avg_bowl_price else None
+    result = bundle.metrics if bundle else calculate_daily_metrics(args.date, engine=args.engine)
 
     if result is None:
         print("No data found for this date.")
@@ -209,6 +296,6 @@ if __name__ == "__main__":
         print(result)
         print(render_daily_report(result))
 
-    if args.debug_avg_bowl_price:
+    if bundle:
         print("avg_bowl_price diagnostics:")
-        print(calculate_avg_bowl_price_diagnostics(args.date))
+        print(bundle.diagnostics)
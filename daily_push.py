@@ -0,0 +1,228 @@
+"""
+打烊後自動推播當天的日報。
+
+排程器（見 scheduler.py）定期呼叫 push_daily_report()：晚餐時段結束（rules.json 的
+business_hours.dinner.end）再過 after_minutes 分鐘後，若當天的 CSV 已在打烊後匯入，
+就在背景算好 calculate_daily_metrics、把 render_daily_report 存進 daily_report 表並推播給
+ALLOWED_USER_IDS 與群組。之後的「分析 YYYY-MM-DD」直接回傳存好的報表。
+
+存好的報表以兩個版本判斷是否仍有效（metrics_common.state_version / data_version，同 weekly_snapshot）：
+- state_version：item_memo_version（規則 hash + 價格時間軸 fingerprint）
+- data_version：當天 raw_orders（與 modifier_summary）的筆數 / 最大 id，補匯入後即失效
+
+設定（環境變數）：
+- DAILY_PUSH_AFTER_MINUTES：晚餐結束後幾分鐘開始檢查（預設 60）
+- DAILY_PUSH_MIN_ORDERS：當天有效訂單（未作廢且金額 > 0）少於此數視為沒有資料、不推播（預設 1）
+- DAILY_PUSH_DEADLINE：到這個時間仍未匯入就放棄當天（預設 23:30）
+- DAILY_PUSH_IF_MISSING：放棄時 skip（安靜略過）或 remind（推播提醒上傳 CSV），預設 skip
+
+    python daily_push.py --date YYYY-MM-DD     # 算好並存起來（不推播），印出報表
+"""
+import argparse
+import os
+import sqlite3
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Optional
+
+import metrics_common
+from daily_metrics import calculate_daily_metrics
+from metrics_common import current_rules, data_version, state_version
+from report_renderer import render_daily_report
+from tracing import traced
+
+DAILY_REPORT_DDL = """
+    CREATE TABLE IF NOT EXISTS daily_report (
+        day TEXT PRIMARY KEY,
+        state_version TEXT NOT NULL,
+        data_version TEXT NOT NULL,
+        report TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        pushed_at TEXT
+    )
+"""
+
+MISSING_ACTIONS = ("skip", "remind")
+
+
+@dataclass(frozen=True)
+class PushSettings:
+    after_minutes: int = 60
+    min_orders: int = 1
+    deadline: time = time(23, 30)
+    if_missing: str = "skip"
+
+    @classmethod
+    def from_env(cls) -> "PushSettings":
+        if_missing = os.getenv("DAILY_PUSH_IF_MISSING", cls.if_missing)
+        if if_missing not in MISSING_ACTIONS:
+            raise ValueError(f"DAILY_PUSH_IF_MISSING must be one of {', '.join(MISSING_ACTIONS)}")
+        return cls(
+            after_minutes=int(os.getenv("DAILY_PUSH_AFTER_MINUTES", cls.after_minutes)),
+            min_orders=int(os.getenv("DAILY_PUSH_MIN_ORDERS", cls.min_orders)),
+            deadline=time.fromisoformat(os.getenv("DAILY_PUSH_DEADLINE", cls.deadline.isoformat("minutes"))),
+            if_missing=if_missing,
+        )
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(metrics_common.DB_PATH, timeout=30)
+    conn.execute(DAILY_REPORT_DDL)
+    return conn
+
+
+def _day_orders(conn: sqlite3.Connection, day: str) -> tuple[Optional[str], int]:
+    """(最晚 imported_at, 有效訂單數)；有效訂單同 preprocess_orders：未作廢且金額 > 0。"""
+    return conn.execute(
+        "SELECT MAX(imported_at), "
+        "COALESCE(SUM(invoice_amount > 0 AND order_status NOT LIKE '%Voided%'), 0) FROM raw_orders "
+        "WHERE checkout_time >= ? AND checkout_time < date(?, '+1 day')",
+        (day, day),
+    ).fetchone()
+
+
+def closing_time(day: date) -> datetime:
+    """當天晚餐時段的結束時間。"""
+    end = current_rules().business_hours["dinner"]["end"]
+    return datetime.combine(day, time.fromisoformat(end))
+
+
+def load_daily_report(day: str) -> Optional[str]:
+    """仍有效的日報文字；沒有存過或之後又匯入了訂單時回傳 None。"""
+    conn = _connect()
+    try:
+        row = conn.execute(
+            "SELECT state_version, data_version, report FROM daily_report WHERE day = ?", (day,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] != data_version(conn, day, day) or row[0] != state_version():
+            return None
+        return row[2]
+    finally:
+        conn.close()
+
+
+@traced()
+def build_daily_report(day: str) -> Optional[str]:
+    """計算並存起日報，回傳報表文字；當天沒有資料時回傳 None。"""
+    conn = _connect()
+    try:
+        state = state_version()
+        data = data_version(conn, day, day)
+
+        result = calculate_daily_metrics(day, engine="snapshot")
+        if result is None:
+            return None
+        report = render_daily_report(result)
+
+        conn.execute(
+            """
+            INSERT INTO daily_report (day, state_version, data_version, report, created_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (day) DO UPDATE SET
+              state_version = excluded.state_version, data_version = excluded.data_version,
+              report = excluded.report, created_at = excluded.created_at
+            """,
+            (day, state, data, report, datetime.now().isoformat(timespec="seconds")),
+        )
+        conn.commit()
+        return report
+    finally:
+        conn.close()
+
+
+def _claim_push(day: str, now: datetime) -> bool:
+    """條件式 UPDATE：多個 worker 同時檢查時只有一個會推播。"""
+    conn = _connect()
+    try:
+        claimed = conn.execute(
+            "UPDATE daily_report SET pushed_at = ? WHERE day = ? AND pushed_at IS NULL",
+            (now.isoformat(timespec="seconds"), day),
+        ).rowcount
+        conn.commit()
+        return claimed == 1
+    finally:
+        conn.close()
+
+
+def _release_push(day: str) -> None:
+    """推播失敗時放掉認領，下一次排程再試。"""
+    conn = _connect()
+    try:
+        conn.execute("UPDATE daily_report SET pushed_at = NULL WHERE day = ?", (day,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _send_claimed(send: Callable[[str], object], day: str, text: str) -> None:
+    try:
+        send(text)
+    except Exception:
+        _release_push(day)
+        raise
+
+
+def push_daily_report(send: Callable[[str], object], now: Optional[datetime] = None,
+                      settings: Optional[PushSettings] = None) -> Optional[str]:
+    """
+    排程工作：條件都滿足時推播當天日報並回傳 "pushed"，提醒時回傳 "reminded"，
+    其他情況（還沒到時間、尚未匯入、已推播過）回傳 None。send 丟出例外時放掉認領並往上丟，
+    排程器記為 error，下一次輪詢重試。
+    「已匯入」以當天訂單最晚的 imported_at 晚於晚餐結束時間判斷（營業中的上傳不算）。
+    """
+    now = now or datetime.now()
+    settings = settings or PushSettings.from_env()
+    day = now.date().isoformat()
+    closed_at = closing_time(now.date())
+    if now < closed_at + timedelta(minutes=settings.after_minutes):
+        return None
+
+    conn = _connect()
+    try:
+        pushed = conn.execute("SELECT 1 FROM daily_report WHERE day = ? AND pushed_at IS NOT NULL",
+                              (day,)).fetchone()
+        imported_at, valid_orders = _day_orders(conn, day)
+    finally:
+        conn.close()
+    if pushed:
+        return None
+
+    imported = imported_at is not None and imported_at >= closed_at.isoformat(timespec="seconds")
+    # 只有員工餐（金額 0）或作廢單的日子視為沒有資料
+    if imported and valid_orders < settings.min_orders:
+        return None
+    if not imported:
+        if now.time() < settings.deadline or settings.if_missing == "skip":
+            return None
+        # 以一筆空報表佔住當天，提醒只送一次
+        conn = _connect()
+        try:
+            conn.execute(
+                "INSERT OR IGNORE INTO daily_report (day, state_version, data_version, report, created_at) "
+                "VALUES (?, '', '', '', ?)",
+                (day, now.isoformat(timespec="seconds")),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        if not _claim_push(day, now):
+            return None
+        _send_claimed(send, day, f"⚠️ {day} 尚未匯入打烊後的 CSV，今天的日報沒有推播。上傳 Payment CSV 後可輸入「分析 {day}」。")
+        return "reminded"
+
+    report = load_daily_report(day) or build_daily_report(day)
+    if report is None or not _claim_push(day, now):
+        return None
+    _send_claimed(send, day, report)
+    return "pushed"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute and store the daily report that the bot pushes after closing")
+    parser.add_argument("--date", default=date.today().isoformat(), help="Day to compute (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    report = build_daily_report(args.date)
+    print(report if report else f"No orders on {args.date}.")
@@ -0,0 +1,147 @@
+"""
+單日累加器快照（intraday snapshot）。
+
+營業中會多次上傳 CSV 再查「分析 今天」。daily_snapshot 表保存每一天的
+DailyAccumulator 狀態與已折入的最大 raw_orders.id；之後只需把 id 更大的新訂單
+折進去，報表即為 O(新訂單) 的更新加上一次 render。
+
+state_version 為 item_memo_version（規則 hash + 價格時間軸 fingerprint）；
+規則或價格變動、或 raw_orders 被清空重建時，該日快照會從頭重算。
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+from datetime import datetime
+from typing import Iterable, Optional
+
+import bot_metrics
+import metrics_common
+from daily_accumulator import ORDER_COLUMNS, DailyAccumulator
+from metrics_common import (
+    current_rules,
+    flush_item_memo,
+    get_price_timeline,
+    item_memo_version,
+    load_item_memo,
+)
+from tracing import traced
+
+SNAPSHOT_DDL = """
+    CREATE TABLE IF NOT EXISTS daily_snapshot (
+        day TEXT PRIMARY KEY,
+        state_version TEXT NOT NULL,
+        last_order_id INTEGER NOT NULL,
+        state TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    )
+"""
+
+# 全新建立的日期：以 checkout_time 索引取整段區間
+_REBUILD_QUERY = f"""
+    SELECT id, {", ".join(ORDER_COLUMNS)}
+    FROM raw_orders
+    WHERE id <= ?
+      AND checkout_time >= ?
+      AND checkout_time < date(?, '+1 day')
+      AND order_status NOT LIKE '%Voided%'
+"""
+
+# 已有快照的日期：只掃 id 區間（+checkout_time 讓 SQLite 改走 rowid，成本與新訂單數成正比）
+_INCREMENTAL_QUERY = f"""
+    SELECT id, {", ".join(ORDER_COLUMNS)}
+    FROM raw_orders
+    WHERE id > ? AND id <= ?
+      AND +checkout_time >= ?
+      AND +checkout_time < date(?, '+1 day')
+      AND order_status NOT LIKE '%Voided%'
+"""
+
+
+def _fold(conn, query: str, params: tuple, accumulators: dict, last_ids: dict) -> None:
+    for order_id, *order in conn.execute(query, params):
+        day = str(order[0])[:10]
+        if day in accumulators and order_id > last_ids[day]:
+            accumulators[day].add(*order)
+
+
+@traced()
+def refresh_daily_snapshots(days: Iterable[str]) -> dict[str, DailyAccumulator]:
+    """
+    把各日快照更新到 raw_orders 目前的最大 id，回傳 {day: DailyAccumulator}。
+
+    所有日期共用一次快照讀取與至多兩次訂單查詢（重建 / 增量），
+    已是最新的日期不會碰到 raw_orders。
+    """
+    days = sorted(set(days))
+    if not days:
+        return {}
+
+    rules = current_rules()
+    timeline = get_price_timeline(refresh=True)
+    state_version = item_memo_version(timeline, rules)
+    load_item_memo(state_version)
+
+    # 多 worker 時可能與匯入或其他 worker 的快照寫入重疊，等寫鎖而不是立刻失敗
+    conn = sqlite3.connect(metrics_common.DB_PATH, timeout=30)
+    try:
+        conn.execute(SNAPSHOT_DDL)
+        max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM raw_orders").fetchone()[0]
+        stored = {
+            day: (version, last_order_id, state)
+            for day, version, last_order_id, state in conn.execute(
+                "SELECT day, state_version, last_order_id, state FROM daily_snapshot WHERE day BETWEEN ? AND ?",
+                (days[0], days[-1]),
+            )
+        }
+
+        accumulators: dict[str, DailyAccumulator] = {}
+        last_ids: dict[str, int] = {}
+        for day in days:
+            version, last_order_id, state = stored.get(day, (None, 0, None))
+            if version == state_version and last_order_id <= max_id:
+                accumulators[day] = DailyAccumulator.from_state(json.loads(state), rules, timeline)
+                last_ids[day] = last_order_id
+            else:
+                # 沒有快照、規則變了、或 raw_orders 被重建（id 倒退）：整天重算
+                accumulators[day] = DailyAccumulator(rules, timeline)
+                last_ids[day] = 0
+
+        stale = [day for day in days if last_ids[day] < max_id or day not in stored]
+        rebuild = [day for day in stale if last_ids[day] == 0]
+        incremental = [day for day in stale if last_ids[day] > 0]
+        for result, count in (("hit", len(days) - len(stale)), ("incremental", len(incremental)),
+                              ("rebuild", len(rebuild))):
+            if count:
+                bot_metrics.inc("pokebee_report_cache_total", count, cache="daily", result=result)
+        if rebuild:
+            pending = {day: accumulators[day] for day in rebuild}
+            _fold(conn, _REBUILD_QUERY, (max_id, rebuild[0], rebuild[-1]), pending, last_ids)
+        if incremental:
+            pending = {day: accumulators[day] for day in incremental}
+            low = min(last_ids[day] for day in incremental)
+            _fold(conn, _INCREMENTAL_QUERY, (low, max_id, incremental[0], incremental[-1]), pending, last_ids)
+
+        now = datetime.now().isoformat(timespec="seconds")
+        metrics_common.begin_write(conn, "daily_snapshot")
+        conn.executemany(
+            """
+            INSERT OR REPLACE INTO daily_snapshot (day, state_version, last_order_id, state, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            [
+                (day, state_version, max_id, json.dumps(accumulators[day].to_state(), ensure_ascii=False), now)
+                for day in stale
+            ],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    flush_item_memo(state_version)
+    return accumulators
+
+
+def calculate_daily_metrics_snapshot(target_date: str) -> Optional[dict]:
+    """與 calculate_daily_metrics 相同的輸出，但只折入上次快照之後的新訂單。"""
+    return refresh_daily_snapshots([target_date])[target_date].to_daily_metrics(target_date)
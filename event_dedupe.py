@@ -0,0 +1,106 @@
+"""
+LINE webhook 事件去重。
+
+callback 處理太慢時 LINE 會重送同一個 webhook（deliveryContext.isRedelivery），
+同一份 CSV 會被匯入兩次、同一份報表會被算兩次。每個事件以 webhookEventId 與
+message id 兩把 key 記在 SQLite 的 webhook_events 表（重啟後仍有效），任一把
+key 在 TTL 內出現過就視為重送，handler 在做任何重工作之前就略過；
+略過次數依事件種類累計在 webhook_dedupe_stats 表。
+
+    python event_dedupe.py stats
+"""
+import argparse
+import sqlite3
+import time
+from typing import Optional
+
+import metrics_common
+
+EVENTS_DDL = """
+    CREATE TABLE IF NOT EXISTS webhook_events (
+        event_key TEXT PRIMARY KEY,
+        received_at REAL NOT NULL
+    )
+"""
+
+STATS_DDL = """
+    CREATE TABLE IF NOT EXISTS webhook_dedupe_stats (
+        kind TEXT PRIMARY KEY,
+        suppressed INTEGER NOT NULL DEFAULT 0
+    )
+"""
+
+# LINE 重送的時間窗遠小於一天；過期的 key 在下次認領時順手清掉
+DEDUPE_TTL_SECONDS = 24 * 3600
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(metrics_common.DB_PATH, timeout=30)
+    conn.execute(EVENTS_DDL)
+    conn.execute(STATS_DDL)
+    return conn
+
+
+def event_keys(event) -> list[str]:
+    """事件的去重 key：webhookEventId 與 message id（舊版 webhook 可能缺其中之一）。"""
+    keys = []
+    if getattr(event, "webhook_event_id", None):
+        keys.append(f"event:{event.webhook_event_id}")
+    message = getattr(event, "message", None)
+    if getattr(message, "id", None):
+        keys.append(f"message:{message.id}")
+    return keys
+
+
+def claim_event(keys: list[str], kind: str, *, now: Optional[float] = None,
+                ttl_seconds: int = DEDUPE_TTL_SECONDS) -> bool:
+    """
+    第一次看到這些 key 時記下並回傳 True；TTL 內任一 key 已出現過則累計 kind 的
+    略過次數並回傳 False。沒有任何 key 的事件無法去重，一律放行。
+    """
+    if not keys:
+        return True
+    now = time.time() if now is None else now
+    conn = _connect()
+    try:
+        # 先取得寫鎖：兩個 worker 同時收到同一事件時，查詢與寫入不會交錯
+        metrics_common.begin_write(conn, "dedupe")
+        conn.execute("DELETE FROM webhook_events WHERE received_at < ?", (now - ttl_seconds,))
+        placeholders = ", ".join("?" * len(keys))
+        seen = conn.execute(
+            f"SELECT COUNT(*) FROM webhook_events WHERE event_key IN ({placeholders})", keys
+        ).fetchone()[0]
+        if seen:
+            conn.execute("INSERT OR IGNORE INTO webhook_dedupe_stats (kind) VALUES (?)", (kind,))
+            conn.execute("UPDATE webhook_dedupe_stats SET suppressed = suppressed + 1 WHERE kind = ?", (kind,))
+        else:
+            conn.executemany(
+                "INSERT OR IGNORE INTO webhook_events (event_key, received_at) VALUES (?, ?)",
+                [(key, now) for key in keys],
+            )
+        conn.commit()
+        return not seen
+    finally:
+        conn.close()
+
+
+def dedupe_stats() -> dict[str, int]:
+    """{kind: 略過的重送次數}"""
+    conn = _connect()
+    try:
+        return dict(conn.execute("SELECT kind, suppressed FROM webhook_dedupe_stats ORDER BY kind"))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect webhook redelivery deduplication")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="Print suppressed duplicates per event kind")
+    args = parser.parse_args()
+
+    stats = dedupe_stats()
+    for kind, suppressed in stats.items():
+        print(f"{kind}: {suppressed} duplicate(s) suppressed")
+    if not stats:
+        print("No duplicates suppressed yet.")
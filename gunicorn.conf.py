@@ -0,0 +1,50 @@
+"""
+正式環境的多 worker 啟動設定（取代 Flask 開發伺服器）：
+
+    gunicorn -c gunicorn.conf.py
+
+- 多個 worker 行程，一個慢的週報不會擋住其他 webhook
+- preload_app：master 先載入 line_bot_app 並跑完暖機（startup.warm_up），
+  fork 出來的 worker 直接共用已載入的模組與快取，一啟動就是 ready
+- 各 worker 之間透過 SQLite 共用報表快取（daily_snapshot / weekly_snapshot）與排程表
+  （scheduled_jobs 的條件式 UPDATE 保證同一工作只有一個 worker 執行）；
+  DB 切成 WAL，匯入 CSV 以 metrics_common.import_lock 檔案鎖跨行程序列化
+"""
+import os
+
+wsgi_app = "line_bot_app:app"
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "3"))
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", "2"))
+# 月報 / 季報現場計算與大型 CSV 匯入可能超過預設的 30 秒
+timeout = 120
+preload_app = True
+accesslog = "-"
+
+
+def when_ready(server):
+    # 在 fork worker 之前執行：暖機結果（已 import 的模組、規則、item memo）由所有 worker 繼承
+    import bot_metrics
+    import metrics_common
+    import startup
+
+    journal_mode = metrics_common.enable_wal()
+    if os.getenv("WARMUP_ON_START", "1") == "1":
+        server.log.info("Warming up before forking workers")
+        server.log.info(startup.render_startup_report(startup.warm_up()))
+    else:
+        startup.STATE.mark_ready()
+    server.log.info(f"SQLite journal_mode={journal_mode}")
+    # 暖機期間累積的指標先寫出，否則會被每個 fork 出的 worker 各算一次
+    bot_metrics.flush(force=True)
+
+
+def post_fork(server, worker):
+    import bot_metrics
+
+    # 執行緒不會跟著 fork：每個 worker 各自啟動指標寫出與排程器；排程工作實際由 DB 認領決定
+    bot_metrics.start_flusher()
+    if os.getenv("SCHEDULER_ENABLED", "1") == "1":
+        from line_bot_app import scheduler
+        scheduler.start()
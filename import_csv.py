@@ -1,9 +1,26 @@
+"""
+匯入 iCHEF Payment_Void Record CSV 到 raw_orders。
+
+CSV 以串流方式逐列解析、邊解析邊寫入，不經 pandas：
+- import_csv(path)：讀本機檔案（CLI）
+- import_csv_stream(chunks, save_path)：LINE 上傳時，下載的 chunk 同時寫檔、算 sha256、
+  餵給 CSV parser，整份內容只經手一次；超過 max_bytes 立即中止並丟棄已寫入的列
+
+    python import_csv.py --file "Payment_Void Record_YYYY-MM-DD.csv"
+"""
 import argparse
-import pandas as pd
+import codecs
+import csv
+import hashlib
 import sqlite3
+import time
 from datetime import datetime
 from pathlib import Path
-from metrics_common import DB_PATH
+from typing import Iterable, Iterator, Optional
+
+import bot_metrics
+from metrics_common import DB_PATH, begin_write, import_lock
+from tracing import traced
 
 COLUMN_MAP = {
     "Receipt number": "invoice_number",
@@ -18,86 +35,219 @@ COLUMN_MAP = {
     "items": "items_text"
 }
 
+INSERT_COLUMNS = ["source_file", "imported_at", *COLUMN_MAP.values()]
 
-def import_csv(csv_path: str):
-    csv_path = Path(csv_path)
-    if not csv_path.exists():
-        raise FileNotFoundError(csv_path)
+_INSERT_SQL = f"""
+    INSERT OR IGNORE INTO raw_orders ({", ".join(INSERT_COLUMNS)})
+    VALUES ({", ".join("?" * len(INSERT_COLUMNS))})
+"""
 
-    df = pd.read_csv(csv_path)
+# LINE 上傳的單檔上限；一個月的 Payment CSV 約 1–2 MB
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
 
-    # only keep columns we care about
-    df = df[list(COLUMN_MAP.keys())].rename(columns=COLUMN_MAP)
+# fromisoformat 之外 iCHEF 匯出可能出現的時間格式
+_TIME_FORMATS = ("%Y/%m/%d %H:%M:%S", "%Y/%m/%d %H:%M")
 
-    # normalize time; drop rows where date cannot be parsed
-    df["checkout_time"] = pd.to_datetime(df["checkout_time"], errors="coerce")
-    df = df.dropna(subset=["checkout_time"])
-    df["checkout_time"] = df["checkout_time"].astype(str)
 
-    # add metadata
-    df["source_file"] = csv_path.name
-    df["imported_at"] = datetime.now().isoformat(timespec="seconds")
+class UploadTooLarge(ValueError):
+    pass
 
-    conn = sqlite3.connect(DB_PATH)
+
+def _checkout_time(text: str) -> Optional[str]:
+    """正規化成 YYYY-MM-DD HH:MM:SS；無法解析時回傳 None（該列略過）。"""
+    text = text.strip()
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        for fmt in _TIME_FORMATS:
+            try:
+                parsed = datetime.strptime(text, fmt)
+                break
+            except ValueError:
+                continue
+        else:
+            return None
+    return parsed.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def tee_chunks(chunks: Iterable[bytes], save_path: Path, hasher, timings: dict,
+               max_bytes: int = MAX_UPLOAD_BYTES) -> Iterator[bytes]:
+    """邊下載邊寫檔與雜湊，原樣往下游傳；等待與寫檔時間記在 timings["download"]。"""
+    size = 0
+    with open(save_path, "wb") as f:
+        iterator = iter(chunks)
+        while True:
+            started = time.perf_counter()
+            chunk = next(iterator, None)
+            if chunk is not None:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"File exceeds {max_bytes // (1024 * 1024)} MB limit")
+                f.write(chunk)
+                hasher.update(chunk)
+            timings["download"] += time.perf_counter() - started
+            if chunk is None:
+                timings["bytes"] = size
+                return
+            yield chunk
+
+
+def save_upload(chunks: Iterable[bytes], save_path: Path, max_bytes: int = MAX_UPLOAD_BYTES) -> str:
+    """只存檔（modifier / 打卡 CSV），同樣受 max_bytes 限制；回傳 sha256。"""
+    hasher = hashlib.sha256()
+    try:
+        for _ in tee_chunks(chunks, save_path, hasher, {"download": 0.0}, max_bytes):
+            pass
+    except UploadTooLarge:
+        Path(save_path).unlink(missing_ok=True)
+        raise
+    return hasher.hexdigest()
+
+
+def _decode_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """bytes chunk → 保留換行的文字行（chunk 邊界切在多位元組字元或行中間也沒關係）。"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+@traced()
+def _import_lines(lines: Iterable[str], source_file: str, timings: dict) -> tuple[int, int, set]:
+    """
+    逐列解析並 INSERT OR IGNORE，回傳 (inserted, skipped, inserted_days)。
+    全部在同一個交易內，途中出錯（如檔案過大）不會留下半份資料。
+    """
+    imported_at = datetime.now().isoformat(timespec="seconds")
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        raise ValueError("CSV is empty")
+
+    # only keep columns we care about
+    missing = [column for column in COLUMN_MAP if column not in header]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    indexes = [header.index(column) for column in COLUMN_MAP]
+    time_position = list(COLUMN_MAP.values()).index("checkout_time")
+
+    conn = sqlite3.connect(DB_PATH, timeout=30)
     cur = conn.cursor()
 
     inserted = 0
     skipped = 0
+    inserted_days = set()
 
     try:
-        for _, row in df.iterrows():
+        begin_write(conn, "import")
+        for row in reader:
+            if not any(row):
+                continue
+            values = [(row[index] or None) if index < len(row) else None for index in indexes]
+            # normalize time; drop rows where date cannot be parsed
+            checkout_time = _checkout_time(values[time_position] or "")
+            if checkout_time is None:
+                continue
+            values[time_position] = checkout_time
+
+            started = time.perf_counter()
             try:
-                cur.execute(
-                    """
-                    INSERT OR IGNORE INTO raw_orders (
-                        source_file,
-                        imported_at,
-                        invoice_number,
-                        order_id,
-                        checkout_time,
-                        order_source,
-                        order_type,
-                        discount_amount,
-                        invoice_amount,
-                        payment_method,
-                        order_status,
-                        items_text
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    tuple(row[col] for col in [
-                        "source_file",
-                        "imported_at",
-                        "invoice_number",
-                        "order_id",
-                        "checkout_time",
-                        "order_source",
-                        "order_type",
-                        "discount_amount",
-                        "invoice_amount",
-                        "payment_method",
-                        "order_status",
-                        "items_text"
-                    ])
-                )
-                if cur.rowcount == 0:
-                    skipped += 1
-                else:
-                    inserted += 1
-            except Exception as e:
+                cur.execute(_INSERT_SQL, (source_file, imported_at, *values))
+            except sqlite3.Error as e:
                 print(f"Error inserting row: {e}")
-
+                continue
+            finally:
+                timings["insert"] += time.perf_counter() - started
+            if cur.rowcount == 0:
+                skipped += 1
+            else:
+                inserted += 1
+                inserted_days.add(checkout_time[:10])
+
+        started = time.perf_counter()
         conn.commit()
+        timings["insert"] += time.perf_counter() - started
     finally:
         conn.close()
+    return inserted, skipped, inserted_days
+
+
+@traced()
+def _refresh_snapshots(inserted_days: set) -> None:
+    # 只把新插入的訂單折進各日快照（分析 今天 不必重算整天）；失敗不影響匯入本身
+    if inserted_days:
+        try:
+            from daily_snapshot import refresh_daily_snapshots
+            refresh_daily_snapshots(inserted_days)
+        except sqlite3.Error as e:
+            print(f"Snapshot update skipped: {e}")
+
+
+# 多 worker 時同一時間只有一個匯入在寫 DB
+@traced()
+@import_lock()
+def import_csv(csv_path: str):
+    csv_path = Path(csv_path)
+    if not csv_path.exists():
+        raise FileNotFoundError(csv_path)
+
+    timings = {"insert": 0.0}
+    started = time.perf_counter()
+    with open(csv_path, "rb") as f:
+        chunks = iter(lambda: f.read(CHUNK_SIZE), b"")
+        inserted, skipped, inserted_days = _import_lines(_decode_lines(chunks), csv_path.name, timings)
+    bot_metrics.record_import("payment", inserted, skipped, time.perf_counter() - started)
+
+    _refresh_snapshots(inserted_days)
 
     print(f"Import finished: inserted={inserted}, skipped={skipped}")
     return f"Import finished: inserted={inserted}, skipped={skipped}"
 
 
+@traced()
+@import_lock()
+def import_csv_stream(chunks: Iterable[bytes], save_path, *, max_bytes: int = MAX_UPLOAD_BYTES) -> str:
+    """
+    上傳串流一次走完：寫檔 + sha256 + 解析 + 寫入。回傳匯入結果與各階段耗時：
+    download（等待下載與寫檔）、parse（解碼與 CSV 解析）、insert（SQLite 寫入與 commit）。
+    """
+    save_path = Path(save_path)
+    hasher = hashlib.sha256()
+    timings = {"download": 0.0, "insert": 0.0, "bytes": 0}
+
+    started = time.perf_counter()
+    try:
+        lines = _decode_lines(tee_chunks(chunks, save_path, hasher, timings, max_bytes))
+        inserted, skipped, inserted_days = _import_lines(lines, save_path.name, timings)
+    except UploadTooLarge:
+        save_path.unlink(missing_ok=True)
+        raise
+    total = time.perf_counter() - started
+    parse = max(total - timings["download"] - timings["insert"], 0.0)
+    bot_metrics.record_import("payment", inserted, skipped, total)
+
+    _refresh_snapshots(inserted_days)
+
+    summary = f"Import finished: inserted={inserted}, skipped={skipped}"
+    detail = (
+        f"{timings['bytes'] / 1024:.1f} KB sha256={hasher.hexdigest()[:12]} | "
+        f"download {timings['download'] * 1000:.0f} ms, parse {parse * 1000:.0f} ms, "
+        f"insert {timings['insert'] * 1000:.0f} ms"
+    )
+    print(f"{summary} ({detail})")
+    return f"{summary}\n{detail}"
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--file", required=True, help="Path to iCHEF CSV file")
     args = parser.parse_args()
 
     import_csv(args.file)
-
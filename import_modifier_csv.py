@@ -2,11 +2,18 @@ import argparse
 import re
 import pandas as pd
 import sqlite3
+import time
 from pathlib import Path
 from datetime import datetime
-from metrics_common import DB_PATH
+import bot_metrics
+from metrics_common import DB_PATH, import_lock, sync_modifier_proteins
+from tracing import span, traced
 
+# 多 worker 時同一時間只有一個匯入在寫 DB
+@traced()
+@import_lock()
 def import_modifier_csv(csv_path: str):
+    started = time.perf_counter()
     csv_path = Path(csv_path)
 
     if not csv_path.exists():
@@ -18,7 +25,8 @@ def import_modifier_csv(csv_path: str):
 
     start_date, end_date = match.groups()
 
-    df = pd.read_csv(csv_path)
+    with span("read_csv"):
+        df = pd.read_csv(csv_path)
 
     # 保留完整 modifier 資料，避免在 import 階段就丟失可追溯資訊。
     # 後續蛋白質相關報表再依 PROTEIN_RULES / PROTEIN_KEYWORDS 篩選。
@@ -70,6 +78,9 @@ def import_modifier_csv(csv_path: str):
             ))
             inserted += 1
 
+        # 匯入時就把新品名對應到蛋白質 key，週報直接在 SQL 端 GROUP BY protein_key
+        sync_modifier_proteins(conn)
+
         conn.commit()
     except Exception:
         conn.rollback()
@@ -77,6 +88,7 @@ def import_modifier_csv(csv_path: str):
     finally:
         conn.close()
 
+    bot_metrics.record_import("modifier", inserted, 0, time.perf_counter() - started)
     print(f"Modifier import finished: rows={inserted}")
     return f"Modifier import finished: rows={inserted}"
 
@@ -1,77 +1,99 @@
+from __future__ import annotations
+
+import json
+import math
+import os
 import sqlite3
-from datetime import date as _date_type
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import Iterable, Optional
-import pandas as pd
-
-# --- 設定區：未來更動這裡即可 ---
-BUSINESS_HOURS = {
-    "lunch": {"start": "11:00", "end": "14:30"},
-    "dinner": {"start": "16:30", "end": "20:00"},
-}
-
-# 定義碗關鍵字與排除清單
-BOWLS_KEYWORDS = ["碗"]
-EXCLUDE_ITEMS = ["提袋", "加購"]
-
-# 基準價格表（原價，未折扣）
-BOWL_BASE_PRICES = {
-    "雞胸肉自選碗": 160,
-    "壽喜燒豬自選碗": 160,
-    "鮮蝦自選碗": 170,
-    "嚴選生鮭魚自選碗": 190,
-    "生鮪魚自選碗": 180,
-    "豆腐自選碗": 125,
-    "均衡經典碗": 170,
-    "高蛋白健身碗": 220,
-    "清爽佛陀碗": 130,
-    "海味雙魚碗": 260,
-}
-
-# 試營運折扣：2026/3/31 前全單 9 折，4/1 起恢復原價
-DISCOUNT_END_DATE = _date_type(2026, 3, 31)
+from typing import TYPE_CHECKING, Iterable, Iterator, NamedTuple, Optional
 
-def get_discount_factor(order_date) -> float:
-    """依訂單日期回傳折扣係數（試營運 9 折 or 原價）。"""
-    if isinstance(order_date, str):
-        order_date = _date_type.fromisoformat(order_date)
-    if hasattr(order_date, 'date'):
-        order_date = order_date.date()
-    return 0.9 if order_date <= DISCOUNT_END_DATE else 1.0
-
-# 常見加購價格（可依營運實際價格調整）
-KNOWN_ADDON_PRICES = [15, 30, 50, 60, 70, 80, 90]
-MAX_ADDON_PER_BOWL = 220
-# ----------------------------
-
-# 蛋白質辨識規則
-PROTEIN_RULES = {
-    "chicken": ["雞胸肉"],
-    "pork": ["壽喜燒豬"],
-    "tofu": ["豆腐"],
-    "shrimp": ["鮮蝦"],
-    "salmon": ["鮭魚"],
-    "tuna": ["鮪魚"],
-}
-PROTEIN_KEYWORDS = [keyword for sublist in PROTEIN_RULES.values() for keyword in sublist]
-# ----------------------------
-
-SET_MEAL_RULES = {
-    "均衡經典碗": {"chicken": 1},
-    "高蛋白健身碗": {"chicken": 2},
-    "清爽佛陀碗": {"tofu": 1},
-    "海味雙魚碗": {"salmon": 1, "tuna": 1},
-}
+# pandas 延後到真正需要 DataFrame 時才載入：小量的單日報表可以完全不碰 pandas
+if TYPE_CHECKING:
+    import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows：只做行程內互斥
+    fcntl = None
+
+import bot_metrics
+from price_timeline import PriceSegment, PriceTimeline, load_entries
+from rule_set import RuleSet, RuleSetSource
+from tracing import traced
 
 _PROJECT_ROOT = Path(__file__).resolve().parent
 DB_PATH = str(_PROJECT_ROOT / "data" / "db" / "ichef.db")
 
+# --- 設定區：營業時間、碗 / 蛋白質 / 套餐規則、原價與促銷都寫在 rules.json ---
+# 存檔後執行中的 bot 會在幾秒內自動換上新規則，不必改程式或重啟。
+RULES_PATH = os.getenv("POKEBEE_RULES_PATH", str(_PROJECT_ROOT / "rules.json"))
+_RULE_SOURCE = RuleSetSource(RULES_PATH)
+_ACTIVE_RULES: Optional[RuleSet] = None
+
+
+def current_rules() -> RuleSet:
+    """目前生效的 RuleSet；設定檔變更時自動熱切換。"""
+    rule_set = _RULE_SOURCE.current()
+    if rule_set is not _ACTIVE_RULES:
+        _publish_rule_set(rule_set)
+    return rule_set
+
+
+def override_rules(rule_set: Optional[RuleSet]) -> Optional[RuleSet]:
+    """暫時改用指定的 RuleSet（None 還原為 rules.json）；回傳先前的 override。"""
+    previous = _RULE_SOURCE.override(rule_set)
+    current_rules()
+    return previous
+
+
+def _publish_rule_set(rule_set: RuleSet) -> None:
+    # 保留舊的模組常數名稱給既有呼叫端，內容一律來自目前的 RuleSet
+    global _ACTIVE_RULES, BUSINESS_HOURS, BOWLS_KEYWORDS, EXCLUDE_ITEMS, BOWL_BASE_PRICES
+    global KNOWN_ADDON_PRICES, MAX_ADDON_PER_BOWL, PROTEIN_RULES, PROTEIN_KEYWORDS, SET_MEAL_RULES
+
+    mapping = rule_set.to_mapping()
+    BUSINESS_HOURS = mapping["business_hours"]
+    BOWLS_KEYWORDS = mapping["bowls_keywords"]
+    EXCLUDE_ITEMS = mapping["exclude_items"]
+    BOWL_BASE_PRICES = mapping["bowl_base_prices"]
+    KNOWN_ADDON_PRICES = mapping["known_addon_prices"]
+    MAX_ADDON_PER_BOWL = mapping["max_addon_per_bowl"]
+    PROTEIN_RULES = mapping["protein_rules"]
+    PROTEIN_KEYWORDS = list(rule_set.protein_keywords)
+    SET_MEAL_RULES = mapping["set_meal_rules"]
+
+    if _ACTIVE_RULES is not None and _ACTIVE_RULES.hash != rule_set.hash:
+        print(f"🔄 已套用新規則 {rule_set.hash}（{rule_set.source}）")
+    _ACTIVE_RULES = rule_set
+
+
+current_rules()
+
+
+def get_discount_factor(order_date) -> float:
+    """依訂單日期回傳折扣係數（查 price_timeline）。"""
+    return get_price_timeline().discount_factor(order_date)
+
 def is_in_period(dt, period_name: str) -> bool:
     """判斷時間是否在設定的營業時間內"""
-    start = pd.to_datetime(BUSINESS_HOURS[period_name]["start"]).time()
-    end = pd.to_datetime(BUSINESS_HOURS[period_name]["end"]).time()
+    start, end = current_rules().period_bounds[period_name]
     return start <= dt.time() <= end
 
+def in_period_mask(checkout_time: pd.Series, period_name: str, rules: Optional[RuleSet] = None) -> pd.Series:
+    """is_in_period 的向量化版本：checkout_time 為 datetime Series，回傳布林 Series。"""
+    import pandas as pd
+
+    start, end = (rules or current_rules()).period_bounds[period_name]
+    time_of_day = checkout_time - checkout_time.dt.normalize()
+    return time_of_day.between(
+        pd.Timedelta(hours=start.hour, minutes=start.minute, seconds=start.second),
+        pd.Timedelta(hours=end.hour, minutes=end.minute, seconds=end.second),
+    )
+
 def normalize_payment(payment_method: Optional[str]) -> str:
     if not payment_method:
         return "Other"
@@ -86,11 +108,8 @@ def _split_items(items_text: str):
         return []
     return [item.strip() for item in items_text.split(",") if item.strip()]
 
-def _is_valid_bowl_item(item: str) -> bool:
-    return (
-        any(keyword in item for keyword in BOWLS_KEYWORDS)
-        and not any(excluded in item for excluded in EXCLUDE_ITEMS)
-    )
+def _is_valid_bowl_item(item: str, rules: Optional[RuleSet] = None) -> bool:
+    return (rules or current_rules()).is_valid_bowl_item(item)
 
 def count_bowls(items_text: str) -> int:
     """基礎碗數計算（每個項目算 1 碗，不考慮數量）"""
@@ -104,19 +123,20 @@ def infer_quantity_from_price(item_name: str, price: float, order_date=None) ->
     如果價格是基準價格的整數倍（允許 ±5 元誤差），返回數量；否則返回 1。
     這樣可以正確處理「客人點了 3 碗一樣的雞胸肉」的情況。
     """
-    # 找到對應的基準價格
-    base_price = None
-    for bowl_name, bp in BOWL_BASE_PRICES.items():
-        if bowl_name in item_name:
-            base_price = bp
-            break
+    rules = current_rules()
+    segment = get_price_timeline().segment_at(order_date if order_date is not None else rules.default_pricing_date)
+    return _infer_quantity(item_name, price, segment, rules)
+
+
+def _infer_quantity(item_name: str, price: float, segment: PriceSegment, rules: RuleSet) -> int:
+    # 找到當時生效的基準價格
+    base_price = segment.base_price_for(item_name)
 
     if base_price is None:
         return 1  # 未知品項，預設 1
 
     # 計算理論上的原價
-    discount = get_discount_factor(order_date if order_date is not None else DISCOUNT_END_DATE)
-    original_price = price / discount
+    original_price = price / segment.discount
     tolerance = 5
 
     # 嘗試由高到低推 quantity，盡量捕捉「同款多碗 + 每碗相同加購」的情境
@@ -131,32 +151,36 @@ def infer_quantity_from_price(item_name: str, price: float, order_date=None) ->
         if abs(addon_per_bowl) <= tolerance:
             return quantity
 
-        if addon_per_bowl > MAX_ADDON_PER_BOWL:
+        if addon_per_bowl > rules.max_addon_per_bowl:
             continue
 
-        if _is_plausible_addon_amount(addon_per_bowl, tolerance=2):
+        if _is_plausible_addon_amount(addon_per_bowl, tolerance=2, rules=rules):
             return quantity
 
     return 1  # fallback：保守視為 1 碗
 
 
-def _is_plausible_addon_amount(amount: float, *, tolerance: int = 5) -> bool:
+def _is_plausible_addon_amount(amount: float, *, tolerance: int = 5, rules: Optional[RuleSet] = None) -> bool:
     """判斷加購金額是否可能由常見加購單價組合而成。"""
     if amount < 0:
         return False
 
+    rules = rules or current_rules()
     target = int(round(amount))
     # 無界背包：檢查是否可由常見加購價格湊出 target（允許 ±tolerance）
-    reachable = [False] * (target + tolerance + 1)
-    reachable[0] = True
-
-    for subtotal in range(len(reachable)):
-        if not reachable[subtotal]:
-            continue
-        for addon_price in KNOWN_ADDON_PRICES:
-            next_total = subtotal + addon_price
-            if next_total < len(reachable):
-                reachable[next_total] = True
+    # RuleSet 已預先算好常用範圍，超出範圍才即時計算
+    reachable = rules.addon_reachable
+    if target + tolerance >= len(reachable):
+        reachable = [False] * (target + tolerance + 1)
+        reachable[0] = True
+
+        for subtotal in range(len(reachable)):
+            if not reachable[subtotal]:
+                continue
+            for addon_price in rules.known_addon_prices:
+                next_total = subtotal + addon_price
+                if next_total < len(reachable):
+                    reachable[next_total] = True
 
     low = max(0, target - tolerance)
     high = min(len(reachable) - 1, target + tolerance)
@@ -169,110 +193,564 @@ def count_bowls_smart(items_text: str, order_date=None) -> int:
     從價格推斷是否為多份同一品項，能正確處理：
     - 雞胸肉自選碗 $432 → 3 碗（160 × 3 × 0.9，試營運期間）
     - 雞胸肉自選碗 $480 → 3 碗（160 × 3，正式營運）
-    """
-    items = _split_items(items_text)
-    total_bowls = 0
 
-    for item in items:
-        if not _is_valid_bowl_item(item):
-            continue
-
-        # 解析價格
-        if "$" in item:
-            try:
-                name, price_str = item.rsplit("$", 1)
-                price = float(price_str)
-                quantity = infer_quantity_from_price(name.strip(), price, order_date)
-                total_bowls += quantity
-            except ValueError:
-                total_bowls += 1  # 解析失敗，算 1 碗
-        else:
-            total_bowls += 1  # 沒有價格資訊，算 1 碗
-
-    return total_bowls
+    每個品項的推斷結果會存進 item memo，重複出現的品項不再重算。
+    """
+    rules = current_rules()
+    order_date = order_date if order_date is not None else rules.default_pricing_date
+    return sum(cls.quantity for cls in classify_order_items(items_text, order_date, rules=rules))
 
 def filter_protein_bowls(items_text: str) -> list[str]:
+    rules = current_rules()
     items = _split_items(items_text)
-    return [item for item in items if _is_valid_bowl_item(item) and any(keyword in item for keyword in PROTEIN_KEYWORDS)]
+    return [
+        item
+        for item in items
+        if rules.is_valid_bowl_item(item) and rules.protein_keyword_matcher.search(item)
+    ]
 
 def count_protein_bowls(items_text: str, protein_key: str) -> int:
     """計算指定蛋白質的碗數（需符合蛋白質關鍵字 + 碗，且排除非主餐項目）"""
-    required_keywords = PROTEIN_RULES[protein_key]
+    rules = current_rules()
+    matcher = rules.protein_matchers[protein_key]
     items = _split_items(items_text)
     return sum(
         1
         for item in items
-        if _is_valid_bowl_item(item)
-        and all(keyword in item for keyword in required_keywords)
+        if rules.is_valid_bowl_item(item)
+        and matcher.match(item)
     )
 
 def filter_protein_non_bowls(items_text: str) -> list[str]:
+    rules = current_rules()
     items = _split_items(items_text)
     return [
         item
         for item in items
-        if not _is_valid_bowl_item(item)
-        and any(keyword in item for keyword in PROTEIN_KEYWORDS)
+        if not rules.is_valid_bowl_item(item)
+        and rules.protein_keyword_matcher.search(item)
     ]
 
 def count_protein_non_bowls(items_text: str, protein_key: str) -> int:
-    required_keywords = PROTEIN_RULES[protein_key]
+    rules = current_rules()
+    matcher = rules.protein_matchers[protein_key]
     items = _split_items(items_text)
     return sum(
         1
         for item in items
-        if not _is_valid_bowl_item(item)
-        and all(keyword in item for keyword in required_keywords)
+        if not rules.is_valid_bowl_item(item)
+        and matcher.match(item)
     )
 
 def count_set_meal_proteins(items_text: str) -> dict[str, int]:
+    rules = current_rules()
     items = _split_items(items_text)
-    protein_counts = {protein: 0 for protein in PROTEIN_RULES}  # 初始化
+    protein_counts = {protein: 0 for protein in rules.protein_rules}  # 初始化
 
     for item in items:
-        for meal_name, protein_map in SET_MEAL_RULES.items():
-            if meal_name in item:
-                for protein, qty in protein_map.items():
-                    protein_counts[protein] += qty
+        for protein, qty in rules.set_meal_proteins(item).items():
+            protein_counts[protein] += qty
     return protein_counts
 
 def count_protein_from_modifiers(name: str, protein_key: str) -> int:
-    required_keywords = PROTEIN_RULES[protein_key]
-    return 1 if all(keyword in name for keyword in required_keywords) else 0
+    return 1 if current_rules().protein_matchers[protein_key].match(name) else 0
 
-def load_orders(start_date: str, end_date: str, *, columns: list[str]) -> pd.DataFrame:
+# ---------------------------------------------------------------------------
+# 價格時間軸
+# ---------------------------------------------------------------------------
+
+_PRICE_TIMELINES: dict[tuple[str, str], tuple[tuple, PriceTimeline]] = {}
+
+
+def _price_timeline_signature(conn: sqlite3.Connection) -> tuple:
+    try:
+        return conn.execute("SELECT COUNT(*), MAX(id) FROM price_timeline").fetchone()
+    except sqlite3.OperationalError:
+        return (0, None)
+
+
+def get_price_timeline(*, refresh: bool = False) -> PriceTimeline:
     """
-    載入日期區間內訂單，並先行過濾作廢單。
+    取得目前 DB 的價格時間軸（規則檔的原價與促銷 + price_timeline 表）。
 
-    start_date, end_date: YYYY-MM-DD
-    區間為 [start_date, end_date + 1 day)
+    結果依 (DB_PATH, 規則 hash) 快取；refresh=True 時會檢查表內容是否變動，
+    報表計算入口用 refresh=True，逐筆查詢的路徑直接讀快取。
+    """
+    rules = current_rules()
+    cache_key = (DB_PATH, rules.hash)
+    cached = _PRICE_TIMELINES.get(cache_key)
+    if cached is not None and not refresh:
+        return cached[1]
+
+    signature: tuple = (0, None)
+    entries = []
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            signature = _price_timeline_signature(conn)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+            entries = load_entries(conn)
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        if cached is not None:
+            return cached[1]
+
+    timeline = PriceTimeline.from_defaults(rules.bowl_base_prices, rules.promotions, entries)
+    _PRICE_TIMELINES[cache_key] = (signature, timeline)
+    return timeline
+
+
+def attach_price_timeline(df: pd.DataFrame, *, on: str = "checkout_time", item_col: Optional[str] = None) -> pd.DataFrame:
+    """整張訂單表一次接上 price_segment / discount_factor（及 base_price），見 PriceTimeline.attach。"""
+    return get_price_timeline(refresh=True).attach(df, on=on, item_col=item_col)
+
+
+# ---------------------------------------------------------------------------
+# 品項分類 memo
+#
+# items_text 由少數幾十種品項字串重複組成；每個 distinct token（品名 + 價格）
+# 在同一組規則、同一價格區段下的分類結果固定，因此整個 process 共用一份 memo，
+# 並寫入 SQLite 的 item_memo 表，重啟後不必重算。memo 以
+# rules_hash() + 價格時間軸 fingerprint 分區，規則表或時間軸一改，舊結果自然失效。
+# 多個版本可以並存（例如 simulate_rules 同時用目前規則與候選規則），
+# 每個版本記錄最後使用時間，只清掉超過 ITEM_MEMO_MAX_AGE_DAYS 天沒用到、
+# 或排在最近 ITEM_MEMO_KEEP_VERSIONS 個之後的版本。
+# ---------------------------------------------------------------------------
+
+ITEM_MEMO_KEEP_VERSIONS = 8
+ITEM_MEMO_MAX_AGE_DAYS = 30
+
+class ItemClass(NamedTuple):
+    """單一品項 token 的分類結果。"""
+    is_bowl: bool
+    quantity: int                                   # 碗數（非碗為 0）
+    protein_bowls: tuple[str, ...]                  # 符合的蛋白質碗
+    protein_non_bowls: tuple[str, ...]              # 符合的非碗蛋白質品項
+    set_meal_proteins: tuple[tuple[str, int], ...]  # 套餐展開的蛋白質份數
+
+
+_ITEM_MEMO: dict[str, dict[tuple[str, int], ItemClass]] = {}
+_ITEM_MEMO_PENDING: dict[str, dict[tuple[str, int], ItemClass]] = {}
+_ITEM_MEMO_LOADED: set[tuple[str, str]] = set()
+
+
+def rules_hash() -> str:
+    """目前規則的內容 hash；任何一張規則表改變，hash 即不同。"""
+    return current_rules().hash
+
+
+def item_memo_version(timeline: PriceTimeline, rules: Optional[RuleSet] = None) -> str:
+    return f"{(rules or current_rules()).hash}:{timeline.fingerprint}"
+
+
+def state_version() -> str:
+    """
+    快取的規則版本（目前規則 + 價格時間軸的 item_memo_version）；週報快照、日報與報表 API 的 ETag 共用。
+    呼叫端應先取 state_version / data_version 再計算：計算途中匯入的新資料只會讓結果在下次讀取時失效，
+    不會被誤當成最新。
+    """
+    return item_memo_version(get_price_timeline(refresh=True), current_rules())
+
+
+def classify_item(item: str, segment: PriceSegment, rules: Optional[RuleSet] = None) -> ItemClass:
+    """不經 memo 直接分類單一品項 token（已 strip）；segment 決定原價與折扣。"""
+    rules = rules or current_rules()
+    is_bowl = rules.is_valid_bowl_item(item)
+
+    quantity = 0
+    if is_bowl:
+        quantity = 1
+        if "$" in item:
+            name, price_str = item.rsplit("$", 1)
+            try:
+                quantity = _infer_quantity(name.strip(), float(price_str), segment, rules)
+            except ValueError:
+                quantity = 1  # 解析失敗，算 1 碗
+
+    matched = rules.matching_proteins(item)
+    set_meal_counts = rules.set_meal_proteins(item)
+
+    return ItemClass(
+        is_bowl=is_bowl,
+        quantity=quantity,
+        protein_bowls=matched if is_bowl else (),
+        protein_non_bowls=() if is_bowl else matched,
+        set_meal_proteins=tuple(sorted(set_meal_counts.items())),
+    )
+
+
+def _lookup_item(memo_key: str, item: str, segment: PriceSegment, rules: RuleSet) -> ItemClass:
+    memo = _ITEM_MEMO.setdefault(memo_key, {})
+    key = (item, segment.index)
+    cls = memo.get(key)
+    if cls is None:
+        cls = classify_item(item, segment, rules)
+        memo[key] = cls
+        _ITEM_MEMO_PENDING.setdefault(memo_key, {})[key] = cls
+    return cls
+
+
+def classify_order_items(
+    items_text: str,
+    order_date,
+    *,
+    rules: Optional[RuleSet] = None,
+    timeline: Optional[PriceTimeline] = None,
+) -> list[ItemClass]:
+    """拆開一筆訂單的 items_text，逐一查 memo 取得分類（純 Python，與 build_order_features 共用 memo）。"""
+    items = _split_items(items_text)
+    if not items:
+        return []
+    rules = rules or current_rules()
+    timeline = timeline or get_price_timeline()
+    segment = timeline.segment_at(order_date)
+    memo_key = item_memo_version(timeline, rules)
+    return [_lookup_item(memo_key, item, segment, rules) for item in items]
+
+
+_ITEM_MEMO_DDL = """
+    CREATE TABLE IF NOT EXISTS item_memo (
+        memo_version TEXT NOT NULL,
+        item TEXT NOT NULL,
+        price_segment INTEGER NOT NULL,
+        is_bowl INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        protein_bowls TEXT NOT NULL,
+        protein_non_bowls TEXT NOT NULL,
+        set_meal_proteins TEXT NOT NULL,
+        PRIMARY KEY (memo_version, item, price_segment)
+    );
+    CREATE TABLE IF NOT EXISTS item_memo_versions (
+        memo_version TEXT PRIMARY KEY,
+        last_used_at TEXT NOT NULL
+    );
+"""
+
+
+def _ensure_item_memo_table(conn: sqlite3.Connection) -> None:
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(item_memo)")}
+    if columns and "price_segment" not in columns:
+        # 舊版（以折扣係數為 key）的快取，直接重建
+        conn.execute("DROP TABLE item_memo")
+    conn.executescript(_ITEM_MEMO_DDL)
+
+
+def _touch_item_memo_version(conn: sqlite3.Connection, memo_key: str) -> None:
+    conn.execute(
+        """
+        INSERT INTO item_memo_versions (memo_version, last_used_at) VALUES (?, ?)
+        ON CONFLICT (memo_version) DO UPDATE SET last_used_at = excluded.last_used_at
+        """,
+        (memo_key, datetime.now().isoformat()),
+    )
+
+
+def _prune_item_memo(conn: sqlite3.Connection, keep: str) -> None:
+    """清掉太久沒用或排在最近 ITEM_MEMO_KEEP_VERSIONS 個之後的版本；keep 一律保留。"""
+    cutoff = (datetime.now() - timedelta(days=ITEM_MEMO_MAX_AGE_DAYS)).isoformat()
+    conn.execute(
+        """
+        DELETE FROM item_memo_versions
+        WHERE memo_version != ?
+          AND (last_used_at < ?
+               OR memo_version NOT IN (SELECT memo_version FROM item_memo_versions
+                                       ORDER BY last_used_at DESC LIMIT ?))
+        """,
+        (keep, cutoff, ITEM_MEMO_KEEP_VERSIONS),
+    )
+    # 沒有版本紀錄的資料列（已清掉的版本或舊版表格留下的）一併刪除
+    conn.execute("DELETE FROM item_memo WHERE memo_version NOT IN (SELECT memo_version FROM item_memo_versions)")
+
+
+def load_item_memo(memo_key: Optional[str] = None) -> int:
+    """
+    從 SQLite 載入 memo（每個 DB × memo 版本只載一次），更新該版本的最後使用時間，
+    並清掉過期的其他版本（見 _prune_item_memo）。
+
+    回傳載入筆數；DB 無法開啟時視為空 memo，不影響報表計算。
+    """
+    memo_key = memo_key or item_memo_version(get_price_timeline())
+    if (DB_PATH, memo_key) in _ITEM_MEMO_LOADED:
+        return 0
+
+    memo = _ITEM_MEMO.setdefault(memo_key, {})
+    loaded = 0
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            _ensure_item_memo_table(conn)
+            _touch_item_memo_version(conn, memo_key)
+            _prune_item_memo(conn, memo_key)
+            conn.commit()
+            rows = conn.execute(
+                """
+                SELECT item, price_segment, is_bowl, quantity,
+                       protein_bowls, protein_non_bowls, set_meal_proteins
+                FROM item_memo
+                WHERE memo_version = ?
+                """,
+                (memo_key,),
+            ).fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return 0
+
+    for item, segment, is_bowl, quantity, bowls, non_bowls, set_meals in rows:
+        memo.setdefault((item, segment), ItemClass(
+            is_bowl=bool(is_bowl),
+            quantity=quantity,
+            protein_bowls=tuple(json.loads(bowls)),
+            protein_non_bowls=tuple(json.loads(non_bowls)),
+            set_meal_proteins=tuple(tuple(pair) for pair in json.loads(set_meals)),
+        ))
+        loaded += 1
+
+    _ITEM_MEMO_LOADED.add((DB_PATH, memo_key))
+    return loaded
+
+
+def flush_item_memo(memo_key: Optional[str] = None) -> int:
+    """把這個 process 新算出的分類寫回 SQLite；回傳寫入筆數。"""
+    memo_key = memo_key or item_memo_version(get_price_timeline())
+    pending = _ITEM_MEMO_PENDING.get(memo_key)
+    if not pending:
+        return 0
+
+    rows = [
+        (
+            memo_key,
+            item,
+            segment,
+            int(cls.is_bowl),
+            cls.quantity,
+            json.dumps(cls.protein_bowls),
+            json.dumps(cls.protein_non_bowls),
+            json.dumps(cls.set_meal_proteins),
+        )
+        for (item, segment), cls in pending.items()
+    ]
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            _ensure_item_memo_table(conn)
+            _touch_item_memo_version(conn, memo_key)
+            conn.executemany(
+                "INSERT OR IGNORE INTO item_memo VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.commit()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return 0
+
+    pending.clear()
+    return len(rows)
+
+
+def order_feature_columns(rules: Optional[RuleSet] = None) -> list[str]:
+    """build_order_features() 的欄位順序。"""
+    proteins = list((rules or current_rules()).protein_rules)
+    return (
+        ["bowls"]
+        + [f"protein_bowls_{p}" for p in proteins]
+        + [f"protein_non_bowls_{p}" for p in proteins]
+        + [f"set_meal_{p}" for p in proteins]
+    )
+
+
+@traced()
+def build_order_features(df: pd.DataFrame, rules: Optional[RuleSet] = None) -> pd.DataFrame:
+    """
+    逐筆訂單的碗數與蛋白質計數（order feature table）。
+
+    df 需含 items_text 與 checkout_time（datetime）。先把所有訂單拆成品項 token，
+    只對 distinct (token, 價格區段) 查 memo，再加總回各訂單，
+    因此整段歷史的分類成本是 O(distinct items) 而非 O(items)。
+    回傳的 DataFrame 與 df 同 index，欄位見 order_feature_columns()。
+    rules 未指定時使用 current_rules()。
+    """
+    import pandas as pd
+
+    rules = rules or current_rules()
+    columns = order_feature_columns(rules)
+    if df.empty:
+        return pd.DataFrame(0, index=df.index, columns=columns, dtype="int64")
+
+    timeline = get_price_timeline(refresh=True)
+    memo_key = item_memo_version(timeline, rules)
+    load_item_memo(memo_key)
+
+    priced = timeline.attach(df[["checkout_time"]])
+    tokens = pd.DataFrame({
+        "items": df["items_text"].map(_split_items),
+        "segment": priced["price_segment"],
+    }).explode("items").dropna(subset=["items"])
+
+    if tokens.empty:
+        return pd.DataFrame(0, index=df.index, columns=columns, dtype="int64")
+
+    proteins = list(rules.protein_rules)
+    feature_rows = {}
+    for item, segment in tokens.drop_duplicates().itertuples(index=False):
+        cls = _lookup_item(memo_key, item, timeline.segments[segment], rules)
+        set_meals = dict(cls.set_meal_proteins)
+        feature_rows[(item, segment)] = (
+            [cls.quantity]
+            + [int(p in cls.protein_bowls) for p in proteins]
+            + [int(p in cls.protein_non_bowls) for p in proteins]
+            + [set_meals.get(p, 0) for p in proteins]
+        )
+    flush_item_memo(memo_key)
+
+    token_keys = pd.MultiIndex.from_arrays([tokens["items"], tokens["segment"]])
+    per_token = pd.DataFrame.from_dict(feature_rows, orient="index", columns=columns)
+    per_token.index = pd.MultiIndex.from_tuples(per_token.index)
+    values = per_token.reindex(token_keys).to_numpy()
+
+    features = pd.DataFrame(values, index=tokens.index, columns=columns).groupby(level=0).sum()
+    return features.reindex(df.index, fill_value=0).astype("int64")
+
+
+_IMPORT_THREAD_LOCK = threading.Lock()
+
+
+@contextmanager
+def import_lock():
     """
+    匯入 CSV 的跨行程互斥鎖（DB_PATH 旁的 .import.lock 檔 + flock）。
+    多個 worker 同時收到上傳時依序寫入，不會因 SQLite 寫鎖逾時而失敗。
+    """
+    with _IMPORT_THREAD_LOCK:
+        if fcntl is None:
+            yield
+            return
+        with open(f"{DB_PATH}.import.lock", "a") as lock_file:
+            started = time.perf_counter()
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            bot_metrics.observe("pokebee_import_lock_wait_seconds", time.perf_counter() - started)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def begin_write(conn: sqlite3.Connection, writer: str) -> None:
+    """
+    以 BEGIN IMMEDIATE 先取得 SQLite 寫鎖再開始寫入交易（conn.commit() 結束），
+    等待時間記在 /metrics 的 pokebee_sqlite_lock_wait_seconds{writer=...}。
+    等候上限為 sqlite3.connect 的 timeout。
+    """
+    started = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    bot_metrics.observe("pokebee_sqlite_lock_wait_seconds", time.perf_counter() - started, writer=writer)
+
+
+def enable_wal() -> str:
+    """
+    把 DB 切到 WAL 模式（寫在檔案裡，只需設定一次）：
+    多 worker 時讀取不會被匯入或快照寫入擋住。回傳目前的 journal_mode。
+    """
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    try:
+        return conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def data_version(conn: sqlite3.Connection, start_date: str, end_date: str) -> str:
+    """區間內 raw_orders 與 modifier_summary 的「筆數:最大 id」；補匯入任一筆訂單或 modifier 即改變。"""
+    count, max_id = conn.execute(
+        "SELECT COUNT(*), COALESCE(MAX(id), 0) FROM raw_orders "
+        "WHERE checkout_time >= ? AND checkout_time < date(?, '+1 day')",
+        (start_date, end_date),
+    ).fetchone()
+    try:
+        modifiers, modifier_id = conn.execute(
+            "SELECT COUNT(*), COALESCE(MAX(id), 0) FROM modifier_summary "
+            "WHERE NOT (end_date < ? OR start_date > ?)",
+            (start_date, end_date),
+        ).fetchone()
+    except sqlite3.OperationalError:  # 尚未匯入過 modifier
+        modifiers, modifier_id = 0, 0
+    return f"{count}:{max_id}|m{modifiers}:{modifier_id}"
+
+
+def _orders_query(columns: list[str], ranges: int = 1) -> str:
     select_columns = ",\n            ".join(columns)
-    query = f"""
+    # 多個區間以 OR 串接，SQLite 會對每個區間各做一次 checkout_time 索引範圍掃描
+    range_sql = "\n           OR ".join(
+        ["(checkout_time >= ? AND checkout_time < date(?, '+1 day'))"] * ranges
+    )
+    return f"""
         SELECT
             {select_columns}
         FROM raw_orders
-        WHERE checkout_time >= ?
-          AND checkout_time < date(?, '+1 day')
+        WHERE ({range_sql})
           AND order_status NOT LIKE '%Voided%'
     """
 
+@traced()
+def load_orders(start_date: str, end_date: str, *, columns: list[str]) -> pd.DataFrame:
+    """
+    載入日期區間內訂單，並先行過濾作廢單。
+
+    start_date, end_date: YYYY-MM-DD
+    區間為 [start_date, end_date + 1 day)
+    """
+    import pandas as pd
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        return pd.read_sql_query(_orders_query(columns), conn, params=(start_date, end_date))
+    finally:
+        conn.close()
+
+@traced()
+def load_orders_in_ranges(ranges: list[tuple[str, str]], *, columns: list[str]) -> pd.DataFrame:
+    """同 load_orders，但一次查詢取回多個 [start_date, end_date] 區間（例如本週、上週、去年同週）。"""
+    import pandas as pd
+
+    params = [value for date_range in ranges for value in date_range]
     conn = sqlite3.connect(DB_PATH)
     try:
-        return pd.read_sql_query(query, conn, params=(start_date, end_date))
+        return pd.read_sql_query(_orders_query(columns, len(ranges)), conn, params=params)
     finally:
         conn.close()
 
+def iter_orders(start_date: str, end_date: str, *, columns: list[str]) -> Iterator[tuple]:
+    """與 load_orders 相同的篩選條件，但直接逐列 yield SQLite cursor 的 tuple（不經 pandas）。"""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        yield from conn.execute(_orders_query(columns), (start_date, end_date))
+    finally:
+        conn.close()
+
+@traced()
+def count_orders(start_date: str, end_date: str) -> int:
+    """區間內未作廢的訂單數（用來挑選計算引擎）。"""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        query = _orders_query(["COUNT(*)"])
+        return conn.execute(query, (start_date, end_date)).fetchone()[0]
+    finally:
+        conn.close()
+
+@traced()
 def load_modifier(start_date: str, end_date: str, *, protein_only: bool = True) -> pd.DataFrame:
     """載入指定區間的 modifier 統計，預設僅回傳蛋白質相關項目。"""
 
     params: list = [start_date, end_date]
     where_sql = "WHERE NOT (end_date < ? OR start_date > ?)"
 
-    if protein_only and PROTEIN_KEYWORDS:
-        like_clauses = " OR ".join(["name LIKE ?" for _ in PROTEIN_KEYWORDS])
+    protein_keywords = current_rules().protein_keywords
+    if protein_only and protein_keywords:
+        like_clauses = " OR ".join(["name LIKE ?" for _ in protein_keywords])
         where_sql += f" AND ({like_clauses})"
-        params.extend([f"%{keyword}%" for keyword in PROTEIN_KEYWORDS])
+        params.extend([f"%{keyword}%" for keyword in protein_keywords])
 
     query = f"""
         SELECT name, SUM(count) AS count
@@ -281,6 +759,8 @@ def load_modifier(start_date: str, end_date: str, *, protein_only: bool = True)
         GROUP BY name;
     """
 
+    import pandas as pd
+
     conn = sqlite3.connect(DB_PATH)
     try:
         df = pd.read_sql_query(query, conn, params=params)
@@ -290,8 +770,86 @@ def load_modifier(start_date: str, end_date: str, *, protein_only: bool = True)
     finally:
         conn.close()
 
+MODIFIER_PROTEIN_DDL = """
+    CREATE TABLE IF NOT EXISTS modifier_protein (
+        rules_hash TEXT NOT NULL,
+        name TEXT NOT NULL,
+        protein_key TEXT NOT NULL,      -- '' 表示不含任何蛋白質（也記下來，避免重複比對）
+        PRIMARY KEY (rules_hash, name, protein_key)
+    )
+"""
+
+
+@traced()
+def sync_modifier_proteins(conn: sqlite3.Connection, rules: Optional[RuleSet] = None) -> int:
+    """
+    把 modifier_summary 裡在目前規則下還沒對應過的品名，對應到蛋白質 key 寫入 modifier_protein。
+    匯入時呼叫一次；換規則後第一次查詢會補上新 hash 的對應。回傳新對應的品名數。
+    """
+    rules = rules or current_rules()
+    conn.execute(MODIFIER_PROTEIN_DDL)
+    names = [
+        name for name, in conn.execute(
+            """
+            SELECT DISTINCT name FROM modifier_summary
+            WHERE name NOT IN (SELECT name FROM modifier_protein WHERE rules_hash = ?)
+            """,
+            (rules.hash,),
+        )
+    ]
+    conn.executemany(
+        "INSERT OR IGNORE INTO modifier_protein (rules_hash, name, protein_key) VALUES (?, ?, ?)",
+        [
+            (rules.hash, name, protein)
+            for name in names
+            for protein in (rules.modifier_proteins(name) or ("",))
+        ],
+    )
+    return len(names)
+
+
+@traced()
+def load_protein_adds(start_date: str, end_date: str, *, rules: Optional[RuleSet] = None,
+                      prorate: bool = True) -> dict[str, int]:
+    """
+    區間內各蛋白質的加購份數，直接由 SQL 依 protein_key 彙總。
+
+    modifier_summary 每列涵蓋一段匯出區間；prorate=True 時只與查詢區間部分重疊的列
+    依重疊天數按日攤提（count × 重疊天數 / 該列天數），完整涵蓋時與不攤提相同。
+    """
+    rules = rules or current_rules()
+    share = (
+        "(julianday(MIN(ms.end_date, ?)) - julianday(MAX(ms.start_date, ?)) + 1)"
+        " / (julianday(ms.end_date) - julianday(ms.start_date) + 1)"
+        if prorate else "1"
+    )
+    query = f"""
+        SELECT mp.protein_key, SUM(ms.count * {share})
+        FROM modifier_summary AS ms
+        JOIN modifier_protein AS mp ON mp.rules_hash = ? AND mp.name = ms.name
+        WHERE NOT (ms.end_date < ? OR ms.start_date > ?)
+          AND mp.protein_key != ''
+        GROUP BY mp.protein_key
+    """
+    params = ([end_date, start_date] if prorate else []) + [rules.hash, start_date, end_date]
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        try:
+            if sync_modifier_proteins(conn, rules):
+                conn.commit()
+            rows = conn.execute(query, params).fetchall()
+        except sqlite3.OperationalError:  # 尚未建立 modifier_summary（從未匯入過 modifier）
+            return {}
+    finally:
+        conn.close()
+    return {protein: int(round(count)) for protein, count in rows}
+
+@traced()
 def preprocess_orders(df: pd.DataFrame) -> pd.DataFrame:
     """套用共用前處理：去除 invoice_amount <= 0、轉 datetime。"""
+    import pandas as pd
+
     if df.empty:
         return df.copy()
 
@@ -319,3 +877,18 @@ def validate_bowl_counts(total_bowls: int, protein_bowls: dict, protein_set_meal
         print(f"⚠️  碗數統計異常：總碗數 {total_bowls} vs 分類總和 {calculated_total} (差異: {diff})")
         print(f"   蛋白質碗: {protein_bowl_sum}, 套餐: {set_meal_sum}")
         print(f"   請檢查 SET_MEAL_RULES 和 PROTEIN_RULES 配置是否正確")
+
+
+def to_jsonable(value):
+    """報表 dict 內有 numpy 數值、date 鍵與 NaN，轉成可 json.dumps（嚴格 JSON）的結構。"""
+    if isinstance(value, dict):
+        return {str(key): to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(item) for item in value]
+    if isinstance(value, date):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
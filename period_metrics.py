@@ -0,0 +1,137 @@
+"""
+月報 / 季報 / 年報（YTD）。
+
+不重新掃描整段原始訂單：每一天的計數、加總、每小時出碗數與蛋白質碗數
+已存在 daily_snapshot（見 daily_snapshot.py），這裡只把各日的 DailyAccumulator
+合併起來，尖峰時段與蛋白質排名取自合併後的直方圖。已有快照的期間，
+成本與天數成正比，與訂單數無關。
+
+    python period_metrics.py --month 2026-03
+    python period_metrics.py --quarter 2026-Q1
+    python period_metrics.py --ytd
+"""
+import argparse
+import re
+from datetime import date, timedelta
+from typing import NamedTuple, Optional
+
+from daily_accumulator import DailyAccumulator
+from daily_snapshot import refresh_daily_snapshots
+from tracing import traced
+
+
+class Period(NamedTuple):
+    kind: str           # "month" | "quarter" | "ytd"
+    label: str          # 2026-03 / 2026-Q1 / 2026-YTD
+    start: date
+    end: date
+
+
+def month_period(text: str) -> Period:
+    """YYYY-MM -> 該月 1 日至月底；格式錯誤時拋 ValueError。"""
+    match = re.fullmatch(r"(\d{4})-(\d{2})", text)
+    if not match:
+        raise ValueError(f"Invalid month: {text}")
+    start = date(int(match.group(1)), int(match.group(2)), 1)
+    next_month = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return Period("month", text, start, next_month - timedelta(days=1))
+
+
+def quarter_period(text: str) -> Period:
+    """YYYY-Qn -> 該季第一天至最後一天。"""
+    match = re.fullmatch(r"(\d{4})-Q([1-4])", text.upper())
+    if not match:
+        raise ValueError(f"Invalid quarter: {text}")
+    year, quarter = int(match.group(1)), int(match.group(2))
+    start = date(year, quarter * 3 - 2, 1)
+    end = month_period(f"{year}-{quarter * 3:02d}").end
+    return Period("quarter", f"{year}-Q{quarter}", start, end)
+
+
+def ytd_period(today: Optional[date] = None) -> Period:
+    today = today or date.today()
+    return Period("ytd", f"{today.year}-YTD", date(today.year, 1, 1), today)
+
+
+def _days(start: date, end: date) -> list[str]:
+    return [(start + timedelta(days=offset)).isoformat() for offset in range((end - start).days + 1)]
+
+
+@traced()
+def calculate_period_metrics(period: Period) -> Optional[dict]:
+    """
+    合併期間內各日快照。輸出沿用單日指標的結構（metrics / periods / operational / payments），
+    另附 period、days（營業天數、日均、最高 / 最低出碗日）與跨月時的 breakdown（逐月小計）。
+    期間內沒有任何有效訂單時回傳 None。
+    """
+    days = _days(period.start, period.end)
+    accumulators = refresh_daily_snapshots(days)
+
+    first = accumulators[days[0]]
+    total = DailyAccumulator(first.rules, first.timeline)
+    months: dict[str, DailyAccumulator] = {}
+    for day in days:
+        accumulator = accumulators[day]
+        total.merge(accumulator)
+        month = months.setdefault(day[:7], DailyAccumulator(first.rules, first.timeline))
+        month.merge(accumulator)
+
+    result = total.to_daily_metrics(period.label)
+    if result is None:
+        return None
+
+    open_days = [(day, accumulators[day]) for day in days if accumulators[day].total_orders]
+    best_day = max(open_days, key=lambda item: item[1].total_bowls)
+    worst_day = min(open_days, key=lambda item: item[1].total_bowls)
+
+    result["period"] = {
+        "kind": period.kind,
+        "label": period.label,
+        "start_date": period.start.isoformat(),
+        "end_date": period.end.isoformat(),
+    }
+    result["days"] = {
+        "total_days": len(days),
+        "open_days": len(open_days),
+        "avg_daily_bowls": round(total.total_bowls / len(open_days), 1),
+        "avg_daily_revenue": round(total.revenue / len(open_days), 2),
+        "best_day": (best_day[0], best_day[1].total_bowls),
+        "worst_day": (worst_day[0], worst_day[1].total_bowls),
+    }
+    result["breakdown"] = [
+        {
+            "label": label,
+            "orders": month.total_orders,
+            "bowls": month.total_bowls,
+            "revenue": round(month.revenue, 2),
+        }
+        for label, month in months.items()
+    ] if len(months) > 1 else []
+    return result
+
+
+if __name__ == "__main__":
+    from report_renderer import render_period_report
+
+    parser = argparse.ArgumentParser(description="Monthly / quarterly / year-to-date report")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--month", help="YYYY-MM")
+    group.add_argument("--quarter", help="YYYY-Qn")
+    group.add_argument("--ytd", action="store_true", help="January 1st to today")
+    args = parser.parse_args()
+
+    try:
+        if args.month:
+            period = month_period(args.month)
+        elif args.quarter:
+            period = quarter_period(args.quarter)
+        else:
+            period = ytd_period()
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    result = calculate_period_metrics(period)
+    if result is None:
+        print(f"No data found for {period.label}.")
+    else:
+        print(render_period_report(result))
@@ -0,0 +1,277 @@
+"""
+依日期生效的價格 / 折扣時間軸。
+
+price_timeline 表記錄兩種資料：
+- base_price：品項原價，自 start_date 起生效，直到同品項下一筆生效為止
+- discount：全單折扣區間 [start_date, end_date]，value 為折扣係數（0.9 = 9 折）
+
+所有變動點切成不重疊的 segment；同一 segment 內原價與折扣固定，
+查詢只需對 segment 起始日做 bisect，O(log n)。
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import sqlite3
+from bisect import bisect_right
+from datetime import date
+from functools import lru_cache
+from typing import TYPE_CHECKING, Iterable, NamedTuple, Optional
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# 比任何訂單都早的 day number，作為預設原價的生效日
+BEGINNING_OF_TIME = date(2000, 1, 1).toordinal() - _EPOCH_ORDINAL
+
+PRICE_TIMELINE_DDL = """
+    CREATE TABLE IF NOT EXISTS price_timeline (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL CHECK (kind IN ('base_price', 'discount')),
+        item_name TEXT,
+        start_date TEXT NOT NULL,
+        end_date TEXT,
+        value REAL NOT NULL,
+        note TEXT
+    )
+"""
+
+
+class PriceEntry(NamedTuple):
+    kind: str               # "base_price" | "discount"
+    item_name: Optional[str]
+    start_date: date
+    end_date: Optional[date]
+    value: float
+    note: str = ""
+
+
+class PriceSegment(NamedTuple):
+    """時間軸上一段原價與折扣都不變的區間。"""
+    index: int
+    start_day: int          # day number（1970-01-01 起算）
+    discount: float
+    base_prices: dict       # 品名 -> 原價，保留規則表順序（子字串比對時先到先得）
+
+    def base_price_for(self, item_name: str) -> Optional[float]:
+        for bowl_name, price in self.base_prices.items():
+            if bowl_name in item_name:
+                return price
+        return None
+
+
+@lru_cache(maxsize=4096)
+def _parse_day(value: str) -> int:
+    return date.fromisoformat(value[:10]).toordinal() - _EPOCH_ORDINAL
+
+
+def to_day_number(value) -> int:
+    """str / date / datetime / Timestamp -> day number；字串解析結果會快取。"""
+    if isinstance(value, str):
+        return _parse_day(value)
+    if hasattr(value, "date"):
+        value = value.date()
+    return value.toordinal() - _EPOCH_ORDINAL
+
+
+class PriceTimeline:
+    """不可變的價格時間軸；由預設規則加上 price_timeline 表的資料組成。"""
+
+    def __init__(self, entries: Iterable[PriceEntry]):
+        # 穩定排序：同一天生效的原價維持規則表順序（子字串比對先到先得）
+        self.entries = tuple(sorted(entries, key=lambda e: e.start_date))
+        self.fingerprint = hashlib.sha256(
+            json.dumps([
+                [e.kind, e.item_name, e.start_date.isoformat(),
+                 e.end_date.isoformat() if e.end_date else None, e.value]
+                for e in self.entries
+            ], ensure_ascii=False).encode("utf-8")
+        ).hexdigest()[:16]
+        self.segments = self._build_segments()
+        self._starts = [segment.start_day for segment in self.segments]
+
+    @classmethod
+    def from_defaults(
+        cls,
+        base_prices: dict,
+        promotions: Iterable[tuple[Optional[date], date, float, str]],
+        extra_entries: Iterable[PriceEntry] = (),
+    ) -> "PriceTimeline":
+        """以規則表的原價（視為一直有效）與預設促銷區間為底，再疊上 extra_entries。"""
+        first_day = date.fromordinal(BEGINNING_OF_TIME + _EPOCH_ORDINAL)
+        entries = [
+            PriceEntry("base_price", name, first_day, None, float(price))
+            for name, price in base_prices.items()
+        ]
+        entries += [
+            PriceEntry("discount", None, start or first_day, end, float(factor), note)
+            for start, end, factor, note in promotions
+        ]
+        entries += list(extra_entries)
+        return cls(entries)
+
+    def _build_segments(self) -> list[PriceSegment]:
+        base_rows = [e for e in self.entries if e.kind == "base_price"]
+        discount_rows = [e for e in self.entries if e.kind == "discount"]
+
+        boundaries = {BEGINNING_OF_TIME}
+        for e in base_rows:
+            boundaries.add(to_day_number(e.start_date))
+        for e in discount_rows:
+            boundaries.add(to_day_number(e.start_date))
+            if e.end_date is not None:
+                boundaries.add(to_day_number(e.end_date) + 1)
+
+        segments = []
+        for index, start_day in enumerate(sorted(boundaries)):
+            prices: dict = {}
+            for e in base_rows:  # 已依 start_date 排序，後生效者覆蓋
+                if to_day_number(e.start_date) <= start_day:
+                    prices[e.item_name] = e.value
+
+            discount = 1.0
+            for e in discount_rows:  # 區間重疊時，較晚開始的促銷優先
+                starts = to_day_number(e.start_date)
+                ends = to_day_number(e.end_date) if e.end_date is not None else None
+                if starts <= start_day and (ends is None or start_day <= ends):
+                    discount = e.value
+
+            segments.append(PriceSegment(index, start_day, discount, prices))
+        return segments
+
+    def segment_at(self, order_date) -> PriceSegment:
+        day = to_day_number(order_date)
+        return self.segments[max(bisect_right(self._starts, day) - 1, 0)]
+
+    def discount_factor(self, order_date) -> float:
+        return self.segment_at(order_date).discount
+
+    def base_price(self, item_name: str, order_date) -> Optional[float]:
+        return self.segment_at(order_date).base_price_for(item_name)
+
+    def segment_frame(self) -> pd.DataFrame:
+        import pandas as pd
+
+        return pd.DataFrame({
+            "_day": pd.Series(self._starts, dtype="int64"),
+            "price_segment": [segment.index for segment in self.segments],
+            "discount_factor": [segment.discount for segment in self.segments],
+        })
+
+    def attach(self, df: pd.DataFrame, *, on: str = "checkout_time", item_col: Optional[str] = None) -> pd.DataFrame:
+        """
+        向量化查詢：一次 merge_asof 把 price_segment、discount_factor 接到整張訂單表。
+
+        給 item_col 時另外附上該品項在當時的 base_price（依 segment 的原價表子字串比對，
+        每個 distinct (segment, 品名) 只算一次）。回傳與 df 同 index、同順序。
+        """
+        import pandas as pd
+
+        out = df.copy()
+        if out.empty:
+            out["price_segment"] = pd.Series(dtype="int64")
+            out["discount_factor"] = pd.Series(dtype="float64")
+            if item_col is not None:
+                out["base_price"] = pd.Series(dtype="float64")
+            return out
+
+        days = pd.to_datetime(out[on]).values.astype("datetime64[D]").astype("int64")
+        keyed = pd.DataFrame({"_day": days, "_row": range(len(out))}).sort_values("_day")
+        merged = pd.merge_asof(keyed, self.segment_frame(), on="_day", direction="backward")
+        merged = merged.sort_values("_row")
+
+        out["price_segment"] = merged["price_segment"].to_numpy()
+        out["discount_factor"] = merged["discount_factor"].to_numpy()
+
+        if item_col is not None:
+            pairs = pd.MultiIndex.from_arrays([out["price_segment"], out[item_col]])
+            lookup = {
+                (seg, name): self.segments[seg].base_price_for(name)
+                for seg, name in pairs.unique()
+            }
+            out["base_price"] = [lookup[pair] for pair in pairs]
+        return out
+
+
+def load_entries(conn: sqlite3.Connection) -> list[PriceEntry]:
+    """讀取 price_timeline 表；表不存在時回傳空清單。"""
+    try:
+        rows = conn.execute(
+            "SELECT kind, item_name, start_date, end_date, value, COALESCE(note, '') "
+            "FROM price_timeline ORDER BY id"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return []
+
+    return [
+        PriceEntry(
+            kind,
+            item_name,
+            date.fromisoformat(start),
+            date.fromisoformat(end) if end else None,
+            float(value),
+            note,
+        )
+        for kind, item_name, start, end, value, note in rows
+    ]
+
+
+def add_entry(conn: sqlite3.Connection, entry: PriceEntry) -> None:
+    conn.execute(PRICE_TIMELINE_DDL)
+    conn.execute(
+        "INSERT INTO price_timeline (kind, item_name, start_date, end_date, value, note) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            entry.kind,
+            entry.item_name,
+            entry.start_date.isoformat(),
+            entry.end_date.isoformat() if entry.end_date else None,
+            entry.value,
+            entry.note,
+        ),
+    )
+
+
+if __name__ == "__main__":
+    from metrics_common import DB_PATH, get_price_timeline
+
+    parser = argparse.ArgumentParser(description="Manage the effective-dated price timeline")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("list", help="Print every price segment")
+
+    add_price = sub.add_parser("add-price", help="New base price effective from a date")
+    add_price.add_argument("--item", required=True, help="Bowl name, e.g. 雞胸肉自選碗")
+    add_price.add_argument("--price", required=True, type=float)
+    add_price.add_argument("--from", dest="start", required=True, help="YYYY-MM-DD")
+
+    add_promo = sub.add_parser("add-promo", help="Order-wide discount window")
+    add_promo.add_argument("--factor", required=True, type=float, help="e.g. 0.9 for 10%% off")
+    add_promo.add_argument("--from", dest="start", required=True, help="YYYY-MM-DD")
+    add_promo.add_argument("--to", dest="end", required=True, help="YYYY-MM-DD (inclusive)")
+    add_promo.add_argument("--note", default="")
+
+    args = parser.parse_args()
+
+    if args.command in {"add-price", "add-promo"}:
+        if args.command == "add-price":
+            entry = PriceEntry("base_price", args.item, date.fromisoformat(args.start), None, args.price)
+        else:
+            entry = PriceEntry(
+                "discount", None, date.fromisoformat(args.start), date.fromisoformat(args.end),
+                args.factor, args.note,
+            )
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            add_entry(conn, entry)
+            conn.commit()
+        finally:
+            conn.close()
+
+    timeline = get_price_timeline(refresh=True)
+    for segment in timeline.segments:
+        start = date.fromordinal(segment.start_day + _EPOCH_ORDINAL)
+        prices = ", ".join(f"{name}={price:g}" for name, price in segment.base_prices.items())
+        print(f"#{segment.index} from {start}: discount={segment.discount:g} | {prices}")
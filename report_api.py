@@ -0,0 +1,113 @@
+"""
+內部 dashboard 用的 JSON 報表 API（Flask blueprint，由 line_bot_app 註冊）。
+
+    GET /api/report/daily/<YYYY-MM-DD>            calculate_daily_metrics 的 dict
+    GET /api/report/range?start=YYYY-MM-DD&end=   calculate_weekly_metrics 的 dict
+
+- 需帶 Authorization: Bearer <REPORT_API_TOKEN>；未設定 REPORT_API_TOKEN 時 API 停用（403）
+- ETag 由 metrics_common.data_version（區間內 raw_orders / modifier_summary 的筆數與最大 id）與
+  state_version（規則 hash + 價格時間軸）算出，與週報快照、日報共用；If-None-Match 相符時直接回 304，不重算
+- client 接受 gzip 且內容超過 GZIP_MIN_BYTES 時壓縮
+
+    curl -H "Authorization: Bearer $REPORT_API_TOKEN" --compressed localhost:8000/api/report/daily/2026-03-04
+"""
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import sqlite3
+from datetime import date
+
+from flask import Blueprint, Response, jsonify, request
+
+import bot_metrics
+import metrics_common
+from daily_metrics import calculate_daily_metrics
+from metrics_common import data_version, state_version, to_jsonable
+
+# 區間報表最多涵蓋的天數
+MAX_RANGE_DAYS = 366
+GZIP_MIN_BYTES = 1024
+
+api = Blueprint("report_api", __name__, url_prefix="/api/report")
+
+
+def report_etag(kind: str, start_date: str, end_date: str) -> str:
+    conn = sqlite3.connect(metrics_common.DB_PATH, timeout=30)
+    try:
+        data = data_version(conn, start_date, end_date)
+    finally:
+        conn.close()
+    key = f"{kind}|{start_date}|{end_date}|{state_version()}|{data}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:24]
+
+
+def _error(status: int, message: str, endpoint: str):
+    bot_metrics.inc("pokebee_api_requests_total", endpoint=endpoint, status=status)
+    return jsonify({"error": message}), status
+
+
+def _serve(endpoint: str, start_date: str, end_date: str, compute):
+    """ETag 相符回 304；否則計算、序列化並視情況 gzip。沒有資料時回 404。"""
+    etag = report_etag(endpoint, start_date, end_date)
+    if request.if_none_match.contains_weak(etag):
+        bot_metrics.inc("pokebee_api_requests_total", endpoint=endpoint, status=304)
+        response = Response(status=304)
+    else:
+        result = compute()
+        if result is None:
+            return _error(404, f"No orders between {start_date} and {end_date}", endpoint)
+        body = json.dumps(to_jsonable(result), ensure_ascii=False, allow_nan=False).encode("utf-8")
+        response = Response(body, mimetype="application/json")
+        response.vary.add("Accept-Encoding")
+        if len(body) >= GZIP_MIN_BYTES and "gzip" in request.accept_encodings:
+            response.set_data(gzip.compress(body, compresslevel=6))
+            response.headers["Content-Encoding"] = "gzip"
+        bot_metrics.inc("pokebee_api_requests_total", endpoint=endpoint, status=200)
+    # weak ETag：同一份資料的 gzip 與未壓縮版本共用
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def _parse_date(text: str):
+    try:
+        return date.fromisoformat(text or "")
+    except ValueError:
+        return None
+
+
+@api.before_request
+def _authorize():
+    token = os.getenv("REPORT_API_TOKEN")
+    if not token:
+        return jsonify({"error": "Report API is disabled (REPORT_API_TOKEN not set)"}), 403
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not hmac.compare_digest(supplied.encode("utf-8"), token.encode("utf-8")):
+        return jsonify({"error": "Unauthorized"}), 401
+    return None
+
+
+@api.get("/daily/<day>")
+def daily_report(day: str):
+    if _parse_date(day) is None:
+        return _error(400, "Date must be YYYY-MM-DD", "daily")
+    return _serve("daily", day, day, lambda: calculate_daily_metrics(day))
+
+
+@api.get("/range")
+def range_report():
+    start, end = _parse_date(request.args.get("start")), _parse_date(request.args.get("end"))
+    if start is None or end is None:
+        return _error(400, "start and end must be YYYY-MM-DD", "range")
+    if start > end:
+        return _error(400, "start must not be after end", "range")
+    if (end - start).days + 1 > MAX_RANGE_DAYS:
+        return _error(400, f"Range must not exceed {MAX_RANGE_DAYS} days", "range")
+
+    def compute():
+        from weekly_generator import calculate_weekly_metrics
+        return calculate_weekly_metrics(start.isoformat(), end.isoformat())
+
+    return _serve("range", start.isoformat(), end.isoformat(), compute)
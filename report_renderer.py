@@ -1,5 +1,7 @@
+from datetime import date as _date
 from typing import Dict
-from metrics_common import PROTEIN_RULES
+from metrics_common import current_rules
+from tracing import traced
 
 def _fmt_currency(value) -> str:
     try:
@@ -14,6 +16,7 @@ def _fmt_percent(part: int, total: int) -> str:
     return f"{round(part / total * 100)}%"
 
 
+@traced()
 def render_daily_report(report: Dict) -> str:
     """
     Render daily metrics JSON into a LINE-friendly text report.
@@ -96,6 +99,223 @@ def render_daily_report(report: Dict) -> str:
 
     return "\n".join(lines)
 
+@traced()
+def render_daily_diagnostics(diagnostics: Dict, zero_bowl_orders: list, *, max_orders: int = 5) -> str:
+    """
+    Render avg_bowl_price diagnostics (high-price and zero-bowl orders) for LINE.
+    """
+    def _order_line(order: Dict, detail: str) -> str:
+        moment = order.get("checkout_time")
+        clock = moment.strftime("%H:%M") if hasattr(moment, "strftime") else str(moment)[11:16]
+        items = order.get("items_text") or "（無品項）"
+        if len(items) > 40:
+            items = items[:40] + "…"
+        return f"・{clock} {_fmt_currency(order.get('invoice_amount', 0))}｜{detail}｜{items}"
+
+    lines = []
+    lines.append("🔍 單碗收入診斷")
+    lines.append(f"・平均單碗收入：{_fmt_currency(diagnostics.get('avg_bowl_price', 0))}")
+    lines.append(f"・高單價門檻（平均 ×1.2）：{_fmt_currency(diagnostics.get('high_price_threshold', 0))}")
+    lines.append("")
+
+    high_price_orders = diagnostics.get("top_5_high_price_orders", [])
+    lines.append(f"💎 高單價訂單（前 {len(high_price_orders)} 筆）")
+    if not high_price_orders:
+        lines.append("・無")
+    for order in high_price_orders:
+        detail = f"{order.get('bowls', 0)} 碗，每碗 {_fmt_currency(order.get('order_bowl_price', 0))}"
+        lines.append(_order_line(order, detail))
+    lines.append("")
+
+    lines.append(f"🥢 零碗訂單（共 {len(zero_bowl_orders)} 筆）")
+    if not zero_bowl_orders:
+        lines.append("・無")
+    for order in zero_bowl_orders[:max_orders]:
+        lines.append(_order_line(order, "0 碗"))
+    if len(zero_bowl_orders) > max_orders:
+        lines.append(f"・…其餘 {len(zero_bowl_orders) - max_orders} 筆")
+
+    return "\n".join(lines)
+
+
+_PERIOD_TITLES = {"month": "月報", "quarter": "季報", "ytd": "年報（YTD）"}
+
+
+@traced()
+def render_period_report(report: Dict) -> str:
+    """
+    Render calculate_period_metrics() (月報 / 季報 / 年報) into a LINE-friendly text report.
+    """
+    period = report.get("period", {})
+    days = report.get("days", {})
+    metrics = report.get("metrics", {})
+    periods = report.get("periods", {})
+    operational = report.get("operational", {})
+    payments = report.get("payments", {})
+
+    total_bowls = metrics.get("total_bowls", 0)
+    dine_in = metrics.get("dine_in_bowls", 0)
+    takeout = metrics.get("takeout_bowls", 0)
+
+    lines = []
+    title = _PERIOD_TITLES.get(period.get("kind"), "期間報表")
+    lines.append(f"📊 {title}｜{period.get('label', '')}")
+    lines.append(f"期間：{period.get('start_date', '')} – {period.get('end_date', '')}")
+    lines.append("")
+
+    lines.append("💰 營收概況")
+    lines.append(f"・總營收：{_fmt_currency(metrics.get('revenue', 0))}")
+    lines.append(f"・總訂單數：{metrics.get('total_orders', 0)}")
+    lines.append(f"・總出碗數：{total_bowls} 碗")
+    lines.append(f"・平均單碗收入：{_fmt_currency(metrics.get('avg_bowl_price', 0))}")
+    lines.append(f"・營業天數：{days.get('open_days', 0)}/{days.get('total_days', 0)} 天")
+    lines.append(f"・日均出碗：{days.get('avg_daily_bowls', 0)} 碗｜日均營收：{_fmt_currency(days.get('avg_daily_revenue', 0))}")
+    lines.append("")
+
+    lines.append("🍽 出餐結構")
+    lines.append(f"・內用：{dine_in} 碗({_fmt_percent(dine_in, total_bowls)})")
+    lines.append(f"・外帶：{takeout} 碗({_fmt_percent(takeout, total_bowls)})")
+    lines.append(f"・午餐：{periods.get('lunch_bowls', 0)} 碗｜晚餐：{periods.get('dinner_bowls', 0)} 碗")
+    lines.append("")
+
+    lines.append("🔥 尖峰時段")
+    for rank in ("first", "second"):
+        ratio = operational.get(f"{rank}_peak_hour_ratio", 0)
+        lines.append(
+            f"・{operational.get(f'{rank}_peak_hour', '--')}："
+            f"{operational.get(f'{rank}_peak_hour_bowls', 0)} 碗({round(ratio * 100)}%)"
+        )
+    lines.append("")
+
+    medal = ["🥇 ", "🥈 ", "🥉 "]
+    protein_rules = current_rules().protein_rules
+    lines.append("🥩 蛋白質碗數")
+    for idx, (protein, bowls) in enumerate(operational.get("protein_bowls", {}).items()):
+        icon = medal[idx] if idx < 3 else "・"
+        title_word = protein_rules[protein][0] if protein in protein_rules else protein
+        lines.append(f"{icon}{title_word} — {bowls} ({_fmt_percent(bowls, total_bowls)})")
+    lines.append("")
+
+    lines.append("💳 支付方式")
+    lines.append(f"・現金：{round(payments.get('pay_in_cash_order_ratio', 0) * 100)}%")
+    lines.append(f"・Line Pay：{round(payments.get('pay_in_LinePay_order_ratio', 0) * 100)}%")
+    lines.append("")
+
+    best_day, best_bowls = days.get("best_day") or ("--", 0)
+    worst_day, worst_bowls = days.get("worst_day") or ("--", 0)
+    lines.append("📅 日別量體")
+    lines.append(f"・最高出碗日：{best_day}({best_bowls} 碗)")
+    lines.append(f"・最低出碗日：{worst_day}({worst_bowls} 碗)")
+
+    breakdown = report.get("breakdown", [])
+    if breakdown:
+        lines.append("")
+        lines.append("🗓 逐月小計")
+        for month in breakdown:
+            lines.append(
+                f"・{month['label']}：{_fmt_currency(month['revenue'])}｜{month['bowls']} 碗｜{month['orders']} 單"
+            )
+
+    return "\n".join(lines)
+
+
+_SPARK_BLOCKS = "▁▂▃▄▅▆▇█"
+
+
+def _sparkline(values: list) -> str:
+    low, high = min(values), max(values)
+    if high == low:
+        return _SPARK_BLOCKS[3] * len(values)
+    scale = (len(_SPARK_BLOCKS) - 1) / (high - low)
+    return "".join(_SPARK_BLOCKS[round((value - low) * scale)] for value in values)
+
+
+@traced()
+def render_trend_report(series: list) -> str:
+    """
+    將 calculate_trend_series() 的結果轉成趨勢摘要：最新一天的 7 / 28 日均、
+    與 7 天前的 7 日均比較、蛋白質占比，以及整段序列的 7 日均碗數走勢。
+    """
+    latest = series[-1]
+    short, long = latest["7d"], latest["28d"]
+    protein_rules = current_rules().protein_rules
+
+    lines = []
+    lines.append(f"📈 趨勢｜截至 {latest['date']}")
+    lines.append("")
+
+    lines.append("🍽 日均出碗 / 營收")
+    week_ago = series[-8]["7d"] if len(series) >= 8 else None
+    change = ""
+    if week_ago and week_ago["avg_bowls"]:
+        delta = (short["avg_bowls"] - week_ago["avg_bowls"]) / week_ago["avg_bowls"] * 100
+        change = f"（前 7 日 {week_ago['avg_bowls']} 碗，{delta:+.1f}%）"
+    lines.append(f"・近 7 日：{short['avg_bowls']} 碗｜{_fmt_currency(short['avg_revenue'])}{change}")
+    lines.append(f"・近 28 日：{long['avg_bowls']} 碗｜{_fmt_currency(long['avg_revenue'])}")
+    lines.append(
+        f"・平均單碗收入：7 日 {_fmt_currency(short['avg_bowl_price'])}｜28 日 {_fmt_currency(long['avg_bowl_price'])}"
+    )
+    lines.append("")
+
+    lines.append("🥩 蛋白質占比（7 日 / 28 日）")
+    ranked = sorted(short["protein_share"].items(), key=lambda kv: -kv[1])
+    for protein, share in ranked:
+        title = protein_rules[protein][0] if protein in protein_rules else protein
+        lines.append(f"・{title} {round(share * 100)}% / {round(long['protein_share'].get(protein, 0) * 100)}%")
+    lines.append("")
+
+    lines.append(f"📉 7 日均碗數（{series[0]['date']} – {latest['date']}）")
+    lines.append(_sparkline([entry["7d"]["avg_bowls"] for entry in series]))
+
+    return "\n".join(lines)
+
+
+_WEEKDAYS = "一二三四五六日"
+
+
+@traced()
+def render_daily_range_report(days: list, results: list) -> str:
+    """
+    將 calculate_daily_metrics_range() 的結果轉成逐日一行的文字報表。
+
+    days 與 results 一一對應；results 中的 None 表示當天無營業資料。
+    """
+    protein_rules = current_rules().protein_rules
+    reported = [result for result in results if result is not None]
+    total_revenue = sum(result["metrics"]["revenue"] for result in reported)
+    total_bowls = sum(result["metrics"]["total_bowls"] for result in reported)
+
+    lines = []
+    lines.append(f"📊 逐日營運｜{days[0]} – {days[-1]}" if days else "📊 逐日營運")
+    lines.append(f"・營業天數：{len(reported)}/{len(days)} 天")
+    lines.append(f"・總營收：{_fmt_currency(total_revenue)}")
+    lines.append(f"・總出碗數：{total_bowls} 碗")
+    if reported:
+        lines.append(f"・日均出碗：{round(total_bowls / len(reported), 1)} 碗")
+    lines.append("")
+
+    for day, result in zip(days, results):
+        parsed = _date.fromisoformat(day)
+        label = f"{parsed:%m/%d}({_WEEKDAYS[parsed.weekday()]})"
+        if result is None:
+            lines.append(f"{label} —")
+            continue
+
+        metrics = result["metrics"]
+        periods = result["periods"]
+        operational = result["operational"]
+        first_protein = operational.get("first_protein")
+        protein_title = protein_rules[first_protein][0] if first_protein in protein_rules else "--"
+        lines.append(
+            f"{label} {_fmt_currency(metrics['revenue'])}｜{metrics['total_bowls']} 碗"
+            f"｜午 {periods['lunch_bowls']} / 晚 {periods['dinner_bowls']}"
+            f"｜{protein_title} {operational.get('first_protein_bowls', 0)}"
+        )
+
+    return "\n".join(lines)
+
+
+@traced()
 def render_weekly_report(data: dict,
                                       ichef_monthly_limit: int = 150) -> str:
     """
@@ -132,10 +352,11 @@ def render_weekly_report(data: dict,
 
     medal = ["🥇 ", "🥈 ", "🥉 "]
 
+    protein_rules = current_rules().protein_rules
     protein_lines = []
     for idx, (protein, ratio) in enumerate(protein_rank_ratio):
         icon = medal[idx] if idx < 3 else ""
-        title = PROTEIN_RULES[protein][0]
+        title = protein_rules[protein][0]
         amount = data['protein_events_dict'][protein]
         protein_lines.append("{}{} — {} ({:.2f}%)".format(icon, title, amount, ratio))
 
@@ -188,5 +409,58 @@ Line Pay：{linepay}
 最低出碗日：{min_day or '--'}({min_bowls} 碗)
 """
 
+    comparisons = data.get("comparisons")
+    if comparisons:
+        report = report.strip() + "\n\n" + _render_weekly_comparison(data, comparisons)
+
     return report.strip()
 
+
+_COMPARISON_TITLES = {"previous": "上週", "last_year": "去年同週"}
+
+# (標題, 取值, 是否為金額)
+_COMPARISON_ROWS = [
+    ("總營收", lambda d: d.get("total_revenue", 0), True),
+    ("總訂單數", lambda d: d.get("total_orders", 0), False),
+    ("總出碗數", lambda d: d.get("total_bowls", 0), False),
+    ("平均單碗收入", lambda d: float(d.get("avg_bowl_price", 0)), True),
+    ("內用", lambda d: d.get("dine_in_orders", 0), False),
+    ("外帶", lambda d: d.get("takeout_orders", 0), False),
+    ("雲端餐廳", lambda d: d.get("online_orders", 0), False),
+    ("Line Pay", lambda d: d.get("linepay_orders", 0), False),
+    ("現金", lambda d: d.get("cash_orders", 0), False),
+]
+
+
+def _fmt_delta(current, previous, currency: bool) -> str:
+    delta = current - previous
+    sign = "+" if delta >= 0 else "-"
+    amount = f"{sign}${abs(delta):,.0f}" if currency else f"{sign}{abs(delta):,.0f}"
+    if not previous:
+        return f"{amount}(--)"
+    return f"{amount}({delta / previous * 100:+.1f}%)"
+
+
+def _render_weekly_comparison(data: dict, comparisons: dict) -> str:
+    """週報的同期比較段落：每列一個指標，逐一列出與各比較期間的差額與增減率。"""
+    lines = ["━━━━━━━━━━━━━━━━━━", "六、同期比較"]
+    for name, other in comparisons.items():
+        title = _COMPARISON_TITLES.get(name, name)
+        if other is None:
+            lines.append(f"{title}：無資料")
+        else:
+            lines.append(f"{title}：{other.get('start_date', '')} – {other.get('end_date', '')}")
+    lines.append("")
+
+    for label, value, currency in _COMPARISON_ROWS:
+        current = value(data)
+        shown = f"${current:,.0f}" if currency else f"{current:,.0f}"
+        cells = [
+            f"{_COMPARISON_TITLES.get(name, name)} {_fmt_delta(current, value(other), currency)}"
+            for name, other in comparisons.items()
+            if other is not None
+        ]
+        lines.append(f"{label}：{shown}" + ("｜" + "｜".join(cells) if cells else ""))
+
+    return "\n".join(lines)
+
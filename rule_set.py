@@ -0,0 +1,296 @@
+"""
+營運規則設定檔（rules.json）→ 不可變的 RuleSet。
+
+RuleSet 在載入時就把規則編譯好（營業時段的 time 物件、關鍵字 regex、
+加購金額可達表），並以設定內容算出 hash。所有以規則為 key 的快取
+（item memo、價格時間軸…）都用這個 hash 分區，換規則即自動失效。
+
+RuleSetSource 追蹤設定檔的 mtime，檔案一變就重新載入；新檔案有誤時
+保留舊的 RuleSet 繼續服務。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, time as dt_time
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Mapping, Optional, Pattern
+
+SUPPORTED_VERSIONS = {1}
+
+# 預先算好可達加購金額的範圍（超過時退回即時計算）
+_ADDON_TABLE_MARGIN = 10
+
+_NEVER_MATCHES = re.compile(r"(?!)")
+
+
+class RuleSetError(ValueError):
+    """設定檔格式錯誤或版本不支援。"""
+
+
+def _compile_any(words) -> Pattern:
+    if not words:
+        return _NEVER_MATCHES
+    return re.compile("|".join(re.escape(word) for word in words))
+
+
+def _compile_all(words) -> Pattern:
+    # 需同時包含所有關鍵字；以 lookahead 串接，用 match() 從開頭判斷
+    return re.compile("".join(f"(?=.*{re.escape(word)})" for word in words), re.S)
+
+
+def _reachable_addon_totals(prices, limit: int) -> tuple[bool, ...]:
+    """無界背包：0..limit 之間哪些金額可由加購單價組合而成。"""
+    reachable = [False] * (limit + 1)
+    reachable[0] = True
+    for subtotal in range(limit + 1):
+        if not reachable[subtotal]:
+            continue
+        for price in prices:
+            if subtotal + price <= limit:
+                reachable[subtotal + price] = True
+    return tuple(reachable)
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+@dataclass(frozen=True)
+class RuleSet:
+    version: int
+    hash: str
+    source: str
+
+    business_hours: Mapping[str, Mapping[str, str]]
+    bowls_keywords: tuple[str, ...]
+    exclude_items: tuple[str, ...]
+    bowl_base_prices: Mapping[str, float]
+    promotions: tuple[tuple[Optional[date], date, float, str], ...]
+    default_pricing_date: date
+    known_addon_prices: tuple[int, ...]
+    max_addon_per_bowl: int
+    protein_rules: Mapping[str, tuple[str, ...]]
+    set_meal_rules: Mapping[str, Mapping[str, int]]
+
+    # --- 編譯結果 ---
+    period_bounds: Mapping[str, tuple[dt_time, dt_time]]
+    protein_keywords: tuple[str, ...]
+    bowl_matcher: Pattern
+    exclude_matcher: Pattern
+    protein_matchers: Mapping[str, Pattern]
+    protein_keyword_matcher: Pattern
+    modifier_matchers: Mapping[str, Pattern]
+    set_meal_matcher: Pattern
+    addon_reachable: tuple[bool, ...]
+
+    @classmethod
+    def from_mapping(cls, data: Mapping[str, Any], *, source: str = "<memory>") -> "RuleSet":
+        version = data.get("version")
+        if version not in SUPPORTED_VERSIONS:
+            raise RuleSetError(f"Unsupported rules version: {version!r}")
+
+        try:
+            business_hours = data["business_hours"]
+            protein_rules = {key: list(words) for key, words in data["protein_rules"].items()}
+            promotions = tuple(
+                (
+                    date.fromisoformat(promo["start"]) if promo.get("start") else None,
+                    date.fromisoformat(promo["end"]),
+                    float(promo["discount"]),
+                    promo.get("note", ""),
+                )
+                for promo in data.get("promotions", [])
+            )
+            period_bounds = {
+                period: (
+                    datetime.strptime(bounds["start"], "%H:%M").time(),
+                    datetime.strptime(bounds["end"], "%H:%M").time(),
+                )
+                for period, bounds in business_hours.items()
+            }
+            max_addon = int(data["max_addon_per_bowl"])
+            addon_prices = [int(price) for price in data["known_addon_prices"]]
+            default_pricing_date = date.fromisoformat(data["default_pricing_date"])
+            bowls_keywords = list(data["bowls_keywords"])
+            exclude_items = list(data["exclude_items"])
+            bowl_base_prices = dict(data["bowl_base_prices"])
+            set_meal_rules = {name: dict(proteins) for name, proteins in data["set_meal_rules"].items()}
+        except (KeyError, TypeError, ValueError) as exc:
+            raise RuleSetError(f"Invalid rules in {source}: {exc}") from exc
+
+        # hash 以正規化後的內容計算（不排序 key：品名與蛋白質的順序會影響比對與報表）
+        normalized = {
+            "version": version,
+            "business_hours": {
+                period: {"start": bounds["start"], "end": bounds["end"]}
+                for period, bounds in business_hours.items()
+            },
+            "bowls_keywords": bowls_keywords,
+            "exclude_items": exclude_items,
+            "bowl_base_prices": bowl_base_prices,
+            "promotions": [
+                [start.isoformat() if start else None, end.isoformat(), discount, note]
+                for start, end, discount, note in promotions
+            ],
+            "default_pricing_date": default_pricing_date.isoformat(),
+            "known_addon_prices": addon_prices,
+            "max_addon_per_bowl": max_addon,
+            "protein_rules": protein_rules,
+            "set_meal_rules": set_meal_rules,
+        }
+        canonical = json.dumps(normalized, ensure_ascii=False)
+        protein_keywords = [keyword for words in protein_rules.values() for keyword in words]
+
+        return cls(
+            version=version,
+            hash=hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16],
+            source=source,
+            business_hours=_freeze(normalized["business_hours"]),
+            bowls_keywords=tuple(bowls_keywords),
+            exclude_items=tuple(exclude_items),
+            bowl_base_prices=MappingProxyType(bowl_base_prices),
+            promotions=promotions,
+            default_pricing_date=default_pricing_date,
+            known_addon_prices=tuple(addon_prices),
+            max_addon_per_bowl=max_addon,
+            protein_rules=_freeze(protein_rules),
+            set_meal_rules=_freeze(set_meal_rules),
+            period_bounds=MappingProxyType(period_bounds),
+            protein_keywords=tuple(protein_keywords),
+            bowl_matcher=_compile_any(bowls_keywords),
+            exclude_matcher=_compile_any(exclude_items),
+            protein_matchers=MappingProxyType({
+                protein: _compile_all(words) for protein, words in protein_rules.items()
+            }),
+            protein_keyword_matcher=_compile_any(protein_keywords),
+            # 加購品名只要含任一關鍵字即算該蛋白質（如「雞胸肉 加量」）
+            modifier_matchers=MappingProxyType({
+                protein: _compile_any(words) for protein, words in protein_rules.items()
+            }),
+            set_meal_matcher=_compile_any(list(set_meal_rules)),
+            addon_reachable=_reachable_addon_totals(addon_prices, max_addon + _ADDON_TABLE_MARGIN),
+        )
+
+    def to_mapping(self) -> dict:
+        """還原成 rules.json 的結構（可再丟回 from_mapping）。"""
+        return {
+            "version": self.version,
+            "business_hours": {period: dict(bounds) for period, bounds in self.business_hours.items()},
+            "bowls_keywords": list(self.bowls_keywords),
+            "exclude_items": list(self.exclude_items),
+            "bowl_base_prices": dict(self.bowl_base_prices),
+            "promotions": [
+                {
+                    "start": start.isoformat() if start else None,
+                    "end": end.isoformat(),
+                    "discount": discount,
+                    "note": note,
+                }
+                for start, end, discount, note in self.promotions
+            ],
+            "default_pricing_date": self.default_pricing_date.isoformat(),
+            "known_addon_prices": list(self.known_addon_prices),
+            "max_addon_per_bowl": self.max_addon_per_bowl,
+            "protein_rules": {protein: list(words) for protein, words in self.protein_rules.items()},
+            "set_meal_rules": {name: dict(proteins) for name, proteins in self.set_meal_rules.items()},
+        }
+
+    def replace(self, **changes) -> "RuleSet":
+        """以 rules.json 的 key 覆寫部分規則，回傳新的 RuleSet（重新編譯、重新算 hash）。"""
+        data = self.to_mapping()
+        data.update(changes)
+        return RuleSet.from_mapping(data, source=f"{self.source} (modified)")
+
+    # --- 規則判斷 ---
+    def is_valid_bowl_item(self, item: str) -> bool:
+        return bool(self.bowl_matcher.search(item)) and not self.exclude_matcher.search(item)
+
+    def matching_proteins(self, item: str) -> tuple[str, ...]:
+        if not self.protein_keyword_matcher.search(item):
+            return ()
+        return tuple(protein for protein, matcher in self.protein_matchers.items() if matcher.match(item))
+
+    def modifier_proteins(self, name: str) -> tuple[str, ...]:
+        if not self.protein_keyword_matcher.search(name):
+            return ()
+        return tuple(protein for protein, matcher in self.modifier_matchers.items() if matcher.search(name))
+
+    def set_meal_proteins(self, item: str) -> dict[str, int]:
+        counts: dict[str, int] = {}
+        if not self.set_meal_matcher.search(item):
+            return counts
+        for meal_name, protein_map in self.set_meal_rules.items():
+            if meal_name in item:
+                for protein, qty in protein_map.items():
+                    counts[protein] = counts.get(protein, 0) + qty
+        return counts
+
+
+def load_rule_set(path) -> RuleSet:
+    path = Path(path)
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError as exc:
+        raise RuleSetError(f"Invalid JSON in {path}: {exc}") from exc
+    return RuleSet.from_mapping(data, source=str(path))
+
+
+class RuleSetSource:
+    """
+    追蹤設定檔並在內容變更時熱切換 RuleSet。
+
+    current() 最多每 check_interval 秒 stat 一次檔案，其他時候直接回傳快取，
+    適合在每次計算時呼叫。
+    """
+
+    def __init__(self, path, *, check_interval: float = 2.0):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime_ns = os.stat(self.path).st_mtime_ns
+        self._rule_set = load_rule_set(self.path)
+        self._next_check = time.monotonic() + check_interval
+        self._override: Optional[RuleSet] = None
+
+    def current(self) -> RuleSet:
+        if self._override is not None:
+            return self._override
+        if time.monotonic() >= self._next_check:
+            self.reload_if_changed()
+        return self._rule_set
+
+    def reload_if_changed(self) -> bool:
+        """檔案 mtime 改變就重新載入；回傳是否換成新的 RuleSet。"""
+        with self._lock:
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                mtime_ns = os.stat(self.path).st_mtime_ns
+            except OSError:
+                return False
+            if mtime_ns == self._mtime_ns:
+                return False
+            try:
+                rule_set = load_rule_set(self.path)
+            except (OSError, RuleSetError) as exc:
+                print(f"⚠️  規則檔載入失敗，沿用舊規則：{exc}")
+                return False
+            self._mtime_ns = mtime_ns
+            changed = rule_set.hash != self._rule_set.hash
+            self._rule_set = rule_set
+            return changed
+
+    def override(self, rule_set: Optional[RuleSet]) -> Optional[RuleSet]:
+        """強制使用指定 RuleSet（None 還原為設定檔）；回傳先前的 override。"""
+        previous, self._override = self._override, rule_set
+        return previous
@@ -0,0 +1,194 @@
+"""
+行程內排程器：不需要外部 cron，工作狀態存在 SQLite 的 scheduled_jobs 表。
+
+每個工作有固定間隔，next_run_at 寫在表裡，bot 重啟後沿用原本的排程，
+不會一啟動就把所有工作重跑一次。認領工作時用條件式 UPDATE（next_run_at <= now），
+同一個工作同一時間只會有一個執行者。
+
+    python scheduler.py list
+"""
+import argparse
+import sqlite3
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+import metrics_common
+
+JOBS_DDL = """
+    CREATE TABLE IF NOT EXISTS scheduled_jobs (
+        name TEXT PRIMARY KEY,
+        interval_seconds INTEGER NOT NULL,
+        next_run_at TEXT NOT NULL,
+        last_run_at TEXT,
+        last_status TEXT,
+        last_error TEXT,
+        last_duration_ms REAL
+    )
+"""
+
+
+def _now() -> datetime:
+    return datetime.now()
+
+
+def _stamp(moment: datetime) -> str:
+    return moment.isoformat(timespec="seconds")
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(metrics_common.DB_PATH, timeout=30)
+    conn.execute(JOBS_DDL)
+    return conn
+
+
+class Scheduler:
+    """register() 登記工作，run_pending() 執行到期的工作；start() 在背景執行緒定期呼叫 run_pending()。"""
+
+    def __init__(self, *, poll_seconds: float = 30):
+        self.poll_seconds = poll_seconds
+        self.jobs: dict[str, tuple[int, Callable[[], object]]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # 已寫入 scheduled_jobs 的工作；import 時不碰 DB（gunicorn master 此時尚未切 WAL）
+        self._persisted: set[str] = set()
+
+    def register(self, name: str, interval_seconds: int, func: Callable[[], object]) -> None:
+        """只記在記憶體；scheduled_jobs 的列在第一次 run_pending() / trigger() 時才寫入（見 persist_jobs）。"""
+        self.jobs[name] = (interval_seconds, func)
+        self._persisted.discard(name)
+
+    def persist_jobs(self) -> None:
+        """新工作立即到期；已存在的工作保留原本的 next_run_at，只更新間隔。"""
+        pending = [(name, interval_seconds) for name, (interval_seconds, _) in self.jobs.items()
+                   if name not in self._persisted]
+        if not pending:
+            return
+        conn = _connect()
+        try:
+            metrics_common.begin_write(conn, "scheduler")
+            for name, interval_seconds in pending:
+                conn.execute(
+                    "INSERT OR IGNORE INTO scheduled_jobs (name, interval_seconds, next_run_at) VALUES (?, ?, ?)",
+                    (name, interval_seconds, _stamp(_now())),
+                )
+                conn.execute("UPDATE scheduled_jobs SET interval_seconds = ? WHERE name = ?",
+                             (interval_seconds, name))
+            conn.commit()
+        finally:
+            conn.close()
+        self._persisted.update(name for name, _ in pending)
+
+    def trigger(self, name: str) -> None:
+        """讓工作在下一次輪詢時執行（例如匯入 CSV 之後）。"""
+        self.persist_jobs()
+        conn = _connect()
+        try:
+            metrics_common.begin_write(conn, "scheduler")
+            conn.execute("UPDATE scheduled_jobs SET next_run_at = ? WHERE name = ?", (_stamp(_now()), name))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _claim(self, name: str, interval_seconds: int, now: datetime) -> bool:
+        conn = _connect()
+        try:
+            metrics_common.begin_write(conn, "scheduler")
+            claimed = conn.execute(
+                "UPDATE scheduled_jobs SET next_run_at = ? WHERE name = ? AND next_run_at <= ?",
+                (_stamp(now + timedelta(seconds=interval_seconds)), name, _stamp(now)),
+            ).rowcount
+            conn.commit()
+            return claimed == 1
+        finally:
+            conn.close()
+
+    def _record(self, name: str, started: datetime, status: str, error: Optional[str], duration_ms: float) -> None:
+        conn = _connect()
+        try:
+            metrics_common.begin_write(conn, "scheduler")
+            conn.execute(
+                """
+                UPDATE scheduled_jobs
+                SET last_run_at = ?, last_status = ?, last_error = ?, last_duration_ms = ?
+                WHERE name = ?
+                """,
+                (_stamp(started), status, error, round(duration_ms, 1), name),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def run_pending(self, now: Optional[datetime] = None) -> list[str]:
+        """執行所有到期的工作，回傳實際執行的工作名稱；單一工作失敗不影響其他工作。"""
+        self.persist_jobs()
+        now = now or _now()
+        ran = []
+        for name, (interval_seconds, func) in self.jobs.items():
+            if not self._claim(name, interval_seconds, now):
+                continue
+            started = time.perf_counter()
+            try:
+                func()
+            except Exception:
+                status, error = "error", traceback.format_exc(limit=3)
+            else:
+                status, error = "ok", None
+            self._record(name, now, status, error, (time.perf_counter() - started) * 1000)
+            ran.append(name)
+        return ran
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except sqlite3.Error as exc:
+                print(f"⚠️  Scheduler poll failed: {exc}")
+            self._stop.wait(self.poll_seconds)
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def count_due_jobs(now: Optional[datetime] = None) -> int:
+    """已到期、等待下一次輪詢執行的工作數（/metrics 的佇列深度）。"""
+    conn = _connect()
+    try:
+        return conn.execute(
+            "SELECT COUNT(*) FROM scheduled_jobs WHERE next_run_at <= ?", (_stamp(now or _now()),)
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def list_jobs() -> list[tuple]:
+    conn = _connect()
+    try:
+        return conn.execute(
+            "SELECT name, interval_seconds, next_run_at, last_run_at, last_status, last_duration_ms "
+            "FROM scheduled_jobs ORDER BY name"
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the in-process scheduler's job table")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="Print every job and its last run")
+    args = parser.parse_args()
+
+    for name, interval, next_run, last_run, status, duration in list_jobs():
+        last = f"{last_run} {status} {duration} ms" if last_run else "never run"
+        print(f"{name}: every {interval}s, next {next_run} | last: {last}")
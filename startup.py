@@ -0,0 +1,169 @@
+"""
+bot 啟動暖機與就緒狀態。
+
+line_bot_app 在模組層只載入 Flask / LINE SDK 與輕量模組，pandas、weekly_generator、
+打卡分析與 CSV 匯入等重模組都在 handler 內延遲 import；行程啟動後由 warm_up()
+在背景執行緒依序：
+- 預先 import 所有 handler 會用到的模組（逐一計時）
+- 載入規則（已編譯的 matcher）、價格時間軸與 item memo
+- 把最近 RECENT_DAYS 天的每日快照與日報文字（daily_report 表）、最近結束的週報快照算好
+
+全部完成後 STATE.ready 才會變成 True，/readyz 才回 200；單一階段失敗只記錄錯誤，
+不會讓 bot 永遠停在未就緒。
+
+    python startup.py           # 暖機一次並列出各階段耗時
+    python startup.py --json
+"""
+import argparse
+import importlib
+import json
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import date, timedelta
+from functools import partial
+from typing import Optional
+
+# handler 延遲 import 的模組，暖機時依序載入；先載入的模組吸收共用相依（如 pandas）的成本
+HANDLER_MODULES = (
+    "pandas",
+    "daily_metrics",
+    "daily_snapshot",
+    "period_metrics",
+    "trend_metrics",
+    "weekly_generator",
+    "weekly_snapshot",
+    "daily_push",
+    "import_csv",
+    "import_modifier_csv",
+    "clock_in_out_analyzer",
+    "openpyxl",
+    "openpyxl.styles",
+)
+
+# 啟動時預先算好快照的天數（分析 今天 / 昨天 / 最近一週最常被查）
+RECENT_DAYS = 7
+
+
+class StartupState:
+    """啟動各階段的耗時紀錄與就緒旗標；/readyz 與 startup 報表都讀 snapshot()。"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.stages: list[dict] = []
+        self.ready = False
+        self.finished_ms: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            raise
+        finally:
+            entry = {"name": name, "ms": round((time.perf_counter() - started) * 1000, 1)}
+            if error:
+                entry["error"] = error
+            with self._lock:
+                self.stages.append(entry)
+
+    def mark_ready(self) -> None:
+        with self._lock:
+            self.finished_ms = round((time.perf_counter() - self.started_at) * 1000, 1)
+            self.ready = True
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "boot_ms": self.finished_ms,
+                "stages": [dict(entry) for entry in self.stages],
+            }
+
+
+# 行程層級的狀態：line_bot_app 在 import 時就建立，模組層 import 的耗時也記在這裡
+STATE = StartupState()
+
+
+def import_modules(state: StartupState, modules: Optional[tuple] = None) -> None:
+    for name in HANDLER_MODULES if modules is None else modules:
+        with state.stage(f"import {name}"):
+            importlib.import_module(name)
+
+
+def warm_rules(state: StartupState) -> None:
+    from metrics_common import current_rules, get_price_timeline, item_memo_version, load_item_memo
+
+    with state.stage("rules + price timeline"):
+        rules = current_rules()
+        timeline = get_price_timeline(refresh=True)
+    with state.stage("item memo"):
+        load_item_memo(item_memo_version(timeline, rules))
+
+
+def precompute_recent(state: StartupState, today: Optional[date] = None, days: int = RECENT_DAYS) -> None:
+    from daily_push import build_daily_report, load_daily_report
+    from daily_snapshot import refresh_daily_snapshots
+    from weekly_snapshot import precompute_weekly_snapshots
+
+    today = today or date.today()
+    recent = [(today - timedelta(days=offset)).isoformat() for offset in range(days)]
+    with state.stage(f"daily snapshots ({days} days)"):
+        accumulators = refresh_daily_snapshots(recent)
+    with state.stage(f"daily reports ({days} days)"):
+        # 存進 daily_report 表，「分析 YYYY-MM-DD」直接回傳；沒有訂單的日子略過
+        for day, accumulator in accumulators.items():
+            if accumulator.to_daily_metrics(day) is not None and load_daily_report(day) is None:
+                build_daily_report(day)
+    with state.stage("weekly snapshots"):
+        precompute_weekly_snapshots(today)
+
+
+def warm_up(state: StartupState = STATE, today: Optional[date] = None) -> dict:
+    """依序執行各暖機步驟後標記就緒，回傳 state.snapshot()。"""
+    for step in (import_modules, warm_rules, partial(precompute_recent, today=today)):
+        try:
+            step(state)
+        except Exception:
+            traceback.print_exc(limit=3)
+    state.mark_ready()
+    return state.snapshot()
+
+
+def start_warm_up(state: StartupState = STATE) -> threading.Thread:
+    thread = threading.Thread(target=warm_up, args=(state,), name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def render_startup_report(snapshot: dict) -> str:
+    """各階段耗時由大到小排列，附占整體的比例。"""
+    stages = snapshot["stages"]
+    total = sum(entry["ms"] for entry in stages) or 1
+    status = "ready" if snapshot["ready"] else "warming up"
+    lines = [f"Startup: {status}, boot {snapshot['boot_ms'] or '-'} ms, {len(stages)} stages"]
+    width = max((len(entry["name"]) for entry in stages), default=0)
+    for entry in sorted(stages, key=lambda entry: entry["ms"], reverse=True):
+        share = entry["ms"] / total
+        line = f"  {entry['name']:<{width}}  {entry['ms']:>8.1f} ms  {share:>6.1%}  {'#' * round(share * 30)}"
+        if "error" in entry:
+            line += f"  ! {entry['error']}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the bot's warm-up once and report where boot time goes")
+    parser.add_argument("--json", action="store_true", help="Print the raw stage timings as JSON")
+    args = parser.parse_args()
+
+    snapshot = warm_up()
+    if args.json:
+        print(json.dumps(snapshot, ensure_ascii=False, indent=2))
+    else:
+        print(render_startup_report(snapshot))
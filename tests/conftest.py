@@ -20,6 +20,41 @@ CREATE TABLE raw_orders (
 );
 """
 
+# 與 create_tables.sql 相同；週報相關測試才需要
+CREATE_MODIFIER_SUMMARY = """
+CREATE TABLE modifier_summary (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    name TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    total_price_change REAL NOT NULL DEFAULT 0.0,
+    source_file TEXT NOT NULL,
+    imported_at TEXT NOT NULL
+);
+"""
+
+@pytest.fixture(autouse=True)
+def _isolated_db_path(tmp_path, monkeypatch):
+    # 快取類資料（如 item_memo）會寫回 DB_PATH，避免測試碰到真正的資料庫
+    monkeypatch.setattr(metrics_common, "DB_PATH", str(tmp_path / "isolated.db"))
+
+
+@pytest.fixture
+def override_rules():
+    """以 rules.json 為底覆寫部分規則，測試結束後還原。"""
+    previous = []
+
+    def _apply(**changes):
+        rule_set = metrics_common.current_rules().replace(**changes)
+        previous.append(metrics_common.override_rules(rule_set))
+        return rule_set
+
+    yield _apply
+    if previous:
+        metrics_common.override_rules(previous[0])
+
+
 @pytest.fixture
 def db(tmp_path, monkeypatch):
     db_path = tmp_path / "test.db"
@@ -29,6 +64,14 @@ def db(tmp_path, monkeypatch):
     monkeypatch.setattr(metrics_common, "DB_PATH", str(db_path))
     return db_path
 
+@pytest.fixture
+def modifier_summary(db):
+    """在 db 加上空的 modifier_summary 表，回傳 db 路徑。"""
+    conn = sqlite3.connect(str(db))
+    conn.executescript(CREATE_MODIFIER_SUMMARY)
+    conn.close()
+    return db
+
 _order_counter = 0
 
 def insert_order(db_path, *, checkout_time, items_text, invoice_amount,
@@ -49,3 +92,14 @@ def insert_order(db_path, *, checkout_time, items_text, invoice_amount,
           invoice_amount, payment_method, order_status, items_text))
     conn.commit()
     conn.close()
+
+
+def insert_modifier(db_path, *, start_date, end_date, name, count, total_price_change=0.0):
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("""
+        INSERT INTO modifier_summary
+          (start_date, end_date, name, count, total_price_change, source_file, imported_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (start_date, end_date, name, count, total_price_change, "modifier.csv", "2026-01-01T00:00:00"))
+    conn.commit()
+    conn.close()
@@ -0,0 +1,124 @@
+import sqlite3
+import threading
+
+import pytest
+from conftest import insert_order
+
+import bot_metrics
+import metrics_common
+from daily_snapshot import refresh_daily_snapshots
+
+
+@pytest.fixture(autouse=True)
+def _fresh_registry(monkeypatch):
+    monkeypatch.setattr(bot_metrics, "_counters", {})
+    monkeypatch.setattr(bot_metrics, "_gauges", {})
+    monkeypatch.setattr(bot_metrics, "_collectors", [])
+
+
+def _samples(text):
+    return {
+        line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+        for line in text.splitlines() if line and not line.startswith("#")
+    }
+
+
+def test_histogram_exposition(db):
+    bot_metrics.observe("pokebee_webhook_seconds", 0.3, command="週報")
+    bot_metrics.observe("pokebee_webhook_seconds", 3.0, command="週報")
+    text = bot_metrics.render_metrics()
+
+    assert "# TYPE pokebee_webhook_seconds histogram" in text
+    samples = _samples(text)
+    assert samples['pokebee_webhook_seconds_bucket{command="週報",le="0.05"}'] == 0
+    assert samples['pokebee_webhook_seconds_bucket{command="週報",le="0.5"}'] == 1
+    assert samples['pokebee_webhook_seconds_bucket{command="週報",le="+Inf"}'] == 2
+    assert samples['pokebee_webhook_seconds_count{command="週報"}'] == 2
+    assert samples['pokebee_webhook_seconds_sum{command="週報"}'] == pytest.approx(3.3)
+
+    lines = [line for line in text.splitlines() if line.startswith("pokebee_webhook_seconds_bucket")]
+    bounds = [line.split('le="')[1].split('"')[0] for line in lines]
+    assert bounds == ["0.05", "0.1", "0.25", "0.5", "1.0", "2.5", "5.0", "10.0", "30.0", "+Inf"]
+
+
+def test_flushes_from_several_processes_are_summed(db):
+    bot_metrics.inc("pokebee_clock_analyses_total", result="ok")
+    bot_metrics.set_gauge("pokebee_import_rows_per_second", 100.0, file="payment")
+    bot_metrics.flush(force=True)
+    # 另一個 worker 的增量寫進同一張表
+    bot_metrics.inc("pokebee_clock_analyses_total", 2, result="ok")
+    bot_metrics.set_gauge("pokebee_import_rows_per_second", 250.0, file="payment")
+    bot_metrics.flush(force=True)
+
+    samples = _samples(bot_metrics.render_metrics())
+    assert samples['pokebee_clock_analyses_total{result="ok"}'] == 3
+    assert samples['pokebee_import_rows_per_second{file="payment"}'] == 250
+
+
+def test_flush_is_rate_limited_and_keeps_deltas_on_failure(db, monkeypatch):
+    bot_metrics.inc("pokebee_clock_analyses_total", result="ok")
+    monkeypatch.setattr(bot_metrics, "_last_flush", bot_metrics.time.monotonic())
+    bot_metrics.flush()
+    assert bot_metrics._counters
+
+    def _broken():
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(bot_metrics, "_connect", _broken)
+    bot_metrics.flush(force=True)
+    assert bot_metrics._counters == {("pokebee_clock_analyses_total", 'result="ok"'): 1.0}
+
+
+def test_label_escaping():
+    assert bot_metrics._labels({"le": 0.5, "command": 'a"b\\c'}) == 'command="a\\"b\\\\c",le="0.5"'
+
+
+def test_collectors(db):
+    bot_metrics.register_collector(lambda: [("pokebee_queue_depth", 4, {"queue": "scheduler"})])
+    text = bot_metrics.render_metrics()
+
+    assert "# TYPE pokebee_queue_depth gauge" in text
+    assert 'pokebee_queue_depth{queue="scheduler"} 4' in text
+
+
+def test_daily_snapshot_cache_results(db):
+    insert_order(db, checkout_time="2026-05-04 11:30:00", items_text="雞胸肉自選碗 $160.0", invoice_amount=160)
+    refresh_daily_snapshots(["2026-05-04", "2026-05-05"])
+    refresh_daily_snapshots(["2026-05-04"])
+    insert_order(db, checkout_time="2026-05-04 12:30:00", items_text="雞胸肉自選碗 $160.0", invoice_amount=160)
+    refresh_daily_snapshots(["2026-05-04"])
+
+    samples = _samples(bot_metrics.render_metrics())
+    assert samples['pokebee_report_cache_total{cache="daily",result="rebuild"}'] == 2
+    assert samples['pokebee_report_cache_total{cache="daily",result="hit"}'] == 1
+    assert samples['pokebee_report_cache_total{cache="daily",result="incremental"}'] == 1
+
+
+def test_record_import(db):
+    bot_metrics.record_import("payment", 90, 10, 0.5)
+    samples = _samples(bot_metrics.render_metrics())
+
+    assert samples['pokebee_import_rows_total{file="payment",result="inserted"}'] == 90
+    assert samples['pokebee_import_rows_total{file="payment",result="skipped"}'] == 10
+    assert samples['pokebee_import_rows_per_second{file="payment"}'] == 200
+
+
+def test_sqlite_lock_wait(db):
+    holder = sqlite3.connect(str(db), check_same_thread=False)
+    holder.execute("BEGIN IMMEDIATE")
+    timer = threading.Timer(0.2, holder.commit)
+    timer.start()
+
+    conn = sqlite3.connect(str(db), timeout=5)
+    try:
+        # 另一個連線持有寫鎖，begin_write 要等它 commit
+        metrics_common.begin_write(conn, "dedupe")
+        conn.commit()
+    finally:
+        conn.close()
+        timer.join()
+        holder.close()
+
+    samples = _samples(bot_metrics.render_metrics())
+    assert samples['pokebee_sqlite_lock_wait_seconds_count{writer="dedupe"}'] == 1
+    assert samples['pokebee_sqlite_lock_wait_seconds_sum{writer="dedupe"}'] >= 0.15
@@ -0,0 +1,158 @@
+import random
+
+import pytest
+from conftest import insert_order
+
+import daily_metrics
+from daily_accumulator import calculate_daily_metrics_lite
+from daily_metrics import calculate_daily_metrics
+
+CASH = "現金(Cash payment module)"
+LINEPAY = "LinePay (未整合)(Custom payment module)"
+
+ORDERS = [
+    dict(checkout_time="2026-03-10 11:05:00", items_text="雞胸肉自選碗 $149.0", invoice_amount=134),
+    dict(checkout_time="2026-03-10 11:40:00", items_text="嚴選生鮭魚自選碗 $171.0, 雞胸肉自選碗 $149.0",
+         invoice_amount=288, payment_method=LINEPAY, discount_amount=32),
+    dict(checkout_time="2026-03-10 12:15:00", items_text="壽喜燒豬自選碗 $288.0, 味噌湯 $30.0",
+         invoice_amount=286, order_type="Takeout"),
+    dict(checkout_time="2026-03-10 12:50:00", items_text="高蛋白健身碗 $189.0, 海味雙魚碗 $234.0",
+         invoice_amount=381, order_type="外帶", order_source="Online Store", payment_method=LINEPAY),
+    dict(checkout_time="2026-03-10 13:30:00", items_text="豆腐 80g $0.0, 嚴選生鮭魚 45g $0.0", invoice_amount=90),
+    dict(checkout_time="2026-03-10 14:00:00", items_text="雞胸肉自選碗 $149.0", invoice_amount=0),
+    dict(checkout_time="2026-03-10 17:20:00", items_text="鮮蝦自選碗 $153.0, 提袋 $2.0",
+         invoice_amount=139, order_type="Delivery", payment_method="信用卡"),
+    dict(checkout_time="2026-03-10 18:10:00", items_text="雞胸肉自選碗 $432.0", invoice_amount=389),
+    dict(checkout_time="2026-03-10 19:45:00", items_text="嚴選生鮭魚自選碗 $171.0",
+         invoice_amount=154, order_status="Voided"),
+    dict(checkout_time="2026-03-10 20:00:00", items_text="", invoice_amount=30),
+]
+
+
+# 向量化改寫前 calculate_daily_metrics 對 ORDERS 的輸出（apply / 子表版本）
+EXPECTED_2026_03_10 = {
+    "date": "2026-03-10",
+    "metrics": {
+        "revenue": 1737.0,
+        "unit": "bowl",
+        "total_orders": 8,
+        "total_bowls": 11,
+        "avg_bowl_price": 157.91,
+        "dine_in_bowls": 6,
+        "takeout_bowls": 5,
+        "cloud_kitchen_orders": 1,
+        "cloud_kitchen_ratio": "12.50%",
+    },
+    "periods": {"lunch_bowls": 7, "dinner_bowls": 4},
+    "operational": {
+        "first_peak_hour": "12:00-13:00",
+        "first_peak_hour_bowls": 4,
+        "first_peak_hour_ratio": 0.36,
+        "second_peak_hour": "11:00-12:00",
+        "second_peak_hour_bowls": 3,
+        "second_peak_hour_ratio": 0.27,
+        "protein_bowls": {"chicken": 3, "pork": 1, "shrimp": 1, "salmon": 1, "tofu": 0, "tuna": 0},
+        "first_protein": "chicken",
+        "first_protein_bowls": 3,
+        "first_protein_ratio": 0.27,
+        "second_protein": "pork",
+        "second_protein_bowls": 1,
+        "second_protein_ratio": 0.09,
+    },
+    "payments": {"pay_in_cash_order_ratio": 0.62, "pay_in_LinePay_order_ratio": 0.25},
+    "assumptions": {
+        "employee_meal_rule": "invoice_amount == 0",
+        "bowl_rule": "item name contains '碗' and not in exclude list",
+        "voided_rule": "order_status contains 'Voided'",
+        "business_hours_applied": {
+            "lunch": {"start": "11:00", "end": "14:30"},
+            "dinner": {"start": "16:30", "end": "20:00"},
+        },
+    },
+}
+
+
+def _insert_day(db):
+    for order in ORDERS:
+        insert_order(db, **{"payment_method": CASH, **order})
+
+
+class TestLiteEngineParity:
+    def test_matches_pandas_engine(self, db):
+        _insert_day(db)
+
+        lite = calculate_daily_metrics("2026-03-10", engine="lite")
+        pandas_result = calculate_daily_metrics("2026-03-10", engine="pandas")
+
+        assert lite == pandas_result == EXPECTED_2026_03_10
+        assert list(pandas_result["operational"]["protein_bowls"]) == \
+            list(EXPECTED_2026_03_10["operational"]["protein_bowls"])
+
+    def test_peak_hour_ties_follow_pandas(self, db):
+        for hour in ("18", "11", "12"):
+            insert_order(db, checkout_time=f"2026-03-11 {hour}:30:00",
+                         items_text="雞胸肉自選碗 $149.0", invoice_amount=134)
+
+        lite = calculate_daily_metrics("2026-03-11", engine="lite")
+        assert lite == calculate_daily_metrics("2026-03-11", engine="pandas")
+        assert lite["operational"]["first_peak_hour"] == "11:00-12:00"
+
+    def test_random_day_matches(self, db):
+        rng = random.Random(32)
+        bowls = ["雞胸肉自選碗 $160.0", "嚴選生鮭魚自選碗 $380.0", "海味雙魚碗 $260.0", "豆腐 80g $0.0",
+                 "高蛋白健身碗 $220.0", "鮮蝦自選碗 $170.0", "味噌湯 $30.0", "提袋 $2.0"]
+        # 含時段邊界（14:30:00 算午餐、14:30:01 不算）
+        times = ["10:59:59", "11:00:00", "14:30:00", "14:30:01", "16:30:00", "20:00:00", "20:00:01"]
+        for n in range(150):
+            moment = times[n] if n < len(times) else f"{rng.randint(10, 21):02d}:{rng.randint(0, 59):02d}:00"
+            insert_order(
+                db,
+                checkout_time=f"2026-03-13 {moment}",
+                items_text=", ".join(rng.sample(bowls, rng.randint(0, 3))),
+                invoice_amount=rng.choice([0, 90, 160, 320, 415.5]),
+                order_type=rng.choice(["Dine In", "內用", "Takeout", "外送", "其他"]),
+                order_source=rng.choice(["On site", "Online Store"]),
+                payment_method=rng.choice([CASH, LINEPAY, "信用卡", None]),
+                discount_amount=rng.choice([0, 0, 16, None]),
+                order_status=rng.choice(["Issued"] * 9 + ["Voided"]),
+            )
+
+        assert calculate_daily_metrics("2026-03-13", engine="lite") == \
+            calculate_daily_metrics("2026-03-13", engine="pandas")
+
+    def test_protein_ties_keep_rule_order(self, db):
+        for bowl in ("嚴選生鮭魚自選碗", "鮮蝦自選碗", "豆腐自選碗", "雞胸肉自選碗"):
+            insert_order(db, checkout_time="2026-03-12 12:00:00", items_text=f"{bowl} $160.0", invoice_amount=144)
+
+        lite = calculate_daily_metrics("2026-03-12", engine="lite")
+        assert lite == calculate_daily_metrics("2026-03-12", engine="pandas")
+        assert list(lite["operational"]["protein_bowls"])[:4] == ["chicken", "tofu", "shrimp", "salmon"]
+
+    def test_no_data_returns_none(self, db):
+        assert calculate_daily_metrics_lite("2099-01-01") is None
+
+
+class TestEngineSelector:
+    @pytest.fixture
+    def engine_calls(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(daily_metrics, "calculate_daily_metrics_lite",
+                            lambda target_date: calls.append("lite"))
+        monkeypatch.setattr(daily_metrics, "_calculate_daily_metrics_pandas",
+                            lambda target_date: calls.append("pandas"))
+        return calls
+
+    def test_small_day_uses_lite(self, db, engine_calls):
+        _insert_day(db)
+        calculate_daily_metrics("2026-03-10")
+        assert engine_calls == ["lite"]
+
+    def test_large_day_uses_pandas(self, db, engine_calls, monkeypatch):
+        _insert_day(db)
+        monkeypatch.setattr(daily_metrics, "LITE_ENGINE_MAX_ORDERS", 5)
+        calculate_daily_metrics("2026-03-10")
+        assert engine_calls == ["pandas"]
+
+    def test_unknown_engine(self, db):
+        with pytest.raises(ValueError):
+            calculate_daily_metrics("2026-03-10", engine="numpy")
@@ -1,6 +1,13 @@
 import pytest
 from conftest import insert_order
-from daily_metrics import calculate_avg_bowl_price_diagnostics, calculate_daily_metrics
+import daily_metrics
+from daily_metrics import (
+    DailyBundle,
+    calculate_avg_bowl_price_diagnostics,
+    calculate_daily_metrics,
+    calculate_daily_metrics_range,
+)
+from report_renderer import render_daily_diagnostics, render_daily_range_report
 
 
 class TestCalculateDailyMetrics:
@@ -94,3 +101,96 @@ class TestCalculateDailyMetrics:
         assert diagnostics["total_bowls"] == 1
         assert diagnostics["zero_bowl_orders"] == 1
         assert diagnostics["avg_bowl_price"] == 229.0
+
+
+class TestCalculateDailyMetricsRange:
+    def _insert_days(self, db):
+        linepay = "LinePay (未整合)(Custom payment module)"
+        insert_order(db, checkout_time="2026-03-30 11:30:00", items_text="雞胸肉自選碗 $144.0", invoice_amount=144)
+        insert_order(db, checkout_time="2026-03-30 14:30:00", items_text="鮮蝦自選碗 $153.0, 提袋 $2.0",
+                     invoice_amount=155, order_type="Takeout", payment_method=linepay, discount_amount=17)
+        insert_order(db, checkout_time="2026-03-30 18:05:00", items_text="高蛋白健身碗 $198.0",
+                     invoice_amount=198, order_source="Online Store", order_type="外帶")
+        insert_order(db, checkout_time="2026-04-01 12:10:00", items_text="嚴選生鮭魚自選碗 $380.0",
+                     invoice_amount=380, payment_method=linepay)
+        insert_order(db, checkout_time="2026-04-01 12:40:00", items_text="豆腐自選碗 $125.0",
+                     invoice_amount=125, order_type="Delivery")
+        insert_order(db, checkout_time="2026-04-01 19:00:00", items_text="壽喜燒豬自選碗 $160.0",
+                     invoice_amount=160, order_status="Voided")
+        insert_order(db, checkout_time="2026-04-01 20:00:01", items_text="雞胸肉自選碗 $160.0",
+                     invoice_amount=160)
+        insert_order(db, checkout_time="2026-04-02 13:00:00", items_text="雞胸肉自選碗 $160.0",
+                     invoice_amount=0)
+
+    def test_matches_single_day(self, db):
+        self._insert_days(db)
+        days = ["2026-03-30", "2026-03-31", "2026-04-01", "2026-04-02"]
+
+        results = calculate_daily_metrics_range(days[0], days[-1])
+
+        assert results == [calculate_daily_metrics(day, engine="pandas") for day in days]
+        assert results == [calculate_daily_metrics(day, engine="lite") for day in days]
+        assert [r is None for r in results] == [False, True, False, True]
+
+    def test_no_data(self, db):
+        assert calculate_daily_metrics_range("2099-01-01", "2099-01-03") == [None, None, None]
+
+    def test_render_range_report(self, db):
+        self._insert_days(db)
+        days = ["2026-03-30", "2026-03-31", "2026-04-01"]
+
+        report = render_daily_range_report(days, calculate_daily_metrics_range(days[0], days[-1]))
+
+        assert "營業天數：2/3 天" in report
+        assert "03/31(二) —" in report
+        assert "04/01(三) $665｜4 碗｜午 3 / 晚 0" in report
+
+
+class TestDailyBundle:
+    def _insert_day(self, db):
+        insert_order(db, checkout_time="2026-01-23 12:00:00", items_text="雞胸肉自選碗 $149.0", invoice_amount=149)
+        insert_order(db, checkout_time="2026-01-23 12:30:00", items_text="鮮蝦自選碗 $153.0", invoice_amount=153)
+        insert_order(db, checkout_time="2026-01-23 13:00:00", items_text="海味雙魚碗 $260.0, 味噌湯 $60.0",
+                     invoice_amount=320)
+        insert_order(db, checkout_time="2026-01-23 18:00:00", items_text="甜點 $80.0", invoice_amount=80)
+
+    def test_single_load_for_all_sections(self, db, monkeypatch):
+        self._insert_day(db)
+        calls = []
+        original = daily_metrics._load_daily_order_frame
+        monkeypatch.setattr(daily_metrics, "_load_daily_order_frame",
+                            lambda *args, **kwargs: calls.append(args) or original(*args, **kwargs))
+
+        bundle = DailyBundle("2026-01-23")
+        metrics, diagnostics = bundle.metrics, bundle.diagnostics
+        high_price, zero_bowl = bundle.high_price_orders, bundle.zero_bowl_orders
+
+        assert len(calls) == 1
+        assert metrics == calculate_daily_metrics("2026-01-23")
+        assert diagnostics == calculate_avg_bowl_price_diagnostics("2026-01-23")
+        assert [order["items_text"] for order in high_price] == ["海味雙魚碗 $260.0, 味噌湯 $60.0"]
+        assert [order["items_text"] for order in zero_bowl] == ["甜點 $80.0"]
+        assert diagnostics["zero_bowl_orders"] == 1
+
+    def test_sections_are_lazy(self, db, monkeypatch):
+        self._insert_day(db)
+        monkeypatch.setattr(daily_metrics, "_daily_totals",
+                            lambda *args: pytest.fail("metrics should not be computed"))
+
+        assert DailyBundle("2026-01-23").zero_bowl_orders[0]["invoice_amount"] == 80
+
+    def test_no_data(self, db):
+        bundle = DailyBundle("2099-01-01")
+        assert bundle.metrics is None
+        assert bundle.diagnostics is None
+        assert bundle.high_price_orders == [] and bundle.zero_bowl_orders == []
+
+    def test_render_diagnostics(self, db):
+        self._insert_day(db)
+        bundle = DailyBundle("2026-01-23")
+
+        text = render_daily_diagnostics(bundle.diagnostics, bundle.zero_bowl_orders)
+
+        assert "13:00 $320｜1 碗，每碗 $320｜海味雙魚碗" in text
+        assert "零碗訂單（共 1 筆）" in text
+        assert "18:00 $80｜0 碗｜甜點 $80.0" in text
@@ -0,0 +1,122 @@
+import sqlite3
+from datetime import datetime, time
+
+import pytest
+from conftest import insert_order
+
+import daily_push
+from daily_metrics import calculate_daily_metrics
+from daily_push import PushSettings, build_daily_report, load_daily_report, push_daily_report
+from report_renderer import render_daily_report
+
+DAY = "2026-03-04"
+SETTINGS = PushSettings(after_minutes=60, min_orders=1, deadline=time(23, 30), if_missing="skip")
+
+
+def _seed(db, imported_at=f"{DAY}T21:05:00"):
+    insert_order(db, checkout_time=f"{DAY} 12:10:00", items_text="雞胸肉自選碗 $160.0", invoice_amount=160)
+    insert_order(db, checkout_time=f"{DAY} 19:30:00", items_text="豆腐自選碗 $125.0", invoice_amount=125)
+    conn = sqlite3.connect(str(db))
+    conn.execute("UPDATE raw_orders SET imported_at = ?", (imported_at,))
+    conn.commit()
+    conn.close()
+
+
+def _at(clock):
+    return datetime.fromisoformat(f"{DAY} {clock}")
+
+
+class TestPushDailyReport:
+    def test_waits_until_after_closing(self, db):
+        _seed(db)
+        sent = []
+        # 晚餐 20:00 結束，60 分鐘後才開始檢查
+        assert push_daily_report(sent.append, _at("20:30:00"), SETTINGS) is None
+        assert push_daily_report(sent.append, _at("21:10:00"), SETTINGS) == "pushed"
+        assert sent == [render_daily_report(calculate_daily_metrics(DAY))]
+
+    def test_pushes_once(self, db):
+        _seed(db)
+        sent = []
+        push_daily_report(sent.append, _at("21:10:00"), SETTINGS)
+        assert push_daily_report(sent.append, _at("21:20:00"), SETTINGS) is None
+        assert len(sent) == 1
+
+    def test_failed_send_is_retried(self, db):
+        _seed(db)
+        sent = []
+
+        def flaky(text):
+            if not sent:
+                sent.append(None)
+                raise RuntimeError("LINE API unavailable")
+            sent.append(text)
+
+        with pytest.raises(RuntimeError):
+            push_daily_report(flaky, _at("21:10:00"), SETTINGS)
+        assert push_daily_report(flaky, _at("21:20:00"), SETTINGS) == "pushed"
+        assert sent[1] == render_daily_report(calculate_daily_metrics(DAY))
+
+    def test_skips_until_closing_import(self, db):
+        # 營業中上傳的資料不算「已匯入」
+        _seed(db, imported_at=f"{DAY}T15:00:00")
+        sent = []
+        assert push_daily_report(sent.append, _at("21:10:00"), SETTINGS) is None
+        assert push_daily_report(sent.append, _at("23:45:00"), SETTINGS) is None
+        assert sent == []
+
+    def test_min_orders(self, db):
+        _seed(db)
+        sent = []
+        settings = PushSettings(min_orders=3)
+        assert push_daily_report(sent.append, _at("21:10:00"), settings) is None
+        assert sent == []
+
+    def test_staff_meals_and_voids_do_not_count(self, db):
+        insert_order(db, checkout_time=f"{DAY} 13:10:00", items_text="豆腐自選碗 $125.0", invoice_amount=125)
+        insert_order(db, checkout_time=f"{DAY} 12:10:00", items_text="雞胸肉自選碗 $160.0", invoice_amount=0)
+        insert_order(db, checkout_time=f"{DAY} 18:10:00", items_text="鮮蝦自選碗 $170.0", invoice_amount=170,
+                     order_status="Voided")
+        conn = sqlite3.connect(str(db))
+        conn.execute("UPDATE raw_orders SET imported_at = ?", (f"{DAY}T21:05:00",))
+        conn.commit()
+        conn.close()
+        sent = []
+        assert push_daily_report(sent.append, _at("21:10:00"), PushSettings(min_orders=2)) is None
+        assert sent == []
+
+    def test_remind_after_deadline(self, db):
+        sent = []
+        settings = PushSettings(if_missing="remind")
+        assert push_daily_report(sent.append, _at("22:00:00"), settings) is None
+        assert push_daily_report(sent.append, _at("23:31:00"), settings) == "reminded"
+        assert push_daily_report(sent.append, _at("23:50:00"), settings) is None
+        assert len(sent) == 1
+        assert "尚未匯入" in sent[0]
+
+
+class TestStoredReport:
+    def test_served_without_recompute_until_new_orders(self, db, monkeypatch):
+        _seed(db)
+        report = build_daily_report(DAY)
+        monkeypatch.setattr(daily_push, "calculate_daily_metrics",
+                            lambda *args, **kwargs: pytest.fail("stored report should not recompute"))
+        assert load_daily_report(DAY) == report
+
+        insert_order(db, checkout_time=f"{DAY} 19:50:00", items_text="鮮蝦自選碗 $170.0", invoice_amount=170)
+        assert load_daily_report(DAY) is None
+
+    def test_missing_day(self, db):
+        assert load_daily_report(DAY) is None
+        assert build_daily_report(DAY) is None
+
+
+def test_settings_from_env(monkeypatch):
+    monkeypatch.setenv("DAILY_PUSH_AFTER_MINUTES", "30")
+    monkeypatch.setenv("DAILY_PUSH_DEADLINE", "22:45")
+    monkeypatch.setenv("DAILY_PUSH_IF_MISSING", "remind")
+    assert PushSettings.from_env() == PushSettings(after_minutes=30, deadline=time(22, 45), if_missing="remind")
+
+    monkeypatch.setenv("DAILY_PUSH_IF_MISSING", "shout")
+    with pytest.raises(ValueError):
+        PushSettings.from_env()
@@ -0,0 +1,117 @@
+import sqlite3
+
+import pandas as pd
+from conftest import insert_order
+
+import daily_snapshot
+import import_csv
+from daily_metrics import calculate_daily_metrics
+from daily_snapshot import calculate_daily_metrics_snapshot, refresh_daily_snapshots
+
+LINEPAY = "LinePay (未整合)(Custom payment module)"
+
+
+def _folded_rows(monkeypatch):
+    calls = []
+    original = daily_snapshot.DailyAccumulator.add
+    monkeypatch.setattr(daily_snapshot.DailyAccumulator, "add",
+                        lambda self, *row: calls.append(row) or original(self, *row))
+    return calls
+
+
+class TestDailySnapshot:
+    def test_folds_only_new_orders(self, db, monkeypatch):
+        insert_order(db, checkout_time="2026-05-04 11:30:00", items_text="雞胸肉自選碗 $160.0", invoice_amount=160)
+        insert_order(db, checkout_time="2026-05-04 12:10:00", items_text="鮮蝦自選碗 $170.0",
+                     invoice_amount=170, payment_method=LINEPAY)
+        assert calculate_daily_metrics_snapshot("2026-05-04") == calculate_daily_metrics("2026-05-04", engine="pandas")
+
+        folded = _folded_rows(monkeypatch)
+        insert_order(db, checkout_time="2026-05-04 18:00:00", items_text="海味雙魚碗 $260.0", invoice_amount=260)
+        insert_order(db, checkout_time="2026-05-05 12:00:00", items_text="豆腐自選碗 $125.0", invoice_amount=125)
+        insert_order(db, checkout_time="2026-05-04 19:00:00", items_text="鮮蝦自選碗 $170.0",
+                     invoice_amount=170, order_status="Voided")
+
+        result = calculate_daily_metrics_snapshot("2026-05-04")
+
+        assert [row[-1] for row in folded] == ["海味雙魚碗 $260.0"]
+        assert result == calculate_daily_metrics("2026-05-04", engine="pandas")
+        assert result["metrics"]["total_orders"] == 3
+
+    def test_up_to_date_snapshot_reads_no_orders(self, db, monkeypatch):
+        insert_order(db, checkout_time="2026-05-04 11:30:00", items_text="雞胸肉自選碗 $160.0", invoice_amount=160)
+        first = calculate_daily_metrics_snapshot("2026-05-04")
+
+        folded = _folded_rows(monkeypatch)
+        assert calculate_daily_metrics_snapshot("2026-05-04") == first
+        assert folded == []
+
+    def test_rule_change_rebuilds(self, db, override_rules):
+        insert_order(db, checkout_time="2026-05-04 11:30:00", items_text="雞胸肉自選碗 $320.0", invoice_amount=320)
+        assert calculate_daily_metrics_snapshot("2026-05-04")["metrics"]["total_bowls"] == 2
+
+        prices = {"雞胸肉自選碗": 320}
+        override_rules(bowl_base_prices=prices)
+
+        assert calculate_daily_metrics_snapshot("2026-05-04")["metrics"]["total_bowls"] == 1
+
+    def test_reset_orders_table_rebuilds(self, db):
+        insert_order(db, checkout_time="2026-05-04 11:30:00", items_text="雞胸肉自選碗 $160.0", invoice_amount=160)
+        insert_order(db, checkout_time="2026-05-04 12:30:00", items_text="雞胸肉自選碗 $160.0", invoice_amount=160)
+        calculate_daily_metrics_snapshot("2026-05-04")
+
+        conn = sqlite3.connect(str(db))
+        conn.execute("DELETE FROM raw_orders")
+        conn.execute("DELETE FROM sqlite_sequence WHERE name = 'raw_orders'")
+        conn.commit()
+        conn.close()
+        insert_order(db, checkout_time="2026-05-04 13:00:00", items_text="鮮蝦自選碗 $170.0", invoice_amount=170)
+
+        assert calculate_daily_metrics_snapshot("2026-05-04")["metrics"]["total_orders"] == 1
+
+    def test_no_orders(self, db):
+        assert calculate_daily_metrics_snapshot("2099-01-01") is None
+        assert calculate_daily_metrics("2099-01-01", engine="snapshot") is None
+
+    def test_state_round_trip(self, db):
+        insert_order(db, checkout_time="2026-05-04 11:30:00", items_text="高蛋白健身碗 $220.0",
+                     invoice_amount=200, discount_amount=20, order_source="Online Store")
+        accumulator = refresh_daily_snapshots(["2026-05-04"])["2026-05-04"]
+        restored = type(accumulator).from_state(accumulator.to_state(), accumulator.rules, accumulator.timeline)
+        assert restored.to_daily_metrics("2026-05-04") == accumulator.to_daily_metrics("2026-05-04")
+
+
+class TestImportUpdatesSnapshot:
+    def test_import_folds_new_rows(self, db, tmp_path, monkeypatch):
+        monkeypatch.setattr(import_csv, "DB_PATH", str(db))
+
+        def _export(path, rows):
+            pd.DataFrame(rows, columns=list(import_csv.COLUMN_MAP)).to_csv(path, index=False)
+
+        first = [
+            ["R1", 1, "2026-05-04 11:30:00", "On site", "Dine In", 0, 160, "現金(Cash payment module)", "Issued",
+             "雞胸肉自選碗 $160.0"],
+        ]
+        second = first + [
+            ["R2", 2, "2026-05-04 12:30:00", "On site", "Takeout", 0, 170, LINEPAY, "Issued",
+             "鮮蝦自選碗 $170.0"],
+        ]
+        _export(tmp_path / "first.csv", first)
+        _export(tmp_path / "second.csv", second)
+
+        import_csv.import_csv(str(tmp_path / "first.csv"))
+        import_csv.import_csv(str(tmp_path / "second.csv"))
+
+        conn = sqlite3.connect(str(db))
+        last_order_id, = conn.execute(
+            "SELECT last_order_id FROM daily_snapshot WHERE day = '2026-05-04'"
+        ).fetchone()
+        max_id, = conn.execute("SELECT MAX(id) FROM raw_orders").fetchone()
+        conn.close()
+        assert last_order_id == max_id
+
+        folded = _folded_rows(monkeypatch)
+        result = calculate_daily_metrics_snapshot("2026-05-04")
+        assert folded == []
+        assert result == calculate_daily_metrics("2026-05-04", engine="pandas")
+        assert result["metrics"]["takeout_bowls"] == 1
@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+from event_dedupe import DEDUPE_TTL_SECONDS, claim_event, dedupe_stats, event_keys
+
+NOW = 1_780_000_000.0
+
+
+def _event(event_id="01HEVENT", message_id="5551"):
+    return SimpleNamespace(webhook_event_id=event_id, message=SimpleNamespace(id=message_id))
+
+
+def test_event_keys():
+    assert event_keys(_event()) == ["event:01HEVENT", "message:5551"]
+    assert event_keys(_event(event_id=None)) == ["message:5551"]
+    assert event_keys(SimpleNamespace()) == []
+
+
+def test_redelivery_is_suppressed_and_counted(db):
+    keys = event_keys(_event())
+    assert claim_event(keys, "file", now=NOW)
+    assert not claim_event(keys, "file", now=NOW + 30)
+    assert not claim_event(keys, "file", now=NOW + 60)
+    assert claim_event(event_keys(_event("01HOTHER", "5552")), "text", now=NOW + 60)
+
+    assert dedupe_stats() == {"file": 2}
+
+
+def test_either_key_matches(db):
+    assert claim_event(event_keys(_event()), "text", now=NOW)
+    # 舊版重送沒有 webhookEventId，仍以 message id 認出
+    assert not claim_event(event_keys(_event(event_id=None)), "text", now=NOW + 1)
+
+
+def test_expired_keys_are_claimed_again(db):
+    keys = event_keys(_event())
+    assert claim_event(keys, "text", now=NOW)
+    assert claim_event(keys, "text", now=NOW + DEDUPE_TTL_SECONDS + 1)
+    assert dedupe_stats() == {}
+
+
+def test_events_without_keys_always_pass(db):
+    assert claim_event([], "text", now=NOW)
+    assert claim_event([], "text", now=NOW)
@@ -0,0 +1,102 @@
+import csv
+import hashlib
+import io
+import sqlite3
+
+import pytest
+
+import import_csv
+from import_csv import COLUMN_MAP, UploadTooLarge, import_csv_stream, save_upload
+
+LINEPAY = "LinePay (未整合)(Custom payment module)"
+
+ROWS = [
+    ["AB00000001", "1", "2026-05-04 11:30:00", "On site", "Dine In", "0", "160", "現金(Cash payment module)",
+     "Issued", "雞胸肉自選碗 $160.0"],
+    ["AB00000002", "2", "2026/05/04 12:30:00", "On site", "Takeout", "20", "150", LINEPAY,
+     "Issued", "鮮蝦自選碗 $170.0\n加購 溏心蛋 $20.0"],
+    ["AB00000003", "3", "not a time", "On site", "Dine In", "0", "160", "現金(Cash payment module)",
+     "Issued", "雞胸肉自選碗 $160.0"],
+]
+
+
+def _csv_bytes(rows=ROWS, header=None) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header or ["Extra", *COLUMN_MAP])
+    for row in rows:
+        writer.writerow(["x", *row])
+    return ("﻿" + buffer.getvalue()).encode("utf-8")
+
+
+def _chunks(data: bytes, size: int = 7):
+    # 7 bytes 一塊：會切在中文字與換行中間
+    return [data[offset:offset + size] for offset in range(0, len(data), size)]
+
+
+def _orders(db):
+    conn = sqlite3.connect(str(db))
+    rows = conn.execute(
+        "SELECT invoice_number, checkout_time, discount_amount, invoice_amount, items_text FROM raw_orders ORDER BY id"
+    ).fetchall()
+    conn.close()
+    return rows
+
+
+@pytest.fixture
+def raw_db(db, monkeypatch):
+    monkeypatch.setattr(import_csv, "DB_PATH", str(db))
+    return db
+
+
+def test_stream_tees_hashes_and_inserts(raw_db, tmp_path):
+    data = _csv_bytes()
+    save_path = tmp_path / "Payment_Void Record_2026-05-04.csv"
+
+    result = import_csv_stream(_chunks(data), save_path)
+
+    assert save_path.read_bytes() == data
+    assert result.startswith("Import finished: inserted=2, skipped=0\n")
+    assert f"sha256={hashlib.sha256(data).hexdigest()[:12]}" in result
+    for stage in ("download", "parse", "insert"):
+        assert f"{stage} " in result
+    assert _orders(raw_db) == [
+        ("AB00000001", "2026-05-04 11:30:00", 0.0, 160.0, "雞胸肉自選碗 $160.0"),
+        ("AB00000002", "2026-05-04 12:30:00", 20.0, 150.0, "鮮蝦自選碗 $170.0\n加購 溏心蛋 $20.0"),
+    ]
+
+
+def test_stream_and_file_import_agree(raw_db, tmp_path):
+    path = tmp_path / "first.csv"
+    path.write_bytes(_csv_bytes())
+    assert import_csv.import_csv(str(path)) == "Import finished: inserted=2, skipped=0"
+
+    result = import_csv_stream(_chunks(_csv_bytes()), tmp_path / "again.csv")
+    assert result.startswith("Import finished: inserted=0, skipped=2")
+
+
+def test_size_limit_rolls_back(raw_db, tmp_path):
+    data = _csv_bytes(ROWS * 50)
+    save_path = tmp_path / "big.csv"
+
+    with pytest.raises(UploadTooLarge):
+        import_csv_stream(_chunks(data, 256), save_path, max_bytes=len(data) - 1)
+
+    assert not save_path.exists()
+    assert _orders(raw_db) == []
+
+
+def test_missing_columns(raw_db, tmp_path):
+    data = _csv_bytes(header=["Extra", "Receipt number", "payment time"])
+    with pytest.raises(ValueError, match="Missing columns: Running Receipt Number"):
+        import_csv_stream(_chunks(data), tmp_path / "bad.csv")
+
+
+def test_save_upload(tmp_path):
+    data = b"name,Count\n" * 100
+    assert save_upload(_chunks(data), tmp_path / "modifier.csv") == hashlib.sha256(data).hexdigest()
+    assert (tmp_path / "modifier.csv").read_bytes() == data
+
+    with pytest.raises(UploadTooLarge):
+        save_upload(_chunks(data), tmp_path / "too_big.csv", max_bytes=100)
+    assert not (tmp_path / "too_big.csv").exists()
@@ -46,3 +46,10 @@ def test_import_modifier_keeps_sukiyaki_pork_row(tmp_path, monkeypatch):
         conn.close()
 
     assert rows == [("加購一份壽喜燒豬", 3)]
+
+    conn = sqlite3.connect(db_path)
+    try:
+        mapped = conn.execute("SELECT name, protein_key FROM modifier_protein").fetchall()
+    finally:
+        conn.close()
+    assert mapped == [("加購一份壽喜燒豬", "pork")]
@@ -0,0 +1,135 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import metrics_common
+from metrics_common import (
+    PROTEIN_RULES,
+    build_order_features,
+    count_bowls_smart,
+    count_protein_bowls,
+    count_protein_non_bowls,
+    count_set_meal_proteins,
+    flush_item_memo,
+    load_item_memo,
+    rules_hash,
+)
+
+
+@pytest.fixture
+def fresh_memo(monkeypatch):
+    monkeypatch.setattr(metrics_common, "_ITEM_MEMO", {})
+    monkeypatch.setattr(metrics_common, "_ITEM_MEMO_PENDING", {})
+    monkeypatch.setattr(metrics_common, "_ITEM_MEMO_LOADED", set())
+
+
+def _orders(rows):
+    df = pd.DataFrame(rows, columns=["checkout_time", "items_text"])
+    df["checkout_time"] = pd.to_datetime(df["checkout_time"])
+    return df
+
+
+ITEMS = [
+    "雞胸肉自選碗 $432.0, 提袋 $2.0",
+    "高蛋白健身碗 $189.0, 海味雙魚碗 $234.0",
+    "壽喜燒豬自選碗 $288.0,雞胸肉自選碗 $144.0,加購一份壽喜燒豬 $50.0,味噌湯 $30.0",
+    "豆腐 80g $0.0, 嚴選生鮭魚 45g $0.0",
+    "雞胸肉自選碗",
+    "",
+]
+
+
+class TestBuildOrderFeatures:
+    def test_matches_scalar_functions(self, fresh_memo):
+        df = _orders([("2026-03-01 12:00:00", text) for text in ITEMS]
+                     + [("2026-04-02 12:00:00", "雞胸肉自選碗 $480.0")])
+        features = build_order_features(df)
+
+        for idx, row in df.iterrows():
+            text, when = row["items_text"], row["checkout_time"]
+            assert features.at[idx, "bowls"] == count_bowls_smart(text, order_date=when)
+            set_meals = count_set_meal_proteins(text)
+            for protein in PROTEIN_RULES:
+                assert features.at[idx, f"protein_bowls_{protein}"] == count_protein_bowls(text, protein)
+                assert features.at[idx, f"protein_non_bowls_{protein}"] == count_protein_non_bowls(text, protein)
+                assert features.at[idx, f"set_meal_{protein}"] == set_meals[protein]
+
+    def test_keeps_index_and_empty_orders(self, fresh_memo):
+        df = _orders([("2026-03-01 12:00:00", ""), ("2026-03-01 13:00:00", "雞胸肉自選碗 $144.0")])
+        df.index = [10, 20]
+        features = build_order_features(df)
+        assert list(features.index) == [10, 20]
+        assert features["bowls"].tolist() == [0, 1]
+
+    def test_distinct_tokens_classified_once(self, fresh_memo, monkeypatch):
+        calls = []
+        original = metrics_common.classify_item
+        monkeypatch.setattr(
+            metrics_common, "classify_item",
+            lambda item, segment, rules=None: calls.append(item) or original(item, segment, rules),
+        )
+        df = _orders([("2026-03-01 12:00:00", "雞胸肉自選碗 $144.0, 提袋 $2.0")] * 50)
+
+        features = build_order_features(df)
+
+        assert features["bowls"].sum() == 50
+        assert sorted(calls) == ["提袋 $2.0", "雞胸肉自選碗 $144.0"]
+
+
+def _stored_versions():
+    conn = sqlite3.connect(metrics_common.DB_PATH)
+    try:
+        return {row[0] for row in conn.execute("SELECT DISTINCT memo_version FROM item_memo")}
+    finally:
+        conn.close()
+
+
+class TestItemMemoPersistence:
+    def test_survives_process_restart(self, fresh_memo, monkeypatch):
+        build_order_features(_orders([("2026-03-01 12:00:00", "雞胸肉自選碗 $432.0")]))
+
+        # 模擬重啟：清空 process 內 memo
+        monkeypatch.setattr(metrics_common, "_ITEM_MEMO", {})
+        monkeypatch.setattr(metrics_common, "_ITEM_MEMO_LOADED", set())
+
+        assert load_item_memo() == 1
+        timeline = metrics_common.get_price_timeline()
+        memo_key = metrics_common.item_memo_version(timeline)
+        segment = timeline.segment_at("2026-03-01").index
+        cls = metrics_common._ITEM_MEMO[memo_key][("雞胸肉自選碗 $432.0", segment)]
+        assert cls.is_bowl and cls.quantity == 3
+        assert cls.protein_bowls == ("chicken",)
+
+    def test_rule_change_invalidates(self, fresh_memo, override_rules):
+        count_bowls_smart("鮮蝦自選碗 $153.0", "2026-03-01")
+        assert flush_item_memo() == 1
+        old_key = rules_hash()
+        old_version = metrics_common.item_memo_version(metrics_common.get_price_timeline())
+
+        prices = dict(metrics_common.current_rules().bowl_base_prices, 鮮蝦自選碗=180)
+        override_rules(bowl_base_prices=prices)
+        assert rules_hash() != old_key
+        assert load_item_memo() == 0
+        # 舊版本的資料留在 DB，改回原規則時可以直接載回
+        assert _stored_versions() == {old_version}
+
+    def test_prunes_old_and_excess_versions(self, fresh_memo, monkeypatch):
+        monkeypatch.setattr(metrics_common, "ITEM_MEMO_KEEP_VERSIONS", 2)
+        for key in ("v1", "v2", "v3"):
+            metrics_common._ITEM_MEMO_PENDING[key] = {("提袋 $2.0", 0): metrics_common.ItemClass(False, 0, (), (), ())}
+            flush_item_memo(key)
+        conn = sqlite3.connect(metrics_common.DB_PATH)
+        conn.execute("UPDATE item_memo_versions SET last_used_at = '2000-01-01T00:00:00' WHERE memo_version = 'v1'")
+        conn.commit()
+        conn.close()
+
+        load_item_memo("v2")
+        assert _stored_versions() == {"v2", "v3"}  # v1 過期；v3 仍在最近 2 個之內
+        load_item_memo("v4")
+        assert _stored_versions() == {"v2"}  # 最近使用的是 v4 與 v2，v3 被清掉
+
+    def test_unwritable_db_is_ignored(self, fresh_memo, monkeypatch, tmp_path):
+        monkeypatch.setattr(metrics_common, "DB_PATH", str(tmp_path / "missing" / "x.db"))
+        features = build_order_features(_orders([("2026-03-01 12:00:00", "雞胸肉自選碗 $144.0")]))
+        assert features["bowls"].tolist() == [1]
@@ -54,3 +54,50 @@ def test_load_modifier_can_return_all_rows(tmp_path, monkeypatch):
     df = metrics_common.load_modifier("2026-02-22", "2026-02-28", protein_only=False)
 
     assert set(df["name"].tolist()) == {"加購一份雞胸肉 80g", "七味粉", "加購一份生鮪魚 45g"}
+
+
+class TestLoadProteinAdds:
+    def test_grouped_by_protein_key(self, tmp_path, monkeypatch):
+        db_path = tmp_path / "modifier.db"
+        _seed_rows(db_path)
+        monkeypatch.setattr(metrics_common, "DB_PATH", str(db_path))
+
+        assert metrics_common.load_protein_adds("2026-02-22", "2026-02-28") == {"chicken": 2, "tuna": 1}
+
+        conn = sqlite3.connect(str(db_path))
+        mapped = dict(conn.execute("SELECT name, protein_key FROM modifier_protein").fetchall())
+        conn.close()
+        assert mapped["七味粉"] == ""
+
+    def test_partial_overlap_is_prorated(self, tmp_path, monkeypatch):
+        db_path = tmp_path / "modifier.db"
+        _seed_rows(db_path)
+        conn = sqlite3.connect(str(db_path))
+        conn.execute(
+            "INSERT INTO modifier_summary (start_date, end_date, name, count, total_price_change, source_file, imported_at) "
+            "VALUES ('2026-03-01', '2026-03-07', '加購一份雞胸肉 80g', 14, 700.0, 'm2.csv', '2026-03-08T00:00:00')"
+        )
+        conn.commit()
+        conn.close()
+        monkeypatch.setattr(metrics_common, "DB_PATH", str(db_path))
+
+        # 02-25 ~ 03-03：第一週重疊 4/7 天、第二週重疊 3/7 天
+        assert metrics_common.load_protein_adds("2026-02-25", "2026-03-03") == {"chicken": 7, "tuna": 1}
+        assert metrics_common.load_protein_adds("2026-02-25", "2026-03-03", prorate=False) == {"chicken": 16, "tuna": 1}
+
+    def test_rule_change_remaps_names(self, tmp_path, monkeypatch, override_rules):
+        db_path = tmp_path / "modifier.db"
+        _seed_rows(db_path)
+        monkeypatch.setattr(metrics_common, "DB_PATH", str(db_path))
+        assert metrics_common.load_protein_adds("2026-02-22", "2026-02-28")["chicken"] == 2
+
+        rules = metrics_common.current_rules()
+        protein_rules = {protein: list(words) for protein, words in rules.protein_rules.items()}
+        protein_rules["chicken"] = ["雞胸肉", "七味"]
+        override_rules(protein_rules=protein_rules)
+
+        assert metrics_common.load_protein_adds("2026-02-22", "2026-02-28")["chicken"] == 5
+
+    def test_missing_table(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(metrics_common, "DB_PATH", str(tmp_path / "empty.db"))
+        assert metrics_common.load_protein_adds("2026-02-22", "2026-02-28") == {}
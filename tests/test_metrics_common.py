@@ -1,12 +1,18 @@
+import multiprocessing
+import time
+
 import pandas as pd
 import pytest
+import metrics_common
 from metrics_common import (
     count_bowls,
     count_bowls_smart,
     count_protein_bowls,
     count_protein_non_bowls,
     count_set_meal_proteins,
+    enable_wal,
     get_discount_factor,
+    import_lock,
     infer_quantity_from_price,
     normalize_payment,
     is_in_period,
@@ -374,3 +380,39 @@ class TestValidateBowlCounts:
         captured = capsys.readouterr()
         assert "⚠️" in captured.out
         assert "碗數統計異常" in captured.out
+
+
+# ---------------------------------------------------------------------------
+# import_lock / enable_wal（多 worker）
+# ---------------------------------------------------------------------------
+
+def _hold_import_lock(db_path, acquired, seconds):
+    metrics_common.DB_PATH = db_path
+    with import_lock():
+        acquired.set()
+        time.sleep(seconds)
+
+
+class TestImportLock:
+    def test_serializes_across_processes(self, db):
+        context = multiprocessing.get_context("fork")
+        acquired = context.Event()
+        holder = context.Process(target=_hold_import_lock, args=(str(db), acquired, 0.3))
+        holder.start()
+        assert acquired.wait(5)
+
+        started = time.perf_counter()
+        with import_lock():
+            waited = time.perf_counter() - started
+        holder.join()
+        assert waited >= 0.2
+
+    def test_usable_as_decorator(self, db):
+        @import_lock()
+        def work(value):
+            return value * 2
+
+        assert [work(1), work(2)] == [2, 4]
+
+    def test_enable_wal(self, db):
+        assert enable_wal() == "wal"
@@ -0,0 +1,112 @@
+from datetime import date
+
+import pytest
+from conftest import insert_order
+
+import daily_snapshot
+from daily_metrics import calculate_daily_metrics_range
+from period_metrics import calculate_period_metrics, month_period, quarter_period, ytd_period
+from report_renderer import render_period_report
+
+LINEPAY = "LinePay (未整合)(Custom payment module)"
+
+
+def _seed(db):
+    insert_order(db, checkout_time="2026-02-03 11:30:00", items_text="雞胸肉自選碗 $160.0", invoice_amount=160)
+    insert_order(db, checkout_time="2026-02-03 12:10:00", items_text="鮮蝦自選碗 $170.0",
+                 invoice_amount=170, payment_method=LINEPAY, order_type="Takeout")
+    insert_order(db, checkout_time="2026-02-27 12:20:00", items_text="鮮蝦自選碗 $170.0", invoice_amount=170)
+    insert_order(db, checkout_time="2026-02-27 12:40:00", items_text="鮮蝦自選碗 $170.0", invoice_amount=170)
+    insert_order(db, checkout_time="2026-02-27 19:00:00", items_text="雞胸肉自選碗 $160.0", invoice_amount=160)
+    insert_order(db, checkout_time="2026-03-02 18:30:00", items_text="豆腐自選碗 $125.0", invoice_amount=125)
+    insert_order(db, checkout_time="2026-03-02 18:40:00", items_text="海味雙魚碗 $260.0",
+                 invoice_amount=260, discount_amount=20)
+
+
+class TestPeriodParsing:
+    def test_month(self):
+        assert month_period("2026-02")[2:] == (date(2026, 2, 1), date(2026, 2, 28))
+        assert month_period("2026-12").end == date(2026, 12, 31)
+
+    def test_quarter(self):
+        period = quarter_period("2026-q1")
+        assert period.label == "2026-Q1"
+        assert (period.start, period.end) == (date(2026, 1, 1), date(2026, 3, 31))
+
+    def test_ytd(self):
+        period = ytd_period(date(2026, 3, 15))
+        assert (period.label, period.start, period.end) == ("2026-YTD", date(2026, 1, 1), date(2026, 3, 15))
+
+    @pytest.mark.parametrize("parse,text", [
+        (month_period, "2026-13"),
+        (month_period, "2026/03"),
+        (quarter_period, "2026-Q5"),
+        (quarter_period, "2026-03"),
+    ])
+    def test_invalid(self, parse, text):
+        with pytest.raises(ValueError):
+            parse(text)
+
+
+class TestPeriodMetrics:
+    def test_merged_totals_match_daily_engine(self, db):
+        _seed(db)
+        period = quarter_period("2026-Q1")
+        result = calculate_period_metrics(period)
+
+        daily = [r for r in calculate_daily_metrics_range(period.start.isoformat(), period.end.isoformat()) if r]
+        for key in ("total_orders", "total_bowls", "dine_in_bowls", "takeout_bowls"):
+            assert result["metrics"][key] == sum(r["metrics"][key] for r in daily)
+        assert result["metrics"]["revenue"] == sum(r["metrics"]["revenue"] for r in daily)
+        assert result["periods"]["dinner_bowls"] == 3
+        assert result["operational"]["protein_bowls"]["shrimp"] == 3
+
+    def test_top_k_from_merged_histograms(self, db):
+        _seed(db)
+        result = calculate_period_metrics(quarter_period("2026-Q1"))
+
+        # 單日的第一尖峰各自不同，合併後 12 點（1+2 碗）勝出
+        assert result["operational"]["first_peak_hour"] == "12:00-13:00"
+        assert result["operational"]["first_peak_hour_bowls"] == 3
+        assert result["operational"]["first_protein"] == "shrimp"
+
+    def test_days_and_breakdown(self, db):
+        _seed(db)
+        result = calculate_period_metrics(quarter_period("2026-Q1"))
+
+        assert result["days"]["total_days"] == 90
+        assert result["days"]["open_days"] == 3
+        assert result["days"]["best_day"] == ("2026-02-27", 3)
+        assert result["days"]["worst_day"] == ("2026-02-03", 2)
+        assert [(m["label"], m["orders"]) for m in result["breakdown"]] == [
+            ("2026-01", 0), ("2026-02", 5), ("2026-03", 2),
+        ]
+        assert calculate_period_metrics(month_period("2026-02"))["breakdown"] == []
+
+    def test_second_run_reads_no_orders(self, db, monkeypatch):
+        _seed(db)
+        first = calculate_period_metrics(quarter_period("2026-Q1"))
+
+        calls = []
+        original = daily_snapshot.DailyAccumulator.add
+        monkeypatch.setattr(daily_snapshot.DailyAccumulator, "add",
+                            lambda self, *row: calls.append(row) or original(self, *row))
+        assert calculate_period_metrics(quarter_period("2026-Q1")) == first
+        assert calls == []
+
+        insert_order(db, checkout_time="2026-03-03 12:00:00", items_text="雞胸肉自選碗 $160.0", invoice_amount=160)
+        assert calculate_period_metrics(quarter_period("2026-Q1"))["metrics"]["total_orders"] == 8
+        assert len(calls) == 1
+
+    def test_no_data(self, db):
+        assert calculate_period_metrics(month_period("2099-01")) is None
+
+
+def test_render_period_report(db):
+    _seed(db)
+    report = render_period_report(calculate_period_metrics(quarter_period("2026-Q1")))
+
+    assert report.startswith("📊 季報｜2026-Q1")
+    assert "・營業天數：3/90 天" in report
+    assert "🥇 鮮蝦 — 3" in report
+    assert "・2026-02：" in report
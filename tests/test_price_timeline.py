@@ -0,0 +1,104 @@
+import sqlite3
+from datetime import date
+
+import pandas as pd
+
+import metrics_common
+from price_timeline import PriceEntry, PriceTimeline, add_entry
+
+
+def _timeline(*extra):
+    return PriceTimeline.from_defaults(
+        {"雞胸肉自選碗": 160, "鮮蝦自選碗": 170},
+        [(None, date(2026, 3, 31), 0.9, "trial")],
+        extra,
+    )
+
+
+class TestPriceTimelineLookup:
+    def test_default_trial_discount(self):
+        timeline = _timeline()
+        assert timeline.discount_factor("2026-03-31") == 0.9
+        assert timeline.discount_factor("2026-04-01") == 1.0
+        assert timeline.discount_factor(pd.Timestamp("2026-01-01 12:00")) == 0.9
+
+    def test_base_price_change_is_effective_dated(self):
+        timeline = _timeline(PriceEntry("base_price", "雞胸肉自選碗", date(2026, 6, 1), None, 180.0))
+        assert timeline.base_price("雞胸肉自選碗", "2026-05-31") == 160
+        assert timeline.base_price("雞胸肉自選碗", "2026-06-01") == 180
+        assert timeline.base_price("鮮蝦自選碗", "2026-06-01") == 170
+        assert timeline.base_price("神秘碗", "2026-06-01") is None
+
+    def test_later_promotion_wins_inside_overlap(self):
+        timeline = _timeline(
+            PriceEntry("discount", None, date(2026, 7, 1), date(2026, 7, 31), 0.85),
+            PriceEntry("discount", None, date(2026, 7, 10), date(2026, 7, 12), 0.5),
+        )
+        assert timeline.discount_factor("2026-06-30") == 1.0
+        assert timeline.discount_factor("2026-07-01") == 0.85
+        assert timeline.discount_factor("2026-07-11") == 0.5
+        assert timeline.discount_factor("2026-07-13") == 0.85
+        assert timeline.discount_factor("2026-08-01") == 1.0
+
+    def test_fingerprint_changes_with_entries(self):
+        assert _timeline().fingerprint == _timeline().fingerprint
+        changed = _timeline(PriceEntry("discount", None, date(2026, 7, 1), date(2026, 7, 2), 0.8))
+        assert changed.fingerprint != _timeline().fingerprint
+
+
+class TestAttach:
+    def test_merge_asof_keeps_row_order(self):
+        timeline = _timeline(PriceEntry("base_price", "雞胸肉自選碗", date(2026, 6, 1), None, 180.0))
+        df = pd.DataFrame(
+            {
+                "checkout_time": pd.to_datetime(["2026-06-02 12:00", "2026-03-01 12:00", "2026-04-15 18:00"]),
+                "item_name": ["雞胸肉自選碗", "雞胸肉自選碗", "鮮蝦自選碗"],
+            },
+            index=[7, 3, 5],
+        )
+
+        out = timeline.attach(df, item_col="item_name")
+
+        assert list(out.index) == [7, 3, 5]
+        assert out["discount_factor"].tolist() == [1.0, 0.9, 1.0]
+        assert out["base_price"].tolist() == [180.0, 160.0, 170.0]
+        assert out["price_segment"].tolist() == [
+            timeline.segment_at(d).index for d in ["2026-06-02", "2026-03-01", "2026-04-15"]
+        ]
+
+    def test_empty_frame(self):
+        out = _timeline().attach(pd.DataFrame({"checkout_time": pd.to_datetime([])}))
+        assert out.empty
+        assert "discount_factor" in out.columns
+
+
+class TestStoredTimeline:
+    def test_db_entries_drive_quantity_inference(self, db):
+        conn = sqlite3.connect(db)
+        add_entry(conn, PriceEntry("base_price", "雞胸肉自選碗", date(2026, 6, 1), None, 180.0))
+        add_entry(conn, PriceEntry("discount", None, date(2026, 7, 1), date(2026, 7, 31), 0.8))
+        conn.commit()
+        conn.close()
+
+        metrics_common.get_price_timeline(refresh=True)
+
+        assert metrics_common.get_discount_factor("2026-07-15") == 0.8
+        # 180 × 2 = 360；舊價 160 下 360 只會被視為 1 碗加購
+        assert metrics_common.infer_quantity_from_price("雞胸肉自選碗", 360.0, "2026-06-02") == 2
+        assert metrics_common.infer_quantity_from_price("雞胸肉自選碗", 320.0, "2026-05-31") == 2
+        # 180 × 2 × 0.8 = 288
+        assert metrics_common.count_bowls_smart("雞胸肉自選碗 $288.0", "2026-07-15") == 2
+
+    def test_build_order_features_picks_up_new_rows(self, db):
+        orders = pd.DataFrame({
+            "checkout_time": pd.to_datetime(["2026-06-02 12:00"]),
+            "items_text": ["雞胸肉自選碗 $360.0"],
+        })
+        assert metrics_common.build_order_features(orders)["bowls"].tolist() == [1]
+
+        conn = sqlite3.connect(db)
+        add_entry(conn, PriceEntry("base_price", "雞胸肉自選碗", date(2026, 6, 1), None, 180.0))
+        conn.commit()
+        conn.close()
+
+        assert metrics_common.build_order_features(orders)["bowls"].tolist() == [2]
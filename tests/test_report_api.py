@@ -0,0 +1,103 @@
+import gzip
+import json
+
+import pytest
+from conftest import insert_order
+from flask import Flask
+
+import report_api
+from daily_metrics import calculate_daily_metrics
+from metrics_common import to_jsonable
+
+DAY = "2026-03-04"
+AUTH = {"Authorization": "Bearer s3cret"}
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    monkeypatch.setenv("REPORT_API_TOKEN", "s3cret")
+    app = Flask(__name__)
+    app.register_blueprint(report_api.api)
+    return app.test_client()
+
+
+def _seed(db):
+    insert_order(db, checkout_time=f"{DAY} 12:10:00", items_text="雞胸肉自選碗 $160.0", invoice_amount=160)
+    insert_order(db, checkout_time=f"{DAY} 19:30:00", items_text="豆腐自選碗 $125.0", invoice_amount=125)
+    insert_order(db, checkout_time="2026-03-05 12:00:00", items_text="鮮蝦自選碗 $170.0", invoice_amount=170)
+
+
+class TestDaily:
+    def test_returns_metrics_as_json(self, db, client):
+        _seed(db)
+        response = client.get(f"/api/report/daily/{DAY}", headers=AUTH)
+        assert response.status_code == 200
+        assert response.mimetype == "application/json"
+        assert response.get_json() == json.loads(json.dumps(to_jsonable(calculate_daily_metrics(DAY))))
+        assert response.headers["ETag"].startswith('W/"')
+
+    def test_etag_gives_304_without_recompute(self, db, client, monkeypatch):
+        _seed(db)
+        etag = client.get(f"/api/report/daily/{DAY}", headers=AUTH).headers["ETag"]
+        monkeypatch.setattr(report_api, "calculate_daily_metrics",
+                            lambda *args: pytest.fail("304 should not recompute"))
+        response = client.get(f"/api/report/daily/{DAY}", headers={**AUTH, "If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+
+    def test_new_orders_change_etag(self, db, client):
+        _seed(db)
+        etag = client.get(f"/api/report/daily/{DAY}", headers=AUTH).headers["ETag"]
+        insert_order(db, checkout_time=f"{DAY} 19:45:00", items_text="鮮蝦自選碗 $170.0", invoice_amount=170)
+        response = client.get(f"/api/report/daily/{DAY}", headers={**AUTH, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+    def test_rules_change_etag(self, db, client, override_rules):
+        _seed(db)
+        etag = client.get(f"/api/report/daily/{DAY}", headers=AUTH).headers["ETag"]
+        override_rules(exclude_items=["提袋"])
+        response = client.get(f"/api/report/daily/{DAY}", headers={**AUTH, "If-None-Match": etag})
+        assert response.status_code == 200
+
+    def test_gzip(self, db, client, monkeypatch):
+        _seed(db)
+        monkeypatch.setattr(report_api, "GZIP_MIN_BYTES", 1)
+        response = client.get(f"/api/report/daily/{DAY}", headers={**AUTH, "Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["Vary"]
+        plain = client.get(f"/api/report/daily/{DAY}", headers=AUTH)
+        assert json.loads(gzip.decompress(response.data)) == plain.get_json()
+        assert response.headers["ETag"] == plain.headers["ETag"]
+
+    def test_errors(self, db, client):
+        assert client.get("/api/report/daily/2026-02-30", headers=AUTH).status_code == 400
+        assert client.get(f"/api/report/daily/{DAY}", headers=AUTH).status_code == 404
+
+
+class TestRange:
+    def test_returns_weekly_metrics(self, db, client):
+        _seed(db)
+        response = client.get(f"/api/report/range?start={DAY}&end=2026-03-05", headers=AUTH)
+        assert response.status_code == 200
+        body = response.get_json()
+        assert isinstance(body, dict) and body
+
+    def test_validation(self, db, client):
+        assert client.get("/api/report/range?start=2026-03-05&end=2026-03-04", headers=AUTH).status_code == 400
+        assert client.get("/api/report/range?start=2025-01-01&end=2026-03-04", headers=AUTH).status_code == 400
+        assert client.get("/api/report/range?start=2026-03-04", headers=AUTH).status_code == 400
+
+
+def test_requires_token(db, client, monkeypatch):
+    assert client.get(f"/api/report/daily/{DAY}").status_code == 401
+    assert client.get(f"/api/report/daily/{DAY}", headers={"Authorization": "Bearer nope"}).status_code == 401
+    monkeypatch.delenv("REPORT_API_TOKEN")
+    assert client.get(f"/api/report/daily/{DAY}", headers=AUTH).status_code == 403
+
+
+def test_to_jsonable_handles_numpy_and_nan():
+    np = pytest.importorskip("numpy")
+    assert to_jsonable({"a": np.int64(3), "b": np.float64("nan"), "c": [np.float32(1.5)]}) == {
+        "a": 3, "b": None, "c": [1.5],
+    }
@@ -0,0 +1,134 @@
+import dataclasses
+import json
+import os
+
+import pandas as pd
+import pytest
+
+import metrics_common
+from rule_set import RuleSet, RuleSetError, RuleSetSource, load_rule_set
+
+
+def _write(path, data):
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+
+@pytest.fixture
+def rules_data():
+    return load_rule_set(metrics_common.RULES_PATH).to_mapping()
+
+
+class TestRuleSet:
+    def test_rules_file_matches_module_constants(self):
+        rules = metrics_common.current_rules()
+        assert metrics_common.PROTEIN_RULES == {p: list(k) for p, k in rules.protein_rules.items()}
+        assert metrics_common.BUSINESS_HOURS["lunch"] == {"start": "11:00", "end": "14:30"}
+        assert metrics_common.PROTEIN_KEYWORDS == list(rules.protein_keywords)
+
+    def test_is_immutable(self, rules_data):
+        rules = RuleSet.from_mapping(rules_data)
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            rules.hash = "x"
+        with pytest.raises(TypeError):
+            rules.protein_rules["beef"] = ("牛",)
+
+    def test_hash_follows_content(self, rules_data):
+        assert RuleSet.from_mapping(rules_data).hash == RuleSet.from_mapping(rules_data).hash
+        changed = dict(rules_data, exclude_items=["提袋"])
+        assert RuleSet.from_mapping(changed).hash != RuleSet.from_mapping(rules_data).hash
+
+    def test_unsupported_version(self, rules_data):
+        with pytest.raises(RuleSetError):
+            RuleSet.from_mapping(dict(rules_data, version=99))
+
+    def test_missing_key(self, rules_data):
+        broken = dict(rules_data)
+        del broken["protein_rules"]
+        with pytest.raises(RuleSetError):
+            RuleSet.from_mapping(broken)
+
+    @pytest.mark.parametrize(
+        ("item", "is_bowl", "proteins"),
+        [
+            ("雞胸肉自選碗 $144.0", True, ("chicken",)),
+            ("加購一份壽喜燒豬 $50.0", False, ("pork",)),
+            ("提袋 $2.0", False, ()),
+            ("海味雙魚碗 $234.0", True, ()),
+            ("嚴選生鮭魚 45g $0.0", False, ("salmon",)),
+        ],
+    )
+    def test_compiled_matchers(self, rules_data, item, is_bowl, proteins):
+        rules = RuleSet.from_mapping(rules_data)
+        assert rules.is_valid_bowl_item(item) is is_bowl
+        assert rules.matching_proteins(item) == proteins
+
+    def test_addon_table_matches_knapsack(self, rules_data):
+        rules = RuleSet.from_mapping(rules_data)
+        limit = len(rules.addon_reachable) - 1
+        reachable = {0}
+        for total in range(limit + 1):
+            if total in reachable:
+                reachable.update(total + price for price in rules.known_addon_prices)
+        assert [i for i in range(limit + 1) if rules.addon_reachable[i]] == sorted(
+            total for total in reachable if total <= limit
+        )
+
+
+class TestRuleSetSource:
+    def test_hot_swaps_on_file_change(self, tmp_path, rules_data):
+        path = tmp_path / "rules.json"
+        _write(path, rules_data)
+        source = RuleSetSource(path, check_interval=0)
+        before = source.current()
+
+        _write(path, dict(rules_data, exclude_items=["提袋"]))
+        os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 1_000_000))
+
+        after = source.current()
+        assert after.hash != before.hash
+        assert after.exclude_items == ("提袋",)
+
+    def test_broken_file_keeps_previous_rules(self, tmp_path, rules_data, capsys):
+        path = tmp_path / "rules.json"
+        _write(path, rules_data)
+        source = RuleSetSource(path, check_interval=0)
+        before = source.current()
+
+        path.write_text("{not json", encoding="utf-8")
+        os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 1_000_000))
+
+        assert source.current() is before
+        assert "規則檔載入失敗" in capsys.readouterr().out
+
+    def test_interval_throttles_stat(self, tmp_path, rules_data):
+        path = tmp_path / "rules.json"
+        _write(path, rules_data)
+        source = RuleSetSource(path, check_interval=3600)
+        before = source.current()
+
+        _write(path, dict(rules_data, exclude_items=["提袋"]))
+        os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 1_000_000))
+
+        assert source.current() is before
+        assert source.reload_if_changed() is True
+
+
+class TestRulesDriveCalculations:
+    def test_override_changes_set_meal_attribution(self, override_rules):
+        df = pd.DataFrame({
+            "checkout_time": pd.to_datetime(["2026-03-01 12:00"]),
+            "items_text": ["均衡經典碗 $153.0"],
+        })
+        assert metrics_common.build_order_features(df)["set_meal_chicken"].tolist() == [1]
+
+        override_rules(set_meal_rules={"均衡經典碗": {"chicken": 2}})
+
+        assert metrics_common.build_order_features(df)["set_meal_chicken"].tolist() == [2]
+        assert metrics_common.SET_MEAL_RULES == {"均衡經典碗": {"chicken": 2}}
+
+    def test_override_business_hours(self, override_rules):
+        ts = pd.Timestamp("2026-01-01 15:00")
+        assert metrics_common.is_in_period(ts, "lunch") is False
+        override_rules(business_hours={"lunch": {"start": "11:00", "end": "15:00"},
+                                       "dinner": {"start": "16:30", "end": "20:00"}})
+        assert metrics_common.is_in_period(ts, "lunch") is True
@@ -0,0 +1,92 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import metrics_common
+from scheduler import Scheduler, count_due_jobs, list_jobs
+
+
+def _job_row(db, name):
+    conn = sqlite3.connect(str(db))
+    row = conn.execute(
+        "SELECT next_run_at, last_run_at, last_status, last_error FROM scheduled_jobs WHERE name = ?", (name,)
+    ).fetchone()
+    conn.close()
+    return row
+
+
+class TestScheduler:
+    def test_new_job_runs_then_waits_for_interval(self, db):
+        calls = []
+        scheduler = Scheduler()
+        scheduler.register("job", 3600, lambda: calls.append(1))
+
+        assert scheduler.run_pending(datetime.now() + timedelta(seconds=1)) == ["job"]
+        assert scheduler.run_pending(datetime.now() + timedelta(minutes=30)) == []
+        assert scheduler.run_pending(datetime.now() + timedelta(hours=2)) == ["job"]
+        assert len(calls) == 2
+
+    def test_schedule_survives_restart(self, db):
+        first = Scheduler()
+        first.register("job", 3600, lambda: None)
+        started = datetime.now() + timedelta(seconds=1)
+        assert first.run_pending(started) == ["job"]
+
+        calls = []
+        restarted = Scheduler()
+        restarted.register("job", 3600, lambda: calls.append(1))
+        assert restarted.run_pending(started + timedelta(minutes=10)) == []
+        assert restarted.run_pending(started + timedelta(hours=1)) == ["job"]
+        assert calls == [1]
+
+    def test_claim_is_exclusive(self, db):
+        calls = []
+        a, b = Scheduler(), Scheduler()
+        a.register("job", 3600, lambda: calls.append("a"))
+        b.register("job", 3600, lambda: calls.append("b"))
+
+        moment = datetime.now() + timedelta(seconds=1)
+        assert a.run_pending(moment) + b.run_pending(moment) == ["job"]
+        assert calls == ["a"]
+
+    def test_trigger_makes_job_due(self, db):
+        scheduler = Scheduler()
+        scheduler.register("job", 3600, lambda: None)
+        scheduler.run_pending(datetime.now() + timedelta(seconds=1))
+
+        scheduler.trigger("job")
+        assert scheduler.run_pending(datetime.now() + timedelta(seconds=1)) == ["job"]
+
+    def test_failure_is_recorded_and_isolated(self, db):
+        calls = []
+        scheduler = Scheduler()
+        scheduler.register("broken", 60, lambda: 1 / 0)
+        scheduler.register("healthy", 60, lambda: calls.append(1))
+
+        moment = datetime.now().replace(microsecond=0) + timedelta(seconds=1)
+        assert scheduler.run_pending(moment) == ["broken", "healthy"]
+        _, last_run_at, status, error = _job_row(db, "broken")
+        assert (last_run_at, status) == (moment.isoformat(), "error")
+        assert "ZeroDivisionError" in error
+        assert _job_row(db, "healthy")[2] == "ok"
+        assert calls == [1]
+        assert [row[0] for row in list_jobs()] == ["broken", "healthy"]
+
+    def test_register_does_not_touch_db(self, tmp_path, monkeypatch):
+        # line_bot_app 在 import 時登記工作；資料夾不存在也不能失敗
+        monkeypatch.setattr(metrics_common, "DB_PATH", str(tmp_path / "missing" / "ichef.db"))
+        scheduler = Scheduler()
+        scheduler.register("job", 3600, lambda: None)
+        assert not (tmp_path / "missing").exists()
+
+    def test_count_due_jobs(self, db):
+        scheduler = Scheduler()
+        scheduler.register("a", 3600, lambda: None)
+        scheduler.register("b", 3600, lambda: None)
+        scheduler.persist_jobs()
+        moment = datetime.now() + timedelta(seconds=1)
+        assert count_due_jobs(moment) == 2
+
+        scheduler.run_pending(moment)
+        assert count_due_jobs(moment) == 0
+        scheduler.trigger("a")
+        assert count_due_jobs(datetime.now() + timedelta(seconds=1)) == 1
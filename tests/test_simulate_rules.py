@@ -0,0 +1,94 @@
+import sqlite3
+
+from conftest import insert_order
+
+import metrics_common
+from metrics_common import current_rules
+from simulate_rules import render_simulation, simulate_rules
+
+
+def _insert_history(db):
+    insert_order(db, checkout_time="2026-04-01 12:00:00", items_text="雞胸肉自選碗 $320.0", invoice_amount=320)
+    insert_order(db, checkout_time="2026-04-01 18:00:00", items_text="豆腐自選碗 $125.0", invoice_amount=125)
+    insert_order(db, checkout_time="2026-04-02 12:00:00", items_text="鮮蝦自選碗 $170.0", invoice_amount=170)
+    insert_order(db, checkout_time="2026-04-02 13:00:00", items_text="雞胸肉自選碗 $160.0", invoice_amount=0)
+
+
+class TestSimulateRules:
+    def test_same_rules_no_diff(self, db):
+        _insert_history(db)
+        result = simulate_rules(current_rules(), "2026-04-01", "2026-04-02")
+
+        assert result.diff.empty
+        assert result.changed_keys == []
+        assert list(result.current.index) == ["2026-04-01", "2026-04-02"]
+        assert result.current.at["2026-04-01", "bowls"] == 3
+        assert "皆無變化" in render_simulation(result)
+
+    def test_protein_rule_change(self, db):
+        _insert_history(db)
+        rules = current_rules()
+        protein_rules = {key: list(words) for key, words in rules.protein_rules.items()}
+        protein_rules["shrimp"] = ["蝦仁"]
+        candidate = rules.replace(protein_rules=protein_rules)
+
+        result = simulate_rules(candidate, "2026-04-01", "2026-04-02")
+
+        assert result.changed_keys == ["protein_rules"]
+        assert list(result.diff.columns) == ["protein_bowls_shrimp"]
+        assert result.diff["protein_bowls_shrimp"].tolist() == [0, -1]
+        text = render_simulation(result)
+        assert "2026-04-02  shrimp碗 1→0 (-1)" in text
+        assert "2026-04-01" not in text.split("\n\n")[1]
+
+    def test_base_price_change_uses_candidate_prices(self, db):
+        _insert_history(db)
+        prices = dict(current_rules().bowl_base_prices)
+        prices["雞胸肉自選碗"] = 320
+        candidate = current_rules().replace(bowl_base_prices=prices)
+
+        result = simulate_rules(candidate, "2026-04-01", "2026-04-02")
+
+        assert result.diff.loc["2026-04-01", "bowls"] == -1
+        assert "protein_bowls_chicken" not in result.diff.columns
+        # 試算結束後還原目前規則
+        assert metrics_common.current_rules().bowl_base_prices["雞胸肉自選碗"] == 160
+
+    def test_new_protein_column(self, db):
+        _insert_history(db)
+        rules = current_rules()
+        protein_rules = {key: list(words) for key, words in rules.protein_rules.items()}
+        protein_rules["beef"] = ["牛"]
+        protein_rules["veggie"] = ["豆腐"]
+        candidate = rules.replace(protein_rules=protein_rules)
+
+        result = simulate_rules(candidate, "2026-04-01", "2026-04-02")
+
+        assert "protein_bowls_beef" not in result.diff.columns
+        assert result.diff.loc["2026-04-01", "protein_bowls_veggie"] == 1
+
+    def test_keeps_memo_for_both_rule_sets(self, db, monkeypatch):
+        monkeypatch.setattr(metrics_common, "_ITEM_MEMO", {})
+        monkeypatch.setattr(metrics_common, "_ITEM_MEMO_PENDING", {})
+        monkeypatch.setattr(metrics_common, "_ITEM_MEMO_LOADED", set())
+        _insert_history(db)
+        rules = current_rules()
+        protein_rules = {key: list(words) for key, words in rules.protein_rules.items()}
+        protein_rules["shrimp"] = ["蝦仁"]
+        candidate = rules.replace(protein_rules=protein_rules)
+
+        simulate_rules(candidate, "2026-04-01", "2026-04-02")
+
+        timeline = metrics_common.get_price_timeline()
+        conn = sqlite3.connect(str(db))
+        try:
+            versions = {row[0] for row in conn.execute("SELECT DISTINCT memo_version FROM item_memo")}
+        finally:
+            conn.close()
+        assert versions == {
+            metrics_common.item_memo_version(timeline, rules),
+            metrics_common.item_memo_version(timeline, candidate),
+        }
+
+    def test_no_orders(self, db):
+        assert simulate_rules(current_rules(), "2099-01-01", "2099-01-31") is None
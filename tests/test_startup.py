@@ -0,0 +1,68 @@
+import sqlite3
+from datetime import date
+
+import pytest
+from conftest import insert_order
+
+import startup
+from daily_metrics import calculate_daily_metrics
+from daily_push import load_daily_report
+from report_renderer import render_daily_report
+from startup import StartupState, render_startup_report, warm_up
+
+TODAY = date(2026, 3, 4)
+
+
+pytestmark = pytest.mark.usefixtures("modifier_summary")
+
+
+def test_warm_up_precomputes_recent_days(db):
+    insert_order(db, checkout_time="2026-03-03 12:10:00", items_text="雞胸肉自選碗 $160.0", invoice_amount=160)
+    insert_order(db, checkout_time="2026-02-20 12:10:00", items_text="鮮蝦自選碗 $170.0", invoice_amount=170)
+    state = StartupState()
+
+    snapshot = warm_up(state, today=TODAY)
+
+    assert snapshot["ready"] and snapshot["boot_ms"] is not None
+    names = [entry["name"] for entry in snapshot["stages"]]
+    assert names[0] == "import pandas"
+    assert {"rules + price timeline", "item memo", "daily snapshots (7 days)", "daily reports (7 days)",
+            "weekly snapshots"} <= set(names)
+    assert not any("error" in entry for entry in snapshot["stages"])
+
+    conn = sqlite3.connect(str(db))
+    days = [row[0] for row in conn.execute("SELECT day FROM daily_snapshot ORDER BY day")]
+    conn.close()
+    assert days == [f"2026-02-{day}" for day in (26, 27, 28)] + [f"2026-03-0{day}" for day in (1, 2, 3, 4)]
+    # 有訂單的日子已存好日報，之後的「分析」不必重算
+    assert load_daily_report("2026-03-03") == render_daily_report(calculate_daily_metrics("2026-03-03"))
+
+
+def test_failed_stage_is_recorded_and_still_ready(db, monkeypatch):
+    monkeypatch.setattr(startup, "HANDLER_MODULES", ())
+    state = StartupState()
+    with pytest.raises(ImportError):
+        startup.import_modules(state, ("no_such_module_for_startup",))
+
+    snapshot = warm_up(state, today=TODAY)
+
+    assert snapshot["ready"]
+    assert snapshot["stages"][0]["name"] == "import no_such_module_for_startup"
+    assert "ModuleNotFoundError" in snapshot["stages"][0]["error"]
+
+
+def test_render_startup_report():
+    snapshot = {
+        "ready": False,
+        "boot_ms": None,
+        "stages": [
+            {"name": "import flask", "ms": 25.0},
+            {"name": "import pandas", "ms": 75.0},
+            {"name": "weekly snapshots", "ms": 0.0, "error": "OperationalError: locked"},
+        ],
+    }
+    lines = render_startup_report(snapshot).splitlines()
+
+    assert lines[0] == "Startup: warming up, boot - ms, 3 stages"
+    assert lines[1].split()[:5] == ["import", "pandas", "75.0", "ms", "75.0%"]
+    assert lines[3].endswith("! OperationalError: locked")
@@ -0,0 +1,125 @@
+import sqlite3
+
+import pytest
+from conftest import insert_order
+
+import tracing
+from tracing import phase_stats, render_phase_stats, span, trace, traced
+from weekly_generator import calculate_weekly_comparison
+
+
+def _spans(db):
+    conn = sqlite3.connect(str(db))
+    rows = conn.execute(
+        "SELECT trace_name, span_id, parent_id, name, status FROM trace_spans ORDER BY rowid"
+    ).fetchall()
+    conn.close()
+    return rows
+
+
+@traced()
+def _load():
+    with span("query"):
+        pass
+
+
+def test_nested_spans_are_recorded_once_per_trace(db):
+    with trace("週報"):
+        _load()
+        with span("render"):
+            _load()
+
+    assert [row[1:] for row in _spans(db)] == [
+        (0, None, "週報", "ok"),
+        (1, 0, "_load", "ok"),
+        (2, 1, "query", "ok"),
+        (3, 0, "render", "ok"),
+        (4, 3, "_load", "ok"),
+        (5, 4, "query", "ok"),
+    ]
+
+
+def test_spans_outside_trace_are_noops(db):
+    _load()
+    with span("render"):
+        pass
+    conn = sqlite3.connect(str(db))
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'trace_spans'").fetchone() is None
+    conn.close()
+
+
+def test_error_status(db):
+    with pytest.raises(ValueError):
+        with trace("分析"):
+            with span("load_orders"):
+                raise ValueError("boom")
+
+    assert [(row[3], row[4]) for row in _spans(db)] == [("分析", "error"), ("load_orders", "error")]
+
+
+def test_phase_stats_percentiles(db):
+    durations = iter([10.0, 20.0, 30.0, 40.0, 100.0])
+    for _ in range(5):
+        with trace("週報"):
+            with span("load_orders"):
+                pass
+        # 改寫剛寫入的 load_orders 耗時，讓百分位數可預期
+        conn = sqlite3.connect(str(db))
+        conn.execute("UPDATE trace_spans SET duration_ms = ? WHERE rowid = (SELECT MAX(rowid) FROM trace_spans)",
+                     (next(durations),))
+        conn.commit()
+        conn.close()
+    with trace("分析"):
+        pass
+
+    stats = phase_stats(last=10)
+    name, depth, count, p50, p95 = stats["週報"]["phases"][1]
+    assert (name, depth, count, p50, p95) == ("load_orders", 1, 5, 30.0, 100.0)
+    assert stats["週報"]["count"] == 5
+    assert set(phase_stats(last=10, trace_name="分析")) == {"分析"}
+    # 只看最近 2 個 trace：分析 與最後一個 週報
+    assert phase_stats(last=2)["週報"]["phases"][1][3] == 100.0
+
+
+def test_repeated_phase_is_summed_per_trace(db):
+    with trace("分析"):
+        for _ in range(3):
+            with span("load_orders"):
+                pass
+    phases = phase_stats()["分析"]["phases"]
+    assert [(name, count) for name, _, count, _, _ in phases] == [("分析", 1), ("load_orders", 1)]
+
+
+def test_weekly_path_is_instrumented(db, modifier_summary):
+    insert_order(db, checkout_time="2026-02-23 12:10:00", items_text="雞胸肉自選碗 $160.0", invoice_amount=160)
+
+    with trace("週報"):
+        calculate_weekly_comparison("2026-02-23", "2026-03-01")
+
+    names = {row[3] for row in _spans(db)}
+    assert {"calculate_weekly_comparison", "load_orders_in_ranges", "preprocess_orders",
+            "build_order_features", "_period_tables", "_weekly_metrics", "load_protein_adds"} <= names
+
+
+def test_render_phase_stats(db):
+    with trace("週報"):
+        with span("load_orders"):
+            with span("query"):
+                pass
+    report = render_phase_stats(phase_stats(), 50)
+
+    assert report.startswith("⏱ 效能｜最近 50 次請求")
+    assert "【週報】1 次｜" in report
+    assert "\n・load_orders " in report
+    assert "\n  ・query " in report
+    assert render_phase_stats({}) == "⚠️ 尚無效能紀錄"
+
+
+def test_flush_failure_does_not_raise(db, monkeypatch, capsys):
+    def _broken():
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(tracing, "_connect", _broken)
+    with trace("分析"):
+        pass
+    assert "Trace not recorded" in capsys.readouterr().out
@@ -0,0 +1,99 @@
+import random
+
+from conftest import insert_order
+
+import daily_snapshot
+from report_renderer import render_trend_report
+from trend_metrics import DayPoint, RollingWindow, calculate_trend_series, series_rows
+
+
+def _brute_force(points, size):
+    window = points[-size:]
+    open_days = sum(1 for point in window if point.orders)
+    bowls = sum(point.bowls for point in window)
+    revenue = sum(point.revenue for point in window)
+    return open_days, bowls, revenue
+
+
+class TestRollingWindow:
+    def test_matches_recomputed_window(self):
+        rng = random.Random(0)
+        window = RollingWindow(7, ["chicken"])
+        points = []
+        for offset in range(40):
+            orders = rng.choice([0, rng.randint(1, 50)])
+            bowls = orders and rng.randint(orders, orders * 2)
+            point = DayPoint(f"d{offset:02d}", orders, bowls, bowls * 165.5, {"chicken": bowls // 2})
+            points.append(point)
+            window.push(point)
+
+            open_days, bowls_sum, revenue_sum = _brute_force(points, 7)
+            assert len(window.points) == min(len(points), 7)
+            assert (window.open_days, window.bowls) == (open_days, bowls_sum)
+            assert abs(window.revenue - revenue_sum) < 1e-6
+
+    def test_summary_averages_over_open_days(self):
+        window = RollingWindow(7, ["chicken", "tofu"])
+        window.push(DayPoint("2026-03-01", 0, 0, 0.0, {}))
+        window.push(DayPoint("2026-03-02", 10, 12, 2000.0, {"chicken": 6}))
+        window.push(DayPoint("2026-03-03", 8, 8, 1400.0, {"chicken": 2, "tofu": 4}))
+
+        summary = window.summary()
+        assert summary["open_days"] == 2
+        assert summary["avg_bowls"] == 10.0
+        assert summary["avg_revenue"] == 1700.0
+        assert summary["avg_bowl_price"] == 170.0
+        assert summary["protein_share"] == {"chicken": 0.4, "tofu": 0.2}
+
+
+def _seed(db):
+    for day in range(1, 15):
+        for _ in range(day % 3 + 1):
+            insert_order(db, checkout_time=f"2026-03-{day:02d} 12:00:00",
+                         items_text="雞胸肉自選碗 $160.0", invoice_amount=160)
+    insert_order(db, checkout_time="2026-03-14 18:00:00", items_text="鮮蝦自選碗 $170.0", invoice_amount=170)
+
+
+class TestTrendSeries:
+    def test_windows_start_full(self, db):
+        _seed(db)
+        series = calculate_trend_series("2026-03-10", "2026-03-14")
+
+        assert [entry["date"] for entry in series] == [f"2026-03-{day}" for day in range(10, 15)]
+        latest = series[-1]
+        # 03-08 ~ 03-14 每天 day % 3 + 1 單，03-14 另有一碗鮮蝦
+        bowls = sum(day % 3 + 1 for day in range(8, 15)) + 1
+        assert latest["bowls"] == 4
+        assert latest["7d"]["avg_bowls"] == round(bowls / 7, 1)
+        assert latest["7d"]["protein_share"]["shrimp"] == round(1 / bowls, 4)
+        # 28 日視窗涵蓋 02-15 起，3 月前沒有營業
+        assert latest["28d"]["open_days"] == 14
+
+    def test_second_run_reads_no_orders(self, db, monkeypatch):
+        _seed(db)
+        first = calculate_trend_series("2026-03-01", "2026-03-14")
+
+        calls = []
+        original = daily_snapshot.DailyAccumulator.add
+        monkeypatch.setattr(daily_snapshot.DailyAccumulator, "add",
+                            lambda self, *row: calls.append(row) or original(self, *row))
+        assert calculate_trend_series("2026-03-01", "2026-03-14") == first
+        assert calls == []
+
+    def test_series_rows(self, db):
+        _seed(db)
+        rows = series_rows(calculate_trend_series("2026-03-13", "2026-03-14"))
+
+        assert len(rows) == 2
+        assert list(rows[0])[:7] == ["date", "orders", "bowls", "revenue", "bowls_7d", "revenue_7d", "avg_bowl_price_7d"]
+        assert "share_chicken_28d" in rows[0]
+
+
+def test_render_trend_report(db):
+    _seed(db)
+    report = render_trend_report(calculate_trend_series("2026-02-15", "2026-03-14"))
+
+    assert report.startswith("📈 趨勢｜截至 2026-03-14")
+    assert "・近 7 日：" in report and "前 7 日" in report
+    assert "・雞胸" in report
+    assert len(report.splitlines()[-1]) == 28
@@ -1,6 +1,22 @@
+import datetime
+
+import numpy as np
 import pandas as pd
+import pytest
+from conftest import insert_modifier, insert_order
 
 import weekly_generator
+from metrics_common import current_rules
+from report_renderer import render_weekly_report
+
+
+def _protein_adds(modifiers: pd.DataFrame) -> dict:
+    """把 modifier 列依規則的品名比對彙總成 load_protein_adds 的輸出。"""
+    adds = {}
+    for name, count in zip(modifiers["name"], modifiers["count"]):
+        for protein in current_rules().modifier_proteins(name):
+            adds[protein] = adds.get(protein, 0) + int(count)
+    return adds
 
 
 def test_weekly_protein_events_include_pork_adds(monkeypatch):
@@ -22,7 +38,7 @@ def test_weekly_protein_events_include_pork_adds(monkeypatch):
     ])
 
     monkeypatch.setattr(weekly_generator, "load_orders", lambda *args, **kwargs: orders)
-    monkeypatch.setattr(weekly_generator, "load_modifier", lambda *args, **kwargs: modifiers)
+    monkeypatch.setattr(weekly_generator, "load_protein_adds", lambda *args, **kwargs: _protein_adds(modifiers))
 
     result = weekly_generator.calculate_weekly_metrics("2026-02-22", "2026-02-28")
 
@@ -35,3 +51,191 @@ def test_weekly_protein_events_include_pork_adds(monkeypatch):
 
     protein_events_ratio_dict = dict(result["protein_events_ratio"])
     assert protein_events_ratio_dict["pork"] == 100.0
+
+
+CASH = "現金(Cash payment module)"
+LINEPAY = "LinePay (未整合)(Custom payment module)"
+
+WEEKLY_ORDERS = pd.DataFrame(
+    [
+        ("2026-02-23 11:00:00", "On site", "Dine In", 160, CASH, "雞胸肉自選碗 $160.0"),
+        ("2026-02-23 11:59:59", "On site", "內用", 149.5, LINEPAY, "鮮蝦自選碗 $170.0"),
+        ("2026-02-23 12:00:00", "Online Store", "Takeout", 150, LINEPAY, "壽喜燒豬自選碗 $160.0"),
+        ("2026-02-23 13:29:00", "On site", "外帶", 250, CASH, "嚴選生鮭魚自選碗 $190.0, 味噌湯 $60.0"),
+        ("2026-02-23 13:30:00", "Online Store", "Delivery", 250.5, "信用卡", "高蛋白健身碗 $220.0, 提袋 $2.0"),
+        ("2026-02-23 14:30:00", "On site", "外送", 200, None, "豆腐自選碗 $125.0, 加購一份壽喜燒豬 $50.0"),
+        ("2026-02-24 14:30:01", "On site", "Dine In", 320, CASH, "雞胸肉自選碗 $320.0"),
+        ("2026-02-24 16:30:00", "On site", None, 480, LINEPAY, "雞胸肉自選碗 $160.0, 鮮蝦自選碗 $170.0, 清爽佛陀碗 $130.0"),
+        ("2026-02-24 18:45:00", "Online Store", "Dine In", 80, CASH, "味噌湯 $60.0, 甜點 $20.0"),
+        ("2026-02-24 20:00:00", "On site", "Takeout", 199, CASH, "海味雙魚碗 $260.0"),
+        ("2026-02-25 12:15:00", "On site", "Dine In", 0, CASH, "雞胸肉自選碗 $160.0"),
+        ("2026-02-25 12:45:00", "On site", "Dine In", 640, LINEPAY, "均衡經典碗 $170.0, 生鮪魚自選碗 $360.0, 鮮蝦自選碗 $170.0"),
+        ("2026-02-25 19:10:00", "Online Store", "外帶", 170, LINEPAY, "均衡經典碗 $170.0"),
+    ],
+    columns=["checkout_time", "order_source", "order_type", "invoice_amount", "payment_method", "items_text"],
+)
+WEEKLY_ORDERS["order_status"] = "Issued"
+
+WEEKLY_MODIFIERS = pd.DataFrame([
+    {"name": "加購一份壽喜燒豬", "count": 2},
+    {"name": "雞胸肉 加量", "count": 3},
+])
+
+# 改寫為 groupby / bincount 引擎前的輸出；值與型別（np.int64 / np.float64 / int）都必須一致
+EXPECTED_WEEKLY = {
+    "start_date": "2026-02-23",
+    "end_date": "2026-03-01",
+    "total_orders": 12,
+    "total_bowls": np.int64(15),
+    "total_revenue": np.float64(3049.0),
+    "avg_bowl_price": "203",
+    "1_bowl_orders": 9,
+    "2_bowl_orders": 0,
+    "3plus_bowl_orders": 2,
+    "1_bowl_revenue": np.float64(1849.0),
+    "2_bowl_revenue": np.float64(0.0),
+    "3plus_bowl_revenue": np.float64(1120.0),
+    "hourly_orders": {11: 2, 12: 2, 13: 2, 14: 2, 16: 1, 18: 1, 19: 1, 20: 1},
+    "hourly_bowls": {11: 2, 12: 4, 13: 2, 14: 2, 16: 3, 18: 0, 19: 1, 20: 1},
+    "lunch_orders": 7,
+    "dinner_orders": 4,
+    "peak_orders": 3,
+    "non_peak_orders": 9,
+    "dine_in_orders": 5,
+    "takeout_orders": 6,
+    "online_orders": 4,
+    "dine_in_bowls": np.int64(6),
+    "takeout_bowls": np.int64(6),
+    "online_bowls": np.int64(3),
+    "peak_dine_in": 1,
+    "peak_takeout": 2,
+    "peak_online": 1,
+    "non_peak_dine_in": 4,
+    "non_peak_takeout": 4,
+    "non_peak_online": 3,
+    "cash_orders": 5,
+    "linepay_orders": 5,
+    "peak_cash": 1,
+    "peak_linepay": 2,
+    "non_peak_cash": 4,
+    "non_peak_linepay": 3,
+    "daily_orders": {   datetime.date(2026, 2, 23): 6,
+                        datetime.date(2026, 2, 24): 4,
+                        datetime.date(2026, 2, 25): 2},
+    "daily_bowls": {   datetime.date(2026, 2, 23): 6,
+                       datetime.date(2026, 2, 24): 5,
+                       datetime.date(2026, 2, 25): 4},
+    "daily_revenue": {   datetime.date(2026, 2, 23): 1160.0,
+                         datetime.date(2026, 2, 24): 1079.0,
+                         datetime.date(2026, 2, 25): 810.0},
+    "max_bowl_day": (datetime.date(2026, 2, 23), 6),
+    "min_bowl_day": (datetime.date(2026, 2, 25), 4),
+    "price_distribution": {"lt_150": 2, "150_250": 6, "gt_250": 4},
+    "orders_ge_200": 6,
+    "protein_bowls": [("chicken", 3), ("shrimp", 3), ("pork", 1), ("tofu", 1), ("salmon", 1), ("tuna", 1)],
+    "protein_adds": [("chicken", 3), ("pork", 2), ("tofu", 0), ("shrimp", 0), ("salmon", 0), ("tuna", 0)],
+    "protein_non_bowls": [   ("pork", 1),
+                             ("chicken", 0),
+                             ("tofu", 0),
+                             ("shrimp", 0),
+                             ("salmon", 0),
+                             ("tuna", 0)],
+    "protein_set_meals": [   ("chicken", 4),
+                             ("tofu", 1),
+                             ("salmon", 1),
+                             ("tuna", 1),
+                             ("pork", 0),
+                             ("shrimp", 0)],
+    "protein_events_dict": {"chicken": 10, "pork": 4, "tofu": 2, "shrimp": 3, "salmon": 2, "tuna": 2},
+    "protein_events": [("chicken", 10), ("pork", 4), ("shrimp", 3), ("tofu", 2), ("salmon", 2), ("tuna", 2)],
+    "protein_events_ratio": [   ("chicken", np.float64(43.48)),
+                                ("pork", np.float64(17.39)),
+                                ("shrimp", np.float64(13.04)),
+                                ("tofu", np.float64(8.7)),
+                                ("salmon", np.float64(8.7)),
+                                ("tuna", np.float64(8.7))],
+    "first_protein": "chicken",
+    "first_protein_bowls": 10,
+    "first_protein_ratio": "43.48%",
+    "second_protein": "pork",
+    "second_protein_bowls": 4,
+    "second_protein_ratio": "17.39%"}
+
+
+def test_weekly_metrics_output_unchanged(monkeypatch):
+    monkeypatch.setattr(weekly_generator, "load_orders", lambda *args, **kwargs: WEEKLY_ORDERS.copy())
+    monkeypatch.setattr(weekly_generator, "load_protein_adds",
+                        lambda *args, **kwargs: _protein_adds(WEEKLY_MODIFIERS))
+
+    result = weekly_generator.calculate_weekly_metrics("2026-02-23", "2026-03-01")
+
+    assert repr(result) == repr(EXPECTED_WEEKLY)
+
+
+class TestWeeklyComparison:
+    @pytest.fixture(autouse=True)
+    def _modifiers(self, modifier_summary):
+        insert_modifier(modifier_summary, start_date="2026-02-23", end_date="2026-03-01", name="加購一份壽喜燒豬", count=2)
+
+    def _seed(self, db):
+        for day in ("2026-02-23", "2026-02-24"):
+            insert_order(db, checkout_time=f"{day} 12:10:00", items_text="雞胸肉自選碗 $160.0", invoice_amount=160)
+        insert_order(db, checkout_time="2026-02-25 18:30:00", items_text="鮮蝦自選碗 $170.0",
+                     invoice_amount=170, order_type="Takeout", payment_method=LINEPAY)
+        # 上週
+        insert_order(db, checkout_time="2026-02-16 12:00:00", items_text="雞胸肉自選碗 $160.0", invoice_amount=160)
+        insert_order(db, checkout_time="2026-02-22 19:00:00", items_text="豆腐自選碗 $125.0", invoice_amount=125)
+        # 去年同週（往前 364 天）
+        insert_order(db, checkout_time="2025-02-24 12:00:00", items_text="鮮蝦自選碗 $170.0", invoice_amount=170)
+        # 不在任何期間內
+        insert_order(db, checkout_time="2026-02-10 12:00:00", items_text="雞胸肉自選碗 $160.0", invoice_amount=160)
+
+    def test_comparison_ranges(self):
+        assert weekly_generator.comparison_ranges("2026-02-23", "2026-03-01") == {
+            "current": ("2026-02-23", "2026-03-01"),
+            "previous": ("2026-02-16", "2026-02-22"),
+            "last_year": ("2025-02-24", "2025-03-02"),
+        }
+
+    def test_matches_separate_weekly_calls(self, db, monkeypatch):
+        self._seed(db)
+        calls = []
+        original = weekly_generator.build_order_features
+        monkeypatch.setattr(weekly_generator, "build_order_features",
+                            lambda df, rules=None: calls.append(len(df)) or original(df, rules=rules))
+
+        result = weekly_generator.calculate_weekly_comparison("2026-02-23", "2026-03-01")
+
+        assert calls == [6]
+        comparisons = result.pop("comparisons")
+        assert result == weekly_generator.calculate_weekly_metrics("2026-02-23", "2026-03-01")
+        assert comparisons["previous"] == weekly_generator.calculate_weekly_metrics("2026-02-16", "2026-02-22")
+        assert comparisons["last_year"] == weekly_generator.calculate_weekly_metrics("2025-02-24", "2025-03-02")
+        assert comparisons["previous"]["total_orders"] == 2
+        assert comparisons["last_year"]["total_orders"] == 1
+        assert dict(result["protein_adds"])["pork"] == 2
+        assert dict(comparisons["previous"]["protein_adds"])["pork"] == 0
+
+    def test_missing_comparison_period(self, db):
+        insert_order(db, checkout_time="2026-02-23 12:10:00", items_text="雞胸肉自選碗 $160.0", invoice_amount=160)
+        result = weekly_generator.calculate_weekly_comparison("2026-02-23", "2026-03-01")
+        assert result["comparisons"] == {"previous": None, "last_year": None}
+        assert "上週：無資料" in render_weekly_report(result)
+
+    def test_no_current_data(self, db):
+        insert_order(db, checkout_time="2026-02-16 12:00:00", items_text="雞胸肉自選碗 $160.0", invoice_amount=160)
+        assert weekly_generator.calculate_weekly_comparison("2026-02-23", "2026-03-01") is None
+
+    def test_render_deltas(self, db):
+        self._seed(db)
+        report = render_weekly_report(weekly_generator.calculate_weekly_comparison("2026-02-23", "2026-03-01"))
+
+        assert "六、同期比較" in report
+        assert "總營收：$490｜上週 +$205(+71.9%)｜去年同週 +$320(+188.2%)" in report
+        assert "總訂單數：3｜上週 +1(+50.0%)｜去年同週 +2(+200.0%)" in report
+        assert "Line Pay：1｜上週 +1(--)｜去年同週 +1(--)" in report
+
+    def test_plain_report_has_no_comparison(self, db):
+        self._seed(db)
+        report = render_weekly_report(weekly_generator.calculate_weekly_metrics("2026-02-23", "2026-03-01"))
+        assert "同期比較" not in report
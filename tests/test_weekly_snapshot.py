@@ -0,0 +1,78 @@
+from datetime import date
+
+import pytest
+from conftest import insert_modifier, insert_order
+
+import weekly_snapshot
+from report_renderer import render_weekly_report
+from weekly_generator import calculate_weekly_comparison
+from weekly_snapshot import (
+    build_weekly_snapshot,
+    closed_weeks,
+    load_weekly_report,
+    precompute_weekly_snapshots,
+)
+
+TODAY = date(2026, 3, 4)  # 週三；上週為 02-23 ~ 03-01
+
+
+pytestmark = pytest.mark.usefixtures("modifier_summary")
+
+
+def _seed(db):
+    insert_order(db, checkout_time="2026-02-23 12:10:00", items_text="雞胸肉自選碗 $160.0", invoice_amount=160)
+    insert_order(db, checkout_time="2026-02-17 12:10:00", items_text="鮮蝦自選碗 $170.0", invoice_amount=170)
+    insert_order(db, checkout_time="2026-03-01 19:00:00", items_text="豆腐自選碗 $125.0", invoice_amount=125)
+
+
+def test_closed_weeks():
+    assert closed_weeks(TODAY, 2) == [("2026-02-23", "2026-03-01"), ("2026-02-16", "2026-02-22")]
+
+
+class TestWeeklySnapshot:
+    def test_precompute_then_serve(self, db, monkeypatch):
+        _seed(db)
+        assert precompute_weekly_snapshots(TODAY, 2) == [("2026-02-23", "2026-03-01"), ("2026-02-16", "2026-02-22")]
+
+        monkeypatch.setattr(weekly_snapshot, "calculate_weekly_comparison",
+                            lambda *args: pytest.fail("snapshot hit should not recompute"))
+        report = load_weekly_report("2026-02-23", "2026-03-01")
+        assert report.startswith("📊 週報")
+        assert "上週 " in report
+        assert precompute_weekly_snapshots(TODAY, 2) == []
+
+    def test_matches_live_report(self, db):
+        _seed(db)
+        assert build_weekly_snapshot("2026-02-23", "2026-03-01") == render_weekly_report(
+            calculate_weekly_comparison("2026-02-23", "2026-03-01")
+        )
+
+    def test_waits_until_week_is_imported(self, db):
+        insert_order(db, checkout_time="2026-02-27 12:10:00", items_text="雞胸肉自選碗 $160.0", invoice_amount=160)
+        assert precompute_weekly_snapshots(TODAY, 1) == []
+
+        insert_order(db, checkout_time="2026-03-02 12:10:00", items_text="雞胸肉自選碗 $160.0", invoice_amount=160)
+        assert precompute_weekly_snapshots(TODAY, 1) == [("2026-02-23", "2026-03-01")]
+
+    def test_new_orders_invalidate(self, db):
+        _seed(db)
+        build_weekly_snapshot("2026-02-23", "2026-03-01")
+        # 補匯入上週（比較期間）的訂單也會讓快照失效
+        insert_order(db, checkout_time="2026-02-18 12:10:00", items_text="雞胸肉自選碗 $160.0", invoice_amount=160)
+        assert load_weekly_report("2026-02-23", "2026-03-01") is None
+
+    def test_modifier_import_invalidates(self, db):
+        _seed(db)
+        build_weekly_snapshot("2026-02-23", "2026-03-01")
+        insert_modifier(db, start_date="2026-02-23", end_date="2026-03-01", name="加購一份壽喜燒豬", count=2)
+        assert load_weekly_report("2026-02-23", "2026-03-01") is None
+
+    def test_rule_change_invalidates(self, db, override_rules):
+        _seed(db)
+        build_weekly_snapshot("2026-02-23", "2026-03-01")
+        override_rules(bowl_base_prices={"雞胸肉自選碗": 80})
+        assert load_weekly_report("2026-02-23", "2026-03-01") is None
+
+    def test_no_data(self, db):
+        assert build_weekly_snapshot("2026-02-23", "2026-03-01") is None
+        assert precompute_weekly_snapshots(TODAY) == []
@@ -0,0 +1,98 @@
+import threading
+
+import pytest
+
+import bot_metrics
+from work_queue import BULK, INTERACTIVE, WorkQueue
+
+
+@pytest.fixture(autouse=True)
+def _fresh_registry(monkeypatch):
+    monkeypatch.setattr(bot_metrics, "_counters", {})
+
+
+def _blocker(queue, user_id="blocker", priority=BULK):
+    """佔住唯一的執行緒，直到 release.set()。"""
+    started, release = threading.Event(), threading.Event()
+
+    def job():
+        started.set()
+        release.wait(5)
+
+    queue.submit(user_id, priority, job)
+    assert started.wait(5)
+    return release
+
+
+def test_interactive_jumps_ahead_of_bulk():
+    queue = WorkQueue(workers=1, per_user=1)
+    release = _blocker(queue)
+    order = []
+    queue.submit("a", BULK, lambda: order.append("import"))
+    queue.submit("b", BULK, lambda: order.append("clock"))
+    queue.submit("c", INTERACTIVE, lambda: order.append("分析"))
+    release.set()
+
+    assert queue.join()
+    assert order == ["分析", "import", "clock"]
+
+
+def test_ahead_counts_jobs_that_start_first():
+    queue = WorkQueue(workers=1, per_user=1)
+    assert queue.ahead(INTERACTIVE, "x") == 0
+    release = _blocker(queue)
+    assert queue.ahead(INTERACTIVE, "x") == 1
+    queue.submit("a", BULK, lambda: None)
+    queue.submit("b", INTERACTIVE, lambda: None)
+    # 插隊的文字指令只需等前面的文字指令；匯入要等全部
+    assert queue.ahead(INTERACTIVE, "x") == 2
+    assert queue.ahead(BULK, "x") == 3
+    assert queue.depths() == {"interactive": 1, "bulk": 1}
+    release.set()
+    assert queue.join()
+    assert queue.depths() == {"interactive": 0, "bulk": 0}
+
+
+def test_per_user_limit_lets_other_users_run():
+    queue = WorkQueue(workers=2, per_user=1)
+    release = _blocker(queue, user_id="a", priority=INTERACTIVE)
+    order = []
+    done = threading.Event()
+    queue.submit("a", INTERACTIVE, lambda: order.append("a"))
+    queue.submit("b", INTERACTIVE, lambda: (order.append("b"), done.set()))
+
+    # 使用者 a 已有工作在跑，第二個工作留在佇列；空著的執行緒先跑 b
+    assert done.wait(5)
+    assert order == ["b"]
+    release.set()
+    assert queue.join()
+    assert order == ["b", "a"]
+
+
+def test_own_import_does_not_block_text_command():
+    # 唯一的使用者正在匯入 CSV；空著的執行緒要立刻跑他的文字指令
+    queue = WorkQueue(workers=2, per_user=1)
+    release = _blocker(queue, user_id="owner", priority=BULK)
+    assert queue.ahead(INTERACTIVE, "owner") == 0
+    done = threading.Event()
+    queue.submit("owner", INTERACTIVE, done.set)
+    assert done.wait(5)
+
+    # 同一使用者的第二個匯入要等第一個跑完
+    assert queue.ahead(BULK, "owner") == 1
+    release.set()
+    assert queue.join()
+
+
+def test_failing_job_does_not_stop_worker_and_wait_is_recorded(capsys):
+    queue = WorkQueue(workers=1, per_user=1)
+    ran = []
+    queue.submit("a", BULK, lambda: 1 / 0)
+    queue.submit("a", INTERACTIVE, lambda: ran.append(True))
+
+    assert queue.join()
+    assert ran == [True]
+    assert "ZeroDivisionError" in capsys.readouterr().err
+    counts = {labels: value for (name, labels), value in bot_metrics._counters.items()
+              if name == "pokebee_queue_wait_seconds_count"}
+    assert sum(counts.values()) == 2
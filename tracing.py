@@ -0,0 +1,229 @@
+"""
+輕量 tracing：一次請求（LINE 指令、匯入、CLI）為一個 trace，內部各階段為巢狀 span。
+
+    with trace("週報"):                # 根 span；結束時整個 trace 一次寫進 trace_spans 表
+        with span("load_orders"):      # 子 span；不在任何 trace 內時不做事
+            ...
+
+    @traced()                          # 等同整個函式包在 span(函式名稱) 內
+    def build_order_features(...): ...
+
+報表與匯入的主要函式都以 @traced() 標記；只有在 trace() 之內才會記錄，
+CLI 與測試直接呼叫時僅多一次 ContextVar 查詢。
+
+    python tracing.py stats --last 50
+    python tracing.py stats --last 50 --trace 週報
+"""
+import argparse
+import functools
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Optional
+
+TRACE_SPANS_DDL = """
+    CREATE TABLE IF NOT EXISTS trace_spans (
+        trace_id TEXT NOT NULL,
+        span_id INTEGER NOT NULL,
+        parent_id INTEGER,
+        trace_name TEXT NOT NULL,
+        name TEXT NOT NULL,
+        start_ms REAL NOT NULL,
+        duration_ms REAL NOT NULL,
+        status TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        PRIMARY KEY (trace_id, span_id)
+    )
+"""
+
+TRACE_INDEX_DDL = "CREATE INDEX IF NOT EXISTS idx_trace_spans_created_at ON trace_spans (created_at)"
+
+# 超過保留天數的 trace 在寫入新 trace 時順手刪除
+TRACE_RETENTION_DAYS = 14
+DEFAULT_LAST = 50
+
+
+class _Trace:
+    def __init__(self, name: str):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans: list[Optional[tuple]] = []
+        self.stack: list[int] = []
+
+
+_CURRENT: ContextVar[Optional[_Trace]] = ContextVar("trace", default=None)
+
+
+@contextmanager
+def span(name: str):
+    current = _CURRENT.get()
+    if current is None:
+        yield
+        return
+    span_id = len(current.spans)
+    parent_id = current.stack[-1] if current.stack else None
+    current.spans.append(None)
+    current.stack.append(span_id)
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        current.stack.pop()
+        current.spans[span_id] = (
+            span_id, parent_id, name,
+            round((started - current.started) * 1000, 3),
+            round((time.perf_counter() - started) * 1000, 3),
+            status,
+        )
+
+
+@contextmanager
+def trace(name: str):
+    """開始一個 trace；已在 trace 內時退化成一般 span。"""
+    if _CURRENT.get() is not None:
+        with span(name):
+            yield
+        return
+    current = _Trace(name)
+    token = _CURRENT.set(current)
+    try:
+        with span(name):
+            yield
+    finally:
+        _CURRENT.reset(token)
+        _flush(current)
+
+
+def traced(name: Optional[str] = None):
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _CURRENT.get() is None:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _connect() -> sqlite3.Connection:
+    import metrics_common
+
+    conn = sqlite3.connect(metrics_common.DB_PATH, timeout=30)
+    conn.execute(TRACE_SPANS_DDL)
+    conn.execute(TRACE_INDEX_DDL)
+    return conn
+
+
+def _flush(current: _Trace) -> None:
+    """整個 trace 一次寫入；寫入失敗只印警告，不影響請求本身。"""
+    now = datetime.now()
+    created_at = now.isoformat(timespec="seconds")
+    rows = [
+        (current.trace_id, span_id, parent_id, current.name, name, start_ms, duration_ms, status, created_at)
+        for span_id, parent_id, name, start_ms, duration_ms, status in filter(None, current.spans)
+    ]
+    try:
+        conn = _connect()
+        try:
+            conn.executemany(
+                "INSERT INTO trace_spans "
+                "(trace_id, span_id, parent_id, trace_name, name, start_ms, duration_ms, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            cutoff = (now - timedelta(days=TRACE_RETENTION_DAYS)).isoformat(timespec="seconds")
+            conn.execute("DELETE FROM trace_spans WHERE created_at < ?", (cutoff,))
+            conn.commit()
+        finally:
+            conn.close()
+    except sqlite3.Error as exc:
+        print(f"⚠️  Trace not recorded: {exc}")
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    """nearest-rank 百分位數。"""
+    ordered = sorted(values)
+    rank = max(int(-(-pct * len(ordered) // 100)), 1)
+    return ordered[rank - 1]
+
+
+def phase_stats(last: int = DEFAULT_LAST, trace_name: Optional[str] = None) -> dict:
+    """
+    最近 last 個 trace 中各 trace 名稱、各階段的 p50 / p95（毫秒）：
+    {trace_name: {"count": n, "phases": [(name, depth, count, p50, p95), ...]}}
+    同一個 trace 內重複出現的階段先加總，再算百分位數；階段依第一次出現的順序排列。
+    """
+    conn = _connect()
+    try:
+        where, params = ("AND trace_name = ?", (trace_name,)) if trace_name else ("", ())
+        trace_ids = [row[0] for row in conn.execute(
+            f"SELECT trace_id FROM trace_spans WHERE span_id = 0 {where} "
+            "ORDER BY created_at DESC, rowid DESC LIMIT ?",
+            (*params, last),
+        )]
+        if not trace_ids:
+            return {}
+        placeholders = ", ".join("?" * len(trace_ids))
+        rows = conn.execute(
+            f"SELECT trace_id, trace_name, span_id, parent_id, name, duration_ms FROM trace_spans "
+            f"WHERE trace_id IN ({placeholders}) ORDER BY trace_id, span_id",
+            trace_ids,
+        ).fetchall()
+    finally:
+        conn.close()
+
+    per_trace: dict = {}
+    depths: dict = {}
+    order: dict = {}
+    for trace_id, name_of_trace, span_id, parent_id, name, duration_ms in rows:
+        totals = per_trace.setdefault(name_of_trace, {}).setdefault(trace_id, {})
+        totals[name] = totals.get(name, 0.0) + duration_ms
+        depth = 0 if parent_id is None else depths[(trace_id, parent_id)] + 1
+        depths[(trace_id, span_id)] = depth
+        order.setdefault(name_of_trace, {}).setdefault(name, (span_id, depth))
+
+    stats = {}
+    for name_of_trace, traces in per_trace.items():
+        phases = []
+        for name, (_, depth) in sorted(order[name_of_trace].items(), key=lambda item: item[1][0]):
+            values = [totals[name] for totals in traces.values() if name in totals]
+            phases.append((name, depth, len(values), _percentile(values, 50), _percentile(values, 95)))
+        stats[name_of_trace] = {"count": len(traces), "phases": phases}
+    return stats
+
+
+def render_phase_stats(stats: dict, last: int = DEFAULT_LAST) -> str:
+    if not stats:
+        return "⚠️ 尚無效能紀錄"
+    lines = [f"⏱ 效能｜最近 {last} 次請求（p50 / p95，ms）"]
+    for name_of_trace, entry in stats.items():
+        lines.append("")
+        for name, depth, count, p50, p95 in entry["phases"]:
+            if depth == 0:
+                lines.append(f"【{name}】{entry['count']} 次｜{p50:.0f} / {p95:.0f}")
+                continue
+            suffix = f"（{count} 次）" if count != entry["count"] else ""
+            lines.append(f"{'  ' * (depth - 1)}・{name} {p50:.1f} / {p95:.1f}{suffix}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-phase latency (p50/p95) over recent traced requests")
+    sub = parser.add_subparsers(dest="command", required=True)
+    stats_parser = sub.add_parser("stats", help="Print p50/p95 per phase")
+    stats_parser.add_argument("--last", type=int, default=DEFAULT_LAST, help="How many recent traces to include")
+    stats_parser.add_argument("--trace", help="Only traces with this name (e.g. 週報)")
+    args = parser.parse_args()
+
+    print(render_phase_stats(phase_stats(args.last, args.trace), args.last))
@@ -0,0 +1,145 @@
+"""
+7 日 / 28 日移動平均：出碗數、營收、平均單碗收入與蛋白質占比。
+
+每日量體取自 daily_snapshot（見 daily_snapshot.py），不重新掃描原始訂單；
+RollingWindow 以累計和維護視窗，序列往後延伸一天只需加入新的一天、
+扣掉離開視窗的那一天，與視窗長度無關。
+
+    python trend_metrics.py --start 2026-01-01 --end 2026-03-31 > trend.csv
+    python trend_metrics.py --start 2026-01-01 --end 2026-03-31 --format json
+"""
+import argparse
+import csv
+import json
+import sys
+from collections import deque
+from datetime import date, timedelta
+from typing import Iterable, NamedTuple
+
+from daily_snapshot import refresh_daily_snapshots
+from tracing import traced
+
+WINDOWS = (7, 28)
+
+
+class DayPoint(NamedTuple):
+    day: str
+    orders: int
+    bowls: int
+    revenue: float
+    protein_bowls: dict
+
+
+class RollingWindow:
+    """最近 size 天的累計和；日均以視窗內有營業的天數計算（公休日不拉低平均）。"""
+
+    def __init__(self, size: int, proteins: Iterable[str]):
+        self.size = size
+        self.points: deque = deque()
+        self.open_days = 0
+        self.bowls = 0
+        self.revenue = 0.0
+        self.protein_bowls = {protein: 0 for protein in proteins}
+
+    def push(self, point: DayPoint) -> None:
+        self._apply(point, 1)
+        self.points.append(point)
+        if len(self.points) > self.size:
+            self._apply(self.points.popleft(), -1)
+
+    def _apply(self, point: DayPoint, sign: int) -> None:
+        if point.orders:
+            self.open_days += sign
+        self.bowls += sign * point.bowls
+        self.revenue += sign * point.revenue
+        for protein, bowls in point.protein_bowls.items():
+            self.protein_bowls[protein] = self.protein_bowls.get(protein, 0) + sign * bowls
+
+    def summary(self) -> dict:
+        open_days, bowls = self.open_days, self.bowls
+        return {
+            "open_days": open_days,
+            "avg_bowls": round(bowls / open_days, 1) if open_days else 0,
+            "avg_revenue": round(self.revenue / open_days, 2) if open_days else 0,
+            "avg_bowl_price": round(self.revenue / bowls, 2) if bowls else 0,
+            "protein_share": {
+                protein: round(count / bowls, 4) if bowls else 0
+                for protein, count in self.protein_bowls.items()
+            },
+        }
+
+
+def _day_points(start: date, end: date) -> list[DayPoint]:
+    days = [(start + timedelta(days=offset)).isoformat() for offset in range((end - start).days + 1)]
+    accumulators = refresh_daily_snapshots(days)
+    points = []
+    for day in days:
+        accumulator = accumulators[day]
+        points.append(DayPoint(
+            day, accumulator.total_orders, accumulator.total_bowls, accumulator.revenue, accumulator.protein_bowls,
+        ))
+    return points
+
+
+@traced()
+def calculate_trend_series(start_date: str, end_date: str, windows: tuple = WINDOWS) -> list[dict]:
+    """
+    start_date 至 end_date 每天一點：當日 orders / bowls / revenue，以及各視窗的
+    summary()（鍵為 "7d"、"28d"）。起點往前多取 max(windows) - 1 天，第一點的視窗即為完整的。
+    """
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    points = _day_points(start - timedelta(days=max(windows) - 1), end)
+    proteins = list(points[0].protein_bowls) if points else []
+    rolling = [RollingWindow(size, proteins) for size in windows]
+
+    series = []
+    for point in points:
+        for window in rolling:
+            window.push(point)
+        if point.day < start_date:
+            continue
+        entry = {
+            "date": point.day,
+            "orders": point.orders,
+            "bowls": point.bowls,
+            "revenue": round(point.revenue, 2),
+        }
+        for window in rolling:
+            entry[f"{window.size}d"] = window.summary()
+        series.append(entry)
+    return series
+
+
+def series_rows(series: list[dict], windows: tuple = WINDOWS) -> list[dict]:
+    """攤平成 CSV 欄位：bowls_7d、revenue_7d、avg_bowl_price_7d、share_chicken_7d …"""
+    rows = []
+    for entry in series:
+        row = {key: entry[key] for key in ("date", "orders", "bowls", "revenue")}
+        for size in windows:
+            summary = entry[f"{size}d"]
+            row[f"bowls_{size}d"] = summary["avg_bowls"]
+            row[f"revenue_{size}d"] = summary["avg_revenue"]
+            row[f"avg_bowl_price_{size}d"] = summary["avg_bowl_price"]
+            for protein, share in summary["protein_share"].items():
+                row[f"share_{protein}_{size}d"] = share
+        rows.append(row)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export 7/28-day moving averages per day")
+    parser.add_argument("--start", required=True, help="YYYY-MM-DD")
+    parser.add_argument("--end", required=True, help="YYYY-MM-DD")
+    parser.add_argument("--format", choices=("csv", "json"), default="csv")
+    args = parser.parse_args()
+
+    series = calculate_trend_series(args.start, args.end)
+    if args.format == "json":
+        json.dump(series, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        rows = series_rows(series)
+        if rows:
+            writer = csv.DictWriter(sys.stdout, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
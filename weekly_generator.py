@@ -1,39 +1,47 @@
 import argparse
+from datetime import date, timedelta
+from typing import NamedTuple
+
+import numpy as np
 import pandas as pd
 from metrics_common import (
-    PROTEIN_RULES,
-    count_bowls_smart,
-    count_protein_bowls,
-    count_protein_non_bowls,
-    count_set_meal_proteins,
-    filter_protein_bowls,
-    filter_protein_non_bowls,
-    is_in_period,
-    load_modifier,
+    build_order_features,
+    current_rules,
+    in_period_mask,
     load_orders,
+    load_orders_in_ranges,
+    load_protein_adds,
     normalize_payment,
     preprocess_orders,
     validate_bowl_counts,
 )
 from report_renderer import render_weekly_report
+from tracing import traced
+
+WEEKLY_COLUMNS = [
+    "checkout_time",
+    "order_source",
+    "order_type",
+    "invoice_amount",
+    "payment_method",
+    "order_status",
+    "items_text",
+]
+
+# 比較期間相對於本期往前平移的天數；None 表示平移本期長度（上週 / 上一期）。
+# 去年同期取 364 天（52 週），星期幾與本期對齊。
+COMPARISONS = {
+    "previous": None,
+    "last_year": 364,
+}
 
 def is_peak(hour_float: float) -> bool:
     return 12 <= hour_float < 13.5
 
+@traced()
 def calculate_weekly_metrics(start_date: str, end_date: str):
-    df = load_orders(
-        start_date,
-        end_date,
-        columns=[
-            "checkout_time",
-            "order_source",
-            "order_type",
-            "invoice_amount",
-            "payment_method",
-            "order_status",
-            "items_text",
-        ],
-    )
+    rules = current_rules()
+    df = load_orders(start_date, end_date, columns=WEEKLY_COLUMNS)
 
     if df.empty:
         return None
@@ -45,128 +53,262 @@ def calculate_weekly_metrics(start_date: str, end_date: str):
     if df.empty:
         return None
 
-    df["date"] = df["checkout_time"].dt.date
-    df["hour"] = df["checkout_time"].dt.hour + df["checkout_time"].dt.minute / 60
-    df["bowls"] = df.apply(lambda row: count_bowls_smart(row["items_text"], order_date=row["checkout_time"]), axis=1)
-    df["is_peak"] = df["hour"].apply(is_peak)
+    df = df.join(build_order_features(df, rules=rules))
+    df["_period"] = "current"
+    tables = _period_tables(df, rules)
+    adds = load_protein_adds(start_date, end_date, rules=rules)
+    return _weekly_metrics(tables, "current", adds, start_date, end_date, rules)
+
+
+def comparison_ranges(start_date: str, end_date: str, compare=tuple(COMPARISONS)) -> dict:
+    """{"current" 或比較名稱: (start_date, end_date)}；比較期間與本期等長。"""
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    ranges = {"current": (start_date, end_date)}
+    for name in compare:
+        shift = timedelta(days=COMPARISONS[name] or (end - start).days + 1)
+        ranges[name] = ((start - shift).isoformat(), (end - shift).isoformat())
+    return ranges
+
+
+@traced()
+def calculate_weekly_comparison(start_date: str, end_date: str, compare=tuple(COMPARISONS)):
+    """
+    本期週報加上比較期間（預設上週與去年同週）。
+
+    所有期間以一次查詢載入，品項分類（build_order_features）只做一次，
+    各項彙總以 _period 為第一層做一次 groupby，再依期間取出切片。
+    回傳本期的 calculate_weekly_metrics 結構，另附
+    "comparisons": {名稱: 該期間的週報 dict 或 None}；本期沒有資料時回傳 None。
+    """
+    rules = current_rules()
+    ranges = comparison_ranges(start_date, end_date, compare)
+
+    df = preprocess_orders(load_orders_in_ranges(list(ranges.values()), columns=WEEKLY_COLUMNS))
+    if df.empty:
+        return None
+    df = df.join(build_order_features(df, rules=rules))
+
+    # 期間可能重疊（例如超過 52 週的區間與去年同期），以逐期間切片串接，同一筆訂單可屬於多個期間
+    day = df["checkout_time"].dt.strftime("%Y-%m-%d")
+    df = pd.concat(
+        [df[(day >= start) & (day <= end)].assign(_period=name) for name, (start, end) in ranges.items()],
+        ignore_index=True,
+    )
+    tables = _period_tables(df, rules)
+
+    results = {
+        name: _weekly_metrics(tables, name, load_protein_adds(start, end, rules=rules), start, end, rules)
+        if name in tables.totals.index else None
+        for name, (start, end) in ranges.items()
+    }
+    current = results.pop("current")
+    if current is None:
+        return None
+    current["comparisons"] = results
+    return current
+
+
+class _PeriodTables(NamedTuple):
+    """以 _period 為第一層索引的彙總表；單一期間用 .loc[期間] 取出。"""
+    totals: pd.DataFrame     # 各期間的筆數、碗數、營收與各項旗標 / 蛋白質欄位加總
+    by_bucket: pd.DataFrame  # (期間, 碗數分桶) -> 筆數、營收
+    by_hour: pd.DataFrame    # (期間, 小時) -> 筆數、碗數
+    cube: pd.DataFrame       # (期間, 尖峰, 通路, 雲端, 付款方式) -> 筆數、碗數
+    by_day: pd.DataFrame     # (期間, 日期) -> 筆數、碗數、營收
+
+
+@traced()
+def _period_tables(df: pd.DataFrame, rules) -> _PeriodTables:
+    """已前處理、接上 order features 並標好 _period 的訂單表 -> 各期間共用的彙總表。"""
+    key = df["_period"]
+    moment = df["checkout_time"]
+    bowls = df["bowls"]
+    revenue = df["invoice_amount"]
+
+    # ---------- 基礎量體、時段、價格帶與蛋白質：逐筆旗標一起加總 ----------
+    # < 150 / 150–250（含兩端）/ > 250 三個價格帶
+    price_bucket = (revenue >= 150).astype("int64") + (revenue > 250).astype("int64")
+    protein_columns = [
+        f"{prefix}{protein}"
+        for prefix in ("protein_bowls_", "protein_non_bowls_", "set_meal_")
+        for protein in rules.protein_rules
+    ]
+    flags = pd.DataFrame({
+        "orders": 1,
+        "bowls": bowls,
+        "revenue": revenue,
+        "lunch_orders": in_period_mask(moment, "lunch", rules).astype("int64"),
+        "dinner_orders": in_period_mask(moment, "dinner", rules).astype("int64"),
+        "lt_150": (price_bucket == 0).astype("int64"),
+        "150_250": (price_bucket == 1).astype("int64"),
+        "gt_250": (price_bucket == 2).astype("int64"),
+        "orders_ge_200": (revenue >= 200).astype("int64"),
+        **{column: df[column] for column in protein_columns},
+    }, index=df.index)
+    totals = flags.groupby(key).sum()
+
+    # ---------- 訂單 × 碗數結構 ----------
+    # 1 / 2 / 3+ 碗分桶（0 碗歸 0 桶），一次 groupby 同時得到筆數與營收
+    by_bucket = revenue.groupby([key, bowls.clip(upper=3)]).agg(["size", "sum"])
+
+    # ---------- 時段切片 ----------
+    by_hour = bowls.groupby([key, moment.dt.hour]).agg(["size", "sum"])
+
+    # 同 is_peak()：12:00 <= 時 + 分/60 < 13:30
+    hour_float = moment.dt.hour + moment.dt.minute / 60
+    peak = (hour_float >= 12) & (hour_float < 13.5)
+
+    # ---------- 訂單型態 × 時段 × 金流 ----------
+    # 以 (尖峰, 通路, 雲端, 付款方式) 四個類別維度做一次 groupby，得到筆數與碗數的小方塊，
+    # 各項計數都是對這個方塊做切片加總，不再逐一篩出子表
+    channel = pd.Series(
+        np.select(
+            [df["order_type"].isin(["Dine In", "內用"]), df["order_type"].isin(["Takeout", "外帶", "Delivery", "外送"])],
+            ["dine_in", "takeout"],
+            "other",
+        ),
+        index=df.index,
+    )
+    online = df["order_source"] == "Online Store"
+    payment_type = df["payment_method"].map(
+        {method: normalize_payment(method) for method in df["payment_method"].unique()}
+    )
+    cube = bowls.groupby([key, peak.rename("peak"), channel.rename("channel"), online.rename("online"),
+                          payment_type.rename("payment")]).agg(["size", "sum"])
+
+    # ---------- 日別穩定性 ----------
+    by_day = df.groupby([key, moment.dt.normalize()]).agg(
+        orders=("bowls", "size"), bowls=("bowls", "sum"), revenue=("invoice_amount", "sum"),
+    )
+    return _PeriodTables(totals, by_bucket, by_hour, cube, by_day)
+
+
+@traced()
+def _weekly_metrics(tables: _PeriodTables, period: str, adds: dict,
+                    start_date: str, end_date: str, rules):
+    """從 _period_tables 取出單一期間的切片，組成週報 dict。"""
+    # 逐欄以 .at 取值，保留各欄 dtype（整列 .loc 會把整數欄升為 float）
+    def total(column: str):
+        return tables.totals.at[period, column]
 
     # ---------- 基礎量體 ----------
-    total_orders = len(df)
-    total_bowls = df["bowls"].sum()
-    total_revenue = df["invoice_amount"].sum()
+    total_orders = int(total("orders"))
+    total_bowls = total("bowls")
+    total_revenue = total("revenue")
 
     # ---------- 訂單 × 碗數結構 ----------
+    # reindex 補 0 時保留 invoice_amount 的 dtype，與逐一篩選 .sum() 的型別一致
+    by_bucket = tables.by_bucket.loc[period].reindex([1, 2, 3], fill_value=0)
     bowl_dist = {
-        "1_bowl_orders": len(df[df["bowls"] == 1]),
-        "2_bowl_orders": len(df[df["bowls"] == 2]),
-        "3plus_bowl_orders": len(df[df["bowls"] >= 3]),
+        "1_bowl_orders": int(by_bucket["size"].iloc[0]),
+        "2_bowl_orders": int(by_bucket["size"].iloc[1]),
+        "3plus_bowl_orders": int(by_bucket["size"].iloc[2]),
     }
 
     bowl_revenue = {
-        "1_bowl_revenue": df[df["bowls"] == 1]["invoice_amount"].sum(),
-        "2_bowl_revenue": df[df["bowls"] == 2]["invoice_amount"].sum(),
-        "3plus_bowl_revenue": df[df["bowls"] >= 3]["invoice_amount"].sum(),
+        "1_bowl_revenue": by_bucket["sum"].iloc[0],
+        "2_bowl_revenue": by_bucket["sum"].iloc[1],
+        "3plus_bowl_revenue": by_bucket["sum"].iloc[2],
     }
 
     # ---------- 每碗均價 ----------
     avg_bowl_price = "{:.0f}".format(total_revenue / total_bowls if total_bowls != 0 else 0)
 
     # ---------- 時段切片 ----------
-    hourly_orders = df.groupby(df["checkout_time"].dt.hour).size().to_dict()
-    hourly_bowls = df.groupby(df["checkout_time"].dt.hour)["bowls"].sum().to_dict()
+    by_hour = tables.by_hour.loc[period]
+    hourly_orders = by_hour["size"].to_dict()
+    hourly_bowls = by_hour["sum"].to_dict()
+
+    lunch_orders = int(total("lunch_orders"))
+    dinner_orders = int(total("dinner_orders"))
 
-    lunch_df = df[df["checkout_time"].apply(lambda x: is_in_period(x, "lunch"))]
-    dinner_df = df[df["checkout_time"].apply(lambda x: is_in_period(x, "dinner"))]
-    lunch_orders = len(lunch_df)
-    dinner_orders = len(dinner_df)
+    # ---------- 訂單型態 × 時段 × 金流 ----------
+    cube = tables.cube.loc[period]
+    levels = {name: cube.index.get_level_values(name) for name in cube.index.names}
 
-    peak_orders = len(df[df["is_peak"]])
-    non_peak_orders = len(df[~df["is_peak"]])
+    def cube_orders(**where) -> int:
+        mask = np.ones(len(cube), dtype=bool)
+        for name, value in where.items():
+            mask &= levels[name] == value
+        return int(cube["size"][mask].sum())
 
-    # ---------- 訂單型態結構 ----------
-    dine_in_mask = df["order_type"].isin(["Dine In", "內用"])
-    takeout_mask = df["order_type"].isin(["Takeout", "外帶", "Delivery", "外送"])
-    dine_in_orders = len(df[dine_in_mask])
-    takeout_orders = len(df[takeout_mask])
-    online_orders = len(df[df["order_source"] == "Online Store"])
+    def cube_bowls(**where):
+        mask = np.ones(len(cube), dtype=bool)
+        for name, value in where.items():
+            mask &= levels[name] == value
+        return cube["sum"][mask].sum()
 
-    dine_in_bowls = df[dine_in_mask]["bowls"].sum()
-    takeout_bowls = df[takeout_mask]["bowls"].sum()
-    online_bowls = df[df["order_source"] == "Online Store"]["bowls"].sum()
+    peak_orders = cube_orders(peak=True)
+    non_peak_orders = cube_orders(peak=False)
 
-    # ---------- 訂單型態 × 時段 ----------
-    def cross_count(cond):
-        return len(df[cond])
+    dine_in_orders = cube_orders(channel="dine_in")
+    takeout_orders = cube_orders(channel="takeout")
+    online_orders = cube_orders(online=True)
 
-    peak_dine_in = cross_count((df["is_peak"]) & dine_in_mask)
-    peak_takeout = cross_count((df["is_peak"]) & takeout_mask)
-    peak_online = cross_count((df["is_peak"]) & (df["order_source"] == "Online Store"))
+    dine_in_bowls = cube_bowls(channel="dine_in")
+    takeout_bowls = cube_bowls(channel="takeout")
+    online_bowls = cube_bowls(online=True)
 
-    non_peak_dine_in = cross_count((~df["is_peak"]) & dine_in_mask)
-    non_peak_takeout = cross_count((~df["is_peak"]) & takeout_mask)
-    non_peak_online = cross_count((~df["is_peak"]) & (df["order_source"] == "Online Store"))
+    peak_dine_in = cube_orders(peak=True, channel="dine_in")
+    peak_takeout = cube_orders(peak=True, channel="takeout")
+    peak_online = cube_orders(peak=True, online=True)
+
+    non_peak_dine_in = cube_orders(peak=False, channel="dine_in")
+    non_peak_takeout = cube_orders(peak=False, channel="takeout")
+    non_peak_online = cube_orders(peak=False, online=True)
 
     # ---------- 金流結構 ----------
-    df["payment_type"] = df["payment_method"].apply(normalize_payment)
-    cash_orders = len(df[df["payment_type"].isin(["Cash"])])
-    linepay_orders = len(df[df["payment_type"].isin(["LinePay"])])
+    cash_orders = cube_orders(payment="Cash")
+    linepay_orders = cube_orders(payment="LinePay")
 
-    peak_cash = len(df[(df["is_peak"]) & (df["payment_type"].isin(["Cash"]))])
-    peak_linepay = len(df[(df["is_peak"]) & (df["payment_type"].isin(["LinePay"]))])
+    peak_cash = cube_orders(peak=True, payment="Cash")
+    peak_linepay = cube_orders(peak=True, payment="LinePay")
 
-    non_peak_cash = len(df[(~df["is_peak"]) & (df["payment_type"].isin(["Cash"]))])
-    non_peak_linepay = len(df[(~df["is_peak"]) & (df["payment_type"].isin(["LinePay"]))])
+    non_peak_cash = cube_orders(peak=False, payment="Cash")
+    non_peak_linepay = cube_orders(peak=False, payment="LinePay")
 
     # ---------- 日別穩定性 ----------
-    daily_orders = df.groupby("date").size().to_dict()
-    daily_bowls = df.groupby("date")["bowls"].sum().to_dict()
-    daily_revenue = df.groupby("date")["invoice_amount"].sum().to_dict()
+    by_day = tables.by_day.loc[period]
+    by_day.index = by_day.index.date
+    daily_orders = by_day["orders"].to_dict()
+    daily_bowls = by_day["bowls"].to_dict()
+    daily_revenue = by_day["revenue"].to_dict()
 
     max_bowl_day = max(daily_bowls.items(), key=lambda x: x[1]) if daily_bowls else (None, 0)
     min_bowl_day = min(daily_bowls.items(), key=lambda x: x[1]) if daily_bowls else (None, 0)
 
     # ---------- 高價值訂單 ----------
     price_dist = {
-        "lt_150": len(df[df["invoice_amount"] < 150]),
-        "150_250": len(df[(df["invoice_amount"] >= 150) & (df["invoice_amount"] <= 250)]),
-        "gt_250": len(df[df["invoice_amount"] > 250]),
+        "lt_150": int(total("lt_150")),
+        "150_250": int(total("150_250")),
+        "gt_250": int(total("gt_250")),
     }
 
-    high_value_orders = len(df[df["invoice_amount"] >= 200])
+    high_value_orders = int(total("orders_ge_200"))
 
-    # 蛋白質碗數統計（關鍵字 + 碗）
-    df["protein_bowls"] = df["items_text"].apply(filter_protein_bowls)
+    # 蛋白質碗數統計（關鍵字 + 碗），品項分類來自 build_order_features
     protein_bowls = {
-        protein: int(df["items_text"].apply(lambda text: count_protein_bowls(text, protein)).sum())
-        for protein in PROTEIN_RULES
+        protein: int(total(f"protein_bowls_{protein}"))
+        for protein in rules.protein_rules
     }
 
-    df["protein_non_bowls"] = df["items_text"].apply(filter_protein_non_bowls)
     protein_non_bowls = {
-        protein: int(df["items_text"].apply(lambda text: count_protein_non_bowls(text, protein)).sum())
-        for protein in PROTEIN_RULES
+        protein: int(total(f"protein_non_bowls_{protein}"))
+        for protein in rules.protein_rules
     }
 
-    # protein_set_meals = {
-    #     protein: int(
-    #         df["items_text"].apply(lambda text: count_set_meal_proteins(text).get(protein, 0)).sum()
-    #     )
-    #     for protein in PROTEIN_RULES
-    # }
-    df["set_meal_proteins"] = df["items_text"].apply(count_set_meal_proteins)
     protein_set_meals = {
-        protein: int(df["set_meal_proteins"].apply(lambda d: d.get(protein, 0)).sum())
-        for protein in PROTEIN_RULES
+        protein: int(total(f"set_meal_{protein}"))
+        for protein in rules.protein_rules
     }
 
     # 碗數與蛋白質數不相等，如 "高蛋白健身碗"/"清爽佛陀碗"
     # print(df[df["items_text"].apply(lambda x: not any(keyword in x for keyword in PROTEIN_KEYWORDS))]["items_text"])
 
-    # 處理加註部分
-    df_modifier = load_modifier(start_date, end_date)
+    # 處理加註部分：load_protein_adds 已在 SQL 端依 protein_key 彙總（部分重疊的匯出區間按日攤提）
     protein_adds = {
-        category: int(df_modifier[df_modifier['name'].str.contains('|'.join(keywords))]['count'].sum())
-        for category, keywords in PROTEIN_RULES.items()
+        protein: adds.get(protein, 0)
+        for protein in rules.protein_rules
     }
 
     # 各來源的 dict 結果
@@ -284,9 +426,14 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--start", required=True, help="YYYY-MM-DD")
     parser.add_argument("--end", required=True, help="YYYY-MM-DD")
+    parser.add_argument("--compare", action="store_true",
+                        help="Add week-over-week and same-week-last-year deltas")
     args = parser.parse_args()
 
-    result = calculate_weekly_metrics(args.start, args.end)
+    if args.compare:
+        result = calculate_weekly_comparison(args.start, args.end)
+    else:
+        result = calculate_weekly_metrics(args.start, args.end)
 
     if result is None:
         print("No data found during {} to {}.".format(args.start, args.end))
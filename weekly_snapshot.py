@@ -0,0 +1,150 @@
+"""
+預先算好的週報（含同期比較）。
+
+「週報 上週」問的永遠是同一個已結束的週；排程器（見 scheduler.py）在該週的 CSV
+匯入後先算好 calculate_weekly_comparison 的結果與報表文字存進 weekly_snapshot 表，
+LINE 收到指令時直接回傳，沒有快照或快照過期時才現場計算（並補存）。
+
+快照以兩個版本判斷是否仍有效（metrics_common.state_version / data_version，與日報、報表 API 共用）：
+- state_version：item_memo_version（規則 hash + 價格時間軸 fingerprint）
+- data_version：本週與各比較期間的 raw_orders 筆數 / 最大 id，以及 modifier_summary 的筆數 / 最大 id，
+  之後補匯入任一期間的訂單或 modifier 都會讓快照失效
+
+    python weekly_snapshot.py --weeks 4
+"""
+import argparse
+import json
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+import bot_metrics
+import metrics_common
+from metrics_common import data_version, state_version, to_jsonable
+from report_renderer import render_weekly_report
+from tracing import traced
+from weekly_generator import calculate_weekly_comparison, comparison_ranges
+
+WEEKLY_SNAPSHOT_DDL = """
+    CREATE TABLE IF NOT EXISTS weekly_snapshot (
+        start_date TEXT NOT NULL,
+        end_date TEXT NOT NULL,
+        state_version TEXT NOT NULL,
+        data_version TEXT NOT NULL,
+        result TEXT NOT NULL,
+        report TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        PRIMARY KEY (start_date, end_date)
+    )
+"""
+
+# 排程器每次檢查最近幾個已結束的週
+WEEKS_BACK = 4
+
+
+def _data_version(conn: sqlite3.Connection, start_date: str, end_date: str) -> str:
+    # 本週與各比較期間各自的 data_version，任一期間補匯入都會讓快照失效
+    return "|".join(
+        data_version(conn, start, end) for start, end in comparison_ranges(start_date, end_date).values()
+    )
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(metrics_common.DB_PATH, timeout=30)
+    conn.execute(WEEKLY_SNAPSHOT_DDL)
+    return conn
+
+
+@traced()
+def load_weekly_report(start_date: str, end_date: str) -> Optional[str]:
+    """仍有效的快照報表文字；沒有快照或已過期時回傳 None。"""
+    conn = _connect()
+    try:
+        row = conn.execute(
+            "SELECT state_version, data_version, report FROM weekly_snapshot WHERE start_date = ? AND end_date = ?",
+            (start_date, end_date),
+        ).fetchone()
+        if row is None:
+            bot_metrics.inc("pokebee_report_cache_total", cache="weekly", result="miss")
+            return None
+        stored_state, stored_data, report = row
+        if stored_state != state_version() or stored_data != _data_version(conn, start_date, end_date):
+            bot_metrics.inc("pokebee_report_cache_total", cache="weekly", result="stale")
+            return None
+        bot_metrics.inc("pokebee_report_cache_total", cache="weekly", result="hit")
+        return report
+    finally:
+        conn.close()
+
+
+@traced()
+def build_weekly_snapshot(start_date: str, end_date: str) -> Optional[str]:
+    """現場計算週報並存成快照，回傳報表文字；本週沒有資料時回傳 None。"""
+    conn = _connect()
+    try:
+        state = state_version()
+        data = _data_version(conn, start_date, end_date)
+
+        result = calculate_weekly_comparison(start_date, end_date)
+        if result is None:
+            return None
+        report = render_weekly_report(result)
+
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO weekly_snapshot
+              (start_date, end_date, state_version, data_version, result, report, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                start_date, end_date, state, data,
+                json.dumps(to_jsonable(result), ensure_ascii=False), report,
+                datetime.now().isoformat(timespec="seconds"),
+            ),
+        )
+        conn.commit()
+        return report
+    finally:
+        conn.close()
+
+
+def closed_weeks(today: Optional[date] = None, weeks: int = WEEKS_BACK) -> list[tuple[str, str]]:
+    """最近 weeks 個已結束的週（週一至週日），由近到遠。"""
+    today = today or date.today()
+    last_monday = today - timedelta(days=today.weekday() + 7)
+    mondays = [last_monday - timedelta(weeks=n) for n in range(weeks)]
+    return [(monday.isoformat(), (monday + timedelta(days=6)).isoformat()) for monday in mondays]
+
+
+def precompute_weekly_snapshots(today: Optional[date] = None, weeks: int = WEEKS_BACK) -> list[tuple[str, str]]:
+    """
+    排程工作：為最近幾個已結束、且 CSV 已匯入到週日的週補上快照，回傳這次重算的週。
+    「已匯入」以 raw_orders 最晚的 checkout_time 已到達該週週日判斷。
+    """
+    conn = sqlite3.connect(metrics_common.DB_PATH, timeout=30)
+    try:
+        latest, = conn.execute("SELECT MAX(checkout_time) FROM raw_orders").fetchone()
+    finally:
+        conn.close()
+    if latest is None:
+        return []
+
+    built = []
+    for start_date, end_date in closed_weeks(today, weeks):
+        if latest < end_date:
+            continue
+        if load_weekly_report(start_date, end_date) is None and build_weekly_snapshot(start_date, end_date):
+            built.append((start_date, end_date))
+    return built
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute weekly report snapshots for recent closed weeks")
+    parser.add_argument("--weeks", type=int, default=WEEKS_BACK, help="How many closed weeks to check")
+    args = parser.parse_args()
+
+    built = precompute_weekly_snapshots(weeks=args.weeks)
+    for start_date, end_date in built:
+        print(f"Built weekly snapshot {start_date} ~ {end_date}")
+    if not built:
+        print("All weekly snapshots are up to date.")
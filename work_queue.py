@@ -0,0 +1,113 @@
+"""
+行程內的優先權工作佇列：webhook 只負責排入工作就回 200，實際處理由背景執行緒執行。
+
+- 文字報表指令（INTERACTIVE）永遠排在 CSV 匯入與打卡 XLSX（BULK）之前
+- 同一位使用者在同一優先權內同時最多 per_user 個工作在執行，其餘留在佇列裡，不佔住其他人的執行緒；
+  使用者自己正在跑的匯入不會擋住他的文字指令
+- 排隊等待時間記在 /metrics 的 pokebee_queue_wait_seconds
+
+多 worker 部署時每個 worker 各有一個佇列；優先順序與「第 N 位」以該 worker 為準。
+"""
+import bisect
+import itertools
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Callable, NamedTuple
+
+import bot_metrics
+
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+
+class Job(NamedTuple):
+    priority: int
+    seq: int
+    user_id: str
+    func: Callable[[], object]
+    enqueued_at: float
+
+
+class WorkQueue:
+    def __init__(self, *, workers: int = 2, per_user: int = 1):
+        self.workers = workers
+        self.per_user = per_user
+        self._cond = threading.Condition()
+        self._pending: list[Job] = []  # 依 (priority, seq) 排序
+        self._running: Counter = Counter()  # (user_id, priority) → 執行中的工作數
+        self._seq = itertools.count()
+        self._threads: list[threading.Thread] = []
+
+    def ahead(self, priority: int, user_id: str) -> int:
+        """
+        user_id 現在排入一個 priority 的工作，前面要先開始的工作數；0 表示會立刻執行。
+        執行緒全忙、或該使用者同優先權的工作已達 per_user 上限時，至少要等一個執行中的工作。
+        """
+        with self._cond:
+            queued = sum(1 for job in self._pending if job.priority <= priority)
+            busy = (sum(self._running.values()) >= self.workers
+                    or self._running[(user_id, priority)] >= self.per_user)
+            return queued + (1 if queued or busy else 0)
+
+    def submit(self, user_id: str, priority: int, func: Callable[[], object]) -> None:
+        with self._cond:
+            if not self._threads:
+                self._start()
+            job = Job(priority, next(self._seq), user_id, func, time.perf_counter())
+            bisect.insort(self._pending, job, key=lambda item: (item.priority, item.seq))
+            self._cond.notify_all()
+
+    def depths(self) -> dict[str, int]:
+        with self._cond:
+            counts = Counter(job.priority for job in self._pending)
+        return {name: counts.get(priority, 0) for priority, name in PRIORITY_NAMES.items()}
+
+    def join(self, timeout: float = 10.0) -> bool:
+        """等到佇列清空且沒有執行中的工作（測試與關機用）。"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending or sum(self._running.values()):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _start(self) -> None:
+        # 第一次排入工作時才建立執行緒：gunicorn preload 的 master 不會帶著執行緒 fork
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"work-queue-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _take(self) -> Job:
+        with self._cond:
+            while True:
+                for index, job in enumerate(self._pending):
+                    if self._running[(job.user_id, job.priority)] < self.per_user:
+                        del self._pending[index]
+                        self._running[(job.user_id, job.priority)] += 1
+                        return job
+                self._cond.wait()
+
+    def _loop(self) -> None:
+        while True:
+            job = self._take()
+            bot_metrics.observe(
+                "pokebee_queue_wait_seconds", time.perf_counter() - job.enqueued_at,
+                priority=PRIORITY_NAMES[job.priority],
+            )
+            try:
+                job.func()
+            except Exception:
+                traceback.print_exc()
+            finally:
+                with self._cond:
+                    key = (job.user_id, job.priority)
+                    self._running[key] -= 1
+                    if not self._running[key]:
+                        del self._running[key]
+                    self._cond.notify_all()